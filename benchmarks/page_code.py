@@ -0,0 +1,100 @@
+import ast
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from utils.settlement import implied_odds
+
+
+# プロジェクトのルート（pages/ の親）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse(page):
+    path = os.path.join(ROOT_DIR, "pages", page)
+    with open(path, "r", encoding="utf-8") as f:
+        return ast.parse(f.read(), filename=path), path
+
+
+def _base_namespace():
+    # ページの先頭で import されているもののうち、抜き出したコードが使うもの
+    return {"time": time, "np": np, "pd": pd, "Dict": Dict, "List": List, "implied_odds": implied_odds}
+
+
+def load_function(page, name):
+    """
+    pages/<page> からトップレベルの関数 name だけを取り出して返す
+
+    ページのスクリプトは import すると Streamlit の描画まで走ってしまうので、
+    ast で関数定義だけを抜き出して実行する。
+    """
+    tree, path = _parse(page)
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == name:
+            namespace = _base_namespace()
+            exec(compile(ast.Module(body=[node], type_ignores=[]), path, "exec"), namespace)
+            return namespace[name]
+    raise LookupError(f"{page} に関数 {name} がありません")
+
+
+def _produced_names(stmt):
+    """文が作る（代入する・append する・insert する）変数名"""
+    names = set()
+    if isinstance(stmt, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+        for target in targets:
+            names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+    elif isinstance(stmt, (ast.For, ast.Expr)):
+        for node in ast.walk(stmt):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ("append", "insert", "extend")
+                    and isinstance(node.func.value, ast.Name)):
+                names.add(node.func.value.id)
+    return names
+
+
+def _select(body, names, picked):
+    for stmt in body:
+        if _produced_names(stmt) & names:
+            picked.append(stmt)
+            continue
+        # if / with / try の中も探す（選んだ文の中には入らない）
+        for field in ("body", "orelse", "finalbody", "handlers"):
+            child = getattr(stmt, field, None)
+            if isinstance(child, list) and child:
+                _select(child, names, picked)
+
+
+def load_snippet(page, names, inputs, output):
+    """
+    pages/<page> のうち names の変数を作る文だけを抜き出して関数にする
+
+    返す関数はキーワード引数 inputs を受け取り、実行後の変数 output の値を返す。
+    Streamlit の呼び出しを含む文は names に含めないことで除外する。
+    """
+    tree, path = _parse(page)
+    picked = []
+    _select(tree.body, set(names), picked)
+    if not picked:
+        raise LookupError(f"{page} に {names} を作る文がありません")
+
+    args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=a) for a in inputs], kwonlyargs=[],
+                         kw_defaults=[], defaults=[])
+    fields = dict(
+        name="_snippet",
+        args=args,
+        body=picked + [ast.Return(value=ast.Name(id=output, ctx=ast.Load()))],
+        decorator_list=[],
+        returns=None,
+    )
+    if "type_params" in ast.FunctionDef._fields:
+        fields["type_params"] = []
+    func = ast.FunctionDef(**fields)
+    module = ast.fix_missing_locations(ast.Module(body=[func], type_ignores=[]))
+    namespace = _base_namespace()
+    exec(compile(module, path, "exec"), namespace)
+    snippet = namespace["_snippet"]
+    return lambda **kwargs: snippet(**{a: kwargs[a] for a in inputs})
@@ -0,0 +1,254 @@
+"""
+市場データまわりのベンチマーク
+
+チェーンの代わりに utils.sim_backend の SimChain に合成データを入れ、
+ホットパスの処理時間を市場数ごとに測って JSON に書き出す。
+
+使い方（プロジェクトのルートで実行）:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 10 1000 --bettors 500 --repeat 5
+    python -m benchmarks.run --rpc-latency-ms 50 --output result.json
+    python -m benchmarks.run --fixture markets_dump.json
+
+--fixture には get_all_markets() の結果（市場 dict のリスト）を保存した JSON を渡せる。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from eth_account import Account
+
+from benchmarks.page_code import load_snippet
+from benchmarks.sim_rpc import SimRPCProvider
+from utils.accuracy import AccuracyService
+from utils.bet_log import BetLog
+from utils.leaderboard import Leaderboard
+from utils.market_index import MarketIndex
+from utils.market_model import MarketTable
+from utils.market_snapshot import MarketSnapshot
+from utils.read_cache import BlockCache
+from utils.settlement import settle
+from utils.sim_backend import SimChain, SimulatedWeb3Manager
+
+
+DEFAULT_SIZES = [10, 1000, 10000]
+DEFAULT_BETTORS = 5000
+
+# 結果の置き場所
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# 3_Results のランキングの 1 ページの件数と、増分の取り込みを測るときに足す投票の数
+RANK_PAGE_SIZE = 100
+INCREMENTAL_VOTES = 100
+
+# 9_Admin の精算プレビューを測るときの 1 市場あたりのベット数
+SETTLEMENT_BETS = 50000
+
+# 1_Main の一覧の 1 ページあたりの件数
+MAIN_PAGE_SIZE = 20
+
+# ダミーのコントラクトアドレス（SimRPCProvider は宛先を見ないので何でもよい）
+SIM_CONTRACT_ADDRESS = "0x3e54D97F57E940CB5836B1014969A50951083cF8"
+
+
+def _time(func, repeat):
+    """func を repeat 回実行して秒数の統計を返す（最初の戻り値も返す）"""
+    samples = []
+    result = None
+    for i in range(repeat):
+        started = time.perf_counter()
+        value = func()
+        samples.append(time.perf_counter() - started)
+        if i == 0:
+            result = value
+    stats = {
+        "repeat": repeat,
+        "min_sec": min(samples),
+        "median_sec": statistics.median(samples),
+        "max_sec": max(samples),
+    }
+    return stats, result
+
+
+def _chain_from_fixture(path, admin):
+    """get_all_markets() のダンプから SimChain を作る（ベットは入らない）"""
+    with open(path, "r", encoding="utf-8") as f:
+        dumped = json.load(f)
+    chain = SimChain(admin=admin, block_time=0)
+    for i, m in enumerate(dumped):
+        chain.markets.append([i, m.get("title") or "", int(m.get("endTime") or 0), int(m.get("totalYes") or 0),
+                              int(m.get("totalNo") or 0), bool(m.get("resolved")), bool(m.get("outcome"))])
+    return chain, []
+
+
+def _web3_manager(chain, latency_ms):
+    """SimChain につながった本物の Web3Manager（読み出しキャッシュは切る）"""
+    os.environ.setdefault("PRIVATE_KEY", Account.create().key.hex())
+    os.environ.setdefault("CONTRACT_ADDRESS", SIM_CONTRACT_ADDRESS)
+    from utils.web3_manager import Web3Manager
+
+    manager = Web3Manager(provider=SimRPCProvider(chain, latency_ms=latency_ms))
+    manager.cache = BlockCache(max_size=0)
+    return manager
+
+
+def _add_votes(chain, sim, users, open_rows):
+    """募集中の市場に INCREMENTAL_VOTES 件の投票を送る（賭けている側があればそちらに）"""
+    if not len(open_rows):
+        return 0
+    market_id = int(chain.markets[int(open_rows[0])][0])
+    for user in users[:INCREMENTAL_VOTES]:
+        bet = chain.bets.get((user, market_id))
+        sim.as_user(user).vote(market_id, bet[1] if bet else True, 1)
+    return min(len(users), INCREMENTAL_VOTES)
+
+
+def run_size(n_markets, args, page_funcs):
+    """市場数 n_markets の 1 シナリオを測る"""
+    admin = Account.create().address
+    if args.fixture:
+        chain, users = _chain_from_fixture(args.fixture, admin)
+    else:
+        chain = SimChain(admin=admin, block_time=0)
+        users = chain.seed(n_markets, args.bettors, bets_per_user=args.bets_per_user, seed=args.seed)
+    n_markets = len(chain.markets)
+    bettor = users[0] if users else admin
+
+    sim = SimulatedWeb3Manager(chain=chain, address=admin)
+    manager = _web3_manager(chain, args.rpc_latency_ms)
+    provider = manager.w3.provider
+    cases = {}
+
+    def record(name, func, sizes=None, repeat=None):
+        trips_before = provider.round_trips
+        stats, result = _time(func, repeat or args.repeat)
+        stats["rpc_round_trips"] = (provider.round_trips - trips_before) // (repeat or args.repeat)
+        stats.update(sizes or {})
+        cases[name] = stats
+        print(f"  {name:32} median {stats['median_sec'] * 1000:10.2f} ms")
+        return result
+
+    raw = record("web3.get_all_markets", manager.get_all_markets)
+    record("web3.get_all_user_bets", lambda: manager.get_all_user_bets(bettor))
+
+    # 1_Main / 3_Results / touhyou が共通で使う市場モデル
+    markets = record("model.MarketTable.from_raw", lambda: MarketTable.from_raw(raw))
+    now_ts = int(time.time())
+
+    open_mask = markets.open_mask(now_ts)
+
+    def market_lists():
+        # 1_Main は募集中・終了済みそれぞれ 1 ページ分だけ dict にする
+        open_page = markets.window(np.flatnonzero(open_mask), sort="deadline", page_size=MAIN_PAGE_SIZE)
+        closed_page = markets.window(np.flatnonzero(~open_mask), sort="deadline", descending=True,
+                                     page_size=MAIN_PAGE_SIZE)
+        return (markets.to_dicts(open_page["rows"], now_ts), markets.to_dicts(closed_page["rows"], now_ts))
+
+    record("main.market_lists", market_lists, sizes={"page_size": MAIN_PAGE_SIZE})
+    # プールの大きい順の 2 ページ目（cursor から先を探す分も含めて測る）
+    open_rows = np.flatnonzero(open_mask)
+    first = markets.window(open_rows, sort="pool", descending=True, page_size=MAIN_PAGE_SIZE)
+    record("main.market_window_by_pool",
+           lambda: markets.window(open_rows, sort="pool", descending=True, page_size=MAIN_PAGE_SIZE,
+                                  cursor=first["next"]))
+
+    # ランキング: 全イベントの最初の取り込み、投票が増えたあとの差分の取り込み、1 ページ分の表示
+    leaderboard = Leaderboard(sim)
+    record("leaderboard.initial_sync", leaderboard.sync, repeat=1)
+    votes = _add_votes(chain, sim, users, markets.open_by_deadline(now_ts))
+    record("leaderboard.incremental_sync", leaderboard.sync, sizes={"new_votes": votes}, repeat=1)
+    record("results.ranking",
+           lambda: page_funcs["ranking"](leaderboard=leaderboard, rank_order="balance", rank_page=2,
+                                         rank_page_size=RANK_PAGE_SIZE),
+           sizes={"bettors": len(leaderboard)})
+    record("results.pool_dataframe", lambda: page_funcs["pool"](markets=markets, open_mask=open_mask))
+
+    # 2_Vote / 9_Admin の選択肢は MarketIndex から作る（索引はスナップショットごとに 1 回）
+    index = record("model.MarketIndex", lambda: MarketIndex(markets, raw))
+    record("vote.options", lambda: page_funcs["vote_options"](index=index, now_ts=now_ts))
+
+    # 4_Profile の戦績: ベットを読んで確定結果と突き合わせる（キャッシュ無しの 1 回目）
+    snapshot = MarketSnapshot(raw, 0, 1)
+    record("profile.accuracy", lambda: AccuracyService(sim).get(bettor, snapshot))
+
+    # 9_Admin の精算プレビュー: 大きな市場 1 つを Yes / No それぞれで確定した場合の全員の配当
+    rng = np.random.default_rng(args.seed)
+    amounts = rng.integers(1, 1000, SETTLEMENT_BETS)
+    sides = rng.random(SETTLEMENT_BETS) < 0.5
+    record("admin.settlement_preview", lambda: [settle(amounts, sides, outcome) for outcome in (True, False)],
+           sizes={"bets": SETTLEMENT_BETS})
+
+    # ローカル版のベット履歴: dict のリストと、列ごとのログ（mmap で開いて市場ごとに集計）
+    bet_dicts = [
+        {"user": user, "market_id": market_id, "choice": "yes" if is_yes else "no", "amount": amount,
+         "ts": "2025-12-05T06:02:39.928691"}
+        for (user, market_id), (amount, is_yes, _) in chain.bets.items()
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "bets.oclog")
+        BetLog.from_dicts(bet_dicts).save(log_path)
+        record("local.bets_json", lambda: json.loads(json.dumps(bet_dicts)), sizes={"bets": len(bet_dicts)})
+        record("local.bet_log_totals", lambda: BetLog.open(log_path).market_totals(),
+               sizes={"bets": len(bet_dicts)})
+
+    return {"markets": n_markets, "bettors": len(users), "cases": cases}
+
+
+def load_page_funcs():
+    """ページのスクリプトから計測対象のコードを抜き出す"""
+    return {
+        "ranking": load_snippet("3_Results.py", ["rank_rows", "df_rank"],
+                                inputs=["leaderboard", "rank_order", "rank_page", "rank_page_size"],
+                                output="df_rank"),
+        "pool": load_snippet("3_Results.py", ["top_by_pool", "odds", "pool_df"], inputs=["markets", "open_mask"],
+                             output="pool_df"),
+        "vote_options": load_snippet("2_Vote.py", ["options"], inputs=["index", "now_ts"], output="options"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Oracle Campus の市場データ処理を規模別に計測する")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="市場数（複数指定可）")
+    parser.add_argument("--bettors", type=int, default=DEFAULT_BETTORS, help="ベットするユーザー数")
+    parser.add_argument("--bets-per-user", type=int, default=20, help="1 人あたりのベット件数")
+    parser.add_argument("--repeat", type=int, default=3, help="1 ケースあたりの繰り返し回数")
+    parser.add_argument("--rpc-latency-ms", type=float, default=0, help="RPC 往復 1 回あたりの疑似遅延")
+    parser.add_argument("--fixture", help="get_all_markets() のダンプ JSON（指定時は --sizes を無視）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果の JSON（既定: benchmarks/results/bench-日時.json）")
+    args = parser.parse_args(argv)
+
+    page_funcs = load_page_funcs()
+    sizes = [None] if args.fixture else args.sizes
+    scenarios = []
+    for size in sizes:
+        print(f"markets={size if size is not None else args.fixture}")
+        scenarios.append(run_size(size or 0, args, page_funcs))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {k: v for k, v in vars(args).items() if k != "output"},
+        "scenarios": scenarios,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"結果を書き出しました: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,10 +6,17 @@ from datetime import datetime
 
 import streamlit as st
 import style_config as sc
+from utils.market_index import MarketIndex
+from utils.market_model import MarketTable
+from utils.live_view import get_live_watcher, live_balance, live_fragment, render_block_caption
+from utils.metrics_view import track_page
 
 #デザイン統一
 sc.apply_common_style()
 
+# このページの再実行で発生する RPC を数える
+track_page("1_Main")
+
 # ─────────────────────────────
 # 0. 互換性ありの再実行ヘルパー
 # ─────────────────────────────
@@ -37,22 +44,19 @@ def _safe_rerun():
 # ─────────────────────────────
 # 1. Web3 の安全な初期化（失敗時は None を返す）
 # ─────────────────────────────
-@st.cache_resource
 def get_web3_manager_safe():
     """
-    utils.web3_manager.Web3Manager をキャッシュ付きで生成する。
+    プロセス共通の Web3Manager を取得する（utils.registry が 1 回だけ生成する）。
 
     - 成功 : Web3Manager インスタンス
     - 失敗 : None（UI 側で「接続できません」と表示する）
     """
-    try:
-        from utils.web3_manager import Web3Manager
+    from utils.registry import get_web3_manager_safe as _get
 
-        mgr = Web3Manager()
-        return mgr
-    except Exception as e:
-        st.session_state.setdefault("_web3_init_error", str(e))
-        return None
+    mgr, error = _get()
+    if error:
+        st.session_state.setdefault("_web3_init_error", error)
+    return mgr
 
 
 # ─────────────────────────────
@@ -82,123 +86,186 @@ with col1:
         if st.session_state.get("_web3_init_error"):
             st.caption(st.session_state["_web3_init_error"])
     else:
-        if st.button("オンチェーン市場を更新"):
-            get_web3_manager_safe.clear()
-            web3_mgr = get_web3_manager_safe()
+        # 市場一覧のスナップショットだけを取り直す（Web3Manager はそのまま使う）
+        force_refresh = st.button("オンチェーン市場を更新")
 
 # 右カラム：オンチェーン市場データ取得
 with col2:
     if web3_mgr:
         try:
-            # ★ ここで Web3.py 経由でブロックチェーンのスマートコントラクトからデータ取得
-            onchain_raw = web3_mgr.get_all_markets() or []
+            from utils.registry import get_market_snapshots
+
+            # ★ 全ページ共通のスナップショットから読む（ページを移動しても取り直さない）
+            snapshot = get_market_snapshots().get(force=force_refresh)
+            # ★ ここが唯一のデータソース：オンチェーンのみ（MarketTable とその索引）
+            markets = snapshot.index
+            st.caption(f"ブロック #{snapshot.block} 時点の市場一覧（{int(snapshot.age)} 秒前に取得）")
         except Exception as e:
             st.warning(f"オンチェーン市場の取得に失敗しました: {e}")
-            onchain_raw = []
+            markets = MarketIndex(MarketTable.from_raw([]))
     else:
-        onchain_raw = []
+        markets = MarketIndex(MarketTable.from_raw([]))
 
 
-# onchain_raw をアプリ内部の market 形式に変換
-def _to_local_market(m):
-    """
-    Web3Manager.get_all_markets() が返す dict を、
-    アプリ内部で扱いやすい統一フォーマットに変換する。
-    """
-    try:
-        end_ts = int(m.get("endTime") or 0)
-    except Exception:
-        end_ts = 0
+# 新しいブロックを見張る係（市場一覧と残高はプロセスで 1 回だけ読み直され、ここでは読むだけ）
+watcher = get_live_watcher(web3_mgr.account.address) if web3_mgr else None
 
-    now_ts = int(time.time())
-    if m.get("resolved"):
-        status = "closed"
-    elif end_ts == 0 or end_ts > now_ts:
-        status = "open"
-    else:
-        status = "closed"
-
-    return {
-        "id": str(m.get("id")),
-        "title": m.get("title") or "タイトル未設定",
-        "description": m.get("description", "") or "",
-        "end_time": end_ts,
-        "yes_bets": int(m.get("totalYes", 0)),
-        "no_bets": int(m.get("totalNo", 0)),
-        "status": status,
-        "result": m.get("outcome") if m.get("resolved") else None,
-        "source": "onchain",
-    }
 
+def _live_markets():
+    """BlockWatcher が新しくしたスナップショットを読む（ここでは RPC を呼ばない）"""
+    if not web3_mgr:
+        return markets
+    from utils.registry import get_market_snapshots
 
-# ★ ここが唯一のデータソース：オンチェーンのみ
-markets = [_to_local_market(m) for m in onchain_raw]
+    snapshot = get_market_snapshots().current
+    return markets if snapshot is None else snapshot.index
 
 
 # ─────────────────────────────
 # 4. 自分のポイント情報（オンチェーン残高表示）
 # ─────────────────────────────
-st.markdown("### 👤 あなたのステータス")
-st.write(f"- ユーザーID：`{user_id}`")
+@live_fragment
+def _render_status():
+    st.markdown("### 👤 あなたのステータス")
+    st.write(f"- ユーザーID：`{user_id}`")
+
+    if web3_mgr:
+        try:
+            bal = live_balance(watcher, web3_mgr, web3_mgr.account.address)
+            st.write(f"- 所持ポイント（オンチェーン）：**{bal} OCP**")
+        except Exception as e:
+            st.warning(f"オンチェーン残高の取得に失敗しました: {e}")
+    else:
+        st.info("Web3 に接続できていないため、オンチェーン残高は表示できません。")
+    render_block_caption(watcher)
 
-if web3_mgr:
-    try:
-        bal = web3_mgr.get_balance()
-        st.write(f"- 所持ポイント（オンチェーン）：**{bal} OCP**")
-    except Exception as e:
-        st.warning(f"オンチェーン残高の取得に失敗しました: {e}")
-else:
-    st.info("Web3 に接続できていないため、オンチェーン残高は表示できません。")
+
+_render_status()
 
 st.divider()
 
 
-# ─────────────────────────────
-# 5. 募集中のイベント一覧（オンチェーンのみ）
-# ─────────────────────────────
-st.markdown("### 📈 募集中の予測イベント（オンチェーン）")
+# 一覧の 1 ページあたりの件数
+DEFAULT_PAGE_SIZE = int(os.getenv("MARKET_PAGE_SIZE", "20"))
+PAGE_SIZE_OPTIONS = sorted({10, 20, 50, 100, DEFAULT_PAGE_SIZE})
 
-open_markets = [m for m in markets if m.get("status") == "open"]
-open_markets.sort(key=lambda x: x.get("end_time", 0) or 0)
+SORT_LABELS = {
+    "deadline": "締め切り",
+    "pool": "プールの大きさ",
+    "yes_ratio": "Yes 率",
+}
 
-if not open_markets:
-    st.info("現在、投票受付中のイベントはありません。")
-else:
-    for m in open_markets:
-        st.markdown(f"#### 🟢 {m.get('title', 'タイトル未設定')}")
-        if desc := m.get("description"):
-            st.write(desc)
 
-        st.write(
-            f"- Yes 合計：**{m.get('yes_bets', 0)}** OCP  "
-            f"- No 合計：**{m.get('no_bets', 0)}** OCP  "
-            f"- ソース：`{m.get('source')}`"
-        )
+def _paged_rows(section, table, rows, default_desc):
+    """
+    並び順・件数・ページ送りの操作を出し、表示するページの行番号だけを返す
 
-        market_id = m.get("id")
-        if st.button("このイベントに投票する 🗳️", key=f"vote_{market_id}"):
-            st.session_state["selected_market"] = market_id
-            _safe_rerun()
+    ページ送りは「前のページの最後の行」を cursor にするキーセット方式。
+    開いたページの cursor を session_state に積んでおき、「前へ」で 1 つ戻る。
+    並び順などを変えたら 1 ページ目に戻る。
+    """
+    col_sort, col_order, col_size = st.columns([2, 1, 1])
+    sort = col_sort.selectbox(
+        "並び順", list(SORT_LABELS), format_func=SORT_LABELS.get, key=f"{section}_sort"
+    )
+    descending = col_order.selectbox(
+        "順序", [False, True], index=int(default_desc),
+        format_func=lambda d: "降順" if d else "昇順", key=f"{section}_desc",
+    )
+    page_size = col_size.selectbox(
+        "表示件数", PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE),
+        key=f"{section}_page_size",
+    )
+
+    # 締め切り順のときは、指定した日以降の締め切りから表示できる
+    start_cursor = None
+    if sort == "deadline":
+        start_date = st.date_input("この日以降の締め切りから表示", value=None, key=f"{section}_from")
+        if start_date is not None:
+            start_ts = int(datetime.combine(start_date, datetime.min.time()).timestamp())
+            # 降順なら「この日より前」から（翌日 0 時より前）
+            start_cursor = (start_ts + 86400, -1) if descending else (start_ts, -1)
+
+    settings = (sort, descending, page_size, start_cursor)
+    cursors_key = f"{section}_cursors"
+    if st.session_state.get(f"{section}_settings") != settings:
+        st.session_state[f"{section}_settings"] = settings
+        st.session_state[cursors_key] = [start_cursor]
+    cursors = st.session_state[cursors_key]
+
+    page = table.window(rows, sort=sort, descending=descending, page_size=page_size, cursor=cursors[-1])
+    # 表示中のページの市場が減って空になったら 1 ページ目に戻す
+    if not len(page["rows"]) and len(cursors) > 1:
+        st.session_state[cursors_key] = cursors = [start_cursor]
+        page = table.window(rows, sort=sort, descending=descending, page_size=page_size, cursor=start_cursor)
+
+    if page["total"]:
+        col_prev, col_info, col_next = st.columns([1, 2, 1])
+        # on_click で cursor を動かすので、押した回の再実行でもう新しいページが出る
+        col_prev.button("◀ 前へ", key=f"{section}_prev", disabled=len(cursors) <= 1, on_click=cursors.pop)
+        shown = len(page["rows"])
+        col_info.caption(f"{page['total']} 件中 {page['start'] + 1}〜{page['start'] + shown} 件目")
+        col_next.button("次へ ▶", key=f"{section}_next", disabled=page["next"] is None,
+                        on_click=cursors.append, args=(page["next"],))
+    return page["rows"]
+
+
+@live_fragment
+def _render_markets():
+    index = _live_markets()
+    table = index.table
+    # 募集中かどうかは時刻で決まるので、索引の締め切り順の配列を今の時刻で切り分ける
+    now_ts = int(time.time())
 
-        st.divider()
+    # ─────────────────────────────
+    # 5. 募集中のイベント一覧（オンチェーンのみ）
+    # ─────────────────────────────
+    st.markdown("### 📈 募集中の予測イベント（オンチェーン）")
 
+    open_rows = index.open_by_deadline(now_ts)
 
-# ─────────────────────────────
-# 6. 終了済みイベント（オンチェーン）
-# ─────────────────────────────
-st.markdown("### ✅ 終了したイベント（オンチェーン）")
+    if not len(open_rows):
+        st.info("現在、投票受付中のイベントはありません。")
+    else:
+        # dict にして描画するのは表示するページの分だけ
+        open_markets = table.to_dicts(_paged_rows("open_markets", table, open_rows, False), now_ts)
+        for m in open_markets:
+            st.markdown(f"#### 🟢 {m.get('title', 'タイトル未設定')}")
+            if desc := m.get("description"):
+                st.write(desc)
+
+            st.write(
+                f"- Yes 合計：**{m.get('yes_bets', 0)}** OCP  "
+                f"- No 合計：**{m.get('no_bets', 0)}** OCP  "
+                f"- ソース：`{m.get('source')}`"
+            )
+
+            market_id = m.get("id")
+            if st.button("このイベントに投票する 🗳️", key=f"vote_{market_id}"):
+                st.session_state["selected_market"] = market_id
+                _safe_rerun()
+
+            st.divider()
+
+    # ─────────────────────────────
+    # 6. 終了済みイベント（オンチェーン）
+    # ─────────────────────────────
+    st.markdown("### ✅ 終了したイベント（オンチェーン）")
+
+    closed_rows = index.closed(now_ts)
+
+    if not len(closed_rows):
+        st.write("まだ終了したイベントはありません。")
+    else:
+        closed_markets = table.to_dicts(_paged_rows("closed_markets", table, closed_rows, True), now_ts)
+        for m in closed_markets:
+            st.markdown(
+                f"- **{m.get('title', 'タイトル未設定')}**："
+                f"結果 → `{m.get('result', '未確定')}` （ソース：`{m.get('source')}`）"
+            )
 
-closed_markets = [m for m in markets if m.get("status") == "closed"]
-closed_markets.sort(key=lambda x: x.get("end_time", 0) or 0, reverse=True)
 
-if not closed_markets:
-    st.write("まだ終了したイベントはありません。")
-else:
-    for m in closed_markets:
-        st.markdown(
-            f"- **{m.get('title', 'タイトル未設定')}**："
-            f"結果 → `{m.get('result', '未確定')}` （ソース：`{m.get('source')}`）"
-        )
+_render_markets()
 
 
 # ─────────────────────────────
@@ -10,6 +10,13 @@ import style_config as sc
 sc.apply_common_style()
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.tx_view import remember_tx, render_tx_status
+from utils.metrics_view import track_page
+from utils.live_view import get_live_watcher, live_fragment, render_block_caption
+from utils.settlement import format_odds, implied_odds, quote
+
+# このページの再実行で発生する RPC を数える
+track_page("2_Vote")
 
 # ---------------------------------------------_
 # 🔒 ① ここにアクセス制限を追加！
@@ -31,29 +38,37 @@ load_dotenv()
 # オンチェーンのみで動作、database.json は使用しない
 # ═══════════════════════════════════════════════════════════════
 
-# Web3Manager を安全に初期化
-@st.cache_resource
-def get_web3_manager_safe():
-	try:
-		from utils.web3_manager import Web3Manager
-		mgr = Web3Manager()
-		return mgr, None  # (manager, error)
-	except Exception as e:
-		return None, str(e)
+# Web3Manager / 読み出し専用の非同期マネージャはプロセスで共有する（utils.registry）
+from utils.registry import get_async_bridge, get_market_snapshots, get_web3_manager_safe
 
 st.title("🗳️投票ページ ")
 
 # ─────────────────────────────
 # 接続状態を表示
 # ─────────────────────────────
-web3_mgr, web3_error = get_web3_manager_safe()
+web3_mgr, web3_error = get_web3_manager_safe()  # (manager, error)
 
 # 接続状態インジケーター
+bridge = get_async_bridge()
 if web3_mgr:
 	try:
-		is_connected = web3_mgr.w3.is_connected()
 		account_addr = web3_mgr.account.address
-		balance = web3_mgr.get_balance()
+		page_data = None
+		if bridge:
+			# 接続確認と残高は独立しているので並列に取得する（市場一覧はスナップショットから）
+			try:
+				page_data = bridge.gather(
+					is_connected=bridge.manager.is_connected(),
+					balance=bridge.manager.get_balance(),
+				)
+			except Exception:
+				page_data = None
+		if page_data:
+			is_connected = page_data["is_connected"]
+			balance = page_data["balance"]
+		else:
+			is_connected = web3_mgr.is_connected()
+			balance = web3_mgr.get_balance()
 		
 		# 接続成功時の表示
 		col1, col2, col3 = st.columns(3)
@@ -65,6 +80,7 @@ if web3_mgr:
 			st.metric("所持ポイント", f"{balance} OCP")
 		
 		st.info(f"ウォレット: `{account_addr}`")
+		render_tx_status(web3_mgr)
 		
 	except Exception as e:
 		st.error(f"❌ 接続情報取得エラー: {e}")
@@ -90,11 +106,16 @@ st.divider()
 # ─────────────────────────────
 with st.spinner("ブロックチェーンから市場情報を取得中…"):
 	try:
-		markets = web3_mgr.get_all_markets() or []
+		# 全ページ共通のスナップショット（他のページで取得済みならそれを使う）
+		snapshot = get_market_snapshots().get()
 	except Exception as e:
 		st.error(f"市場データ取得エラー: {e}")
 		st.stop()
 
+markets = snapshot.markets or []
+# 市場 ID の索引と締め切り順の一覧（スナップショットごとに 1 回だけ作られる）
+index = snapshot.index
+
 if not markets:
 	st.warning("現在、投票可能なイベントがありません。")
 	st.stop()
@@ -115,40 +136,28 @@ if not selected_market:
 		if markets:
 			st.json(markets[0])
 	
-	options = []
-	for m in markets:
-		now_ts = int(time.time())
-		for m in markets:
-			# 除外条件: すでに resolved のもの
-			if m.get("resolved"):
-				continue
-			# 除外条件: endTime が設定されていて締め切りを過ぎているもの
-			try:
-				end_ts = int(m.get("endTime", 0) or 0)
-			except Exception:
-				end_ts = 0
-			if end_ts != 0 and end_ts <= now_ts:
-				# 締め切りを過ぎているため選択肢に含めない
-				continue
-			# 表示ラベル作成
-			title = m.get('title', 'タイトル未設定')
-			yes_total = m.get('totalYes', 0)
-			no_total = m.get('totalNo', 0)
-			option_label = f"{title} (Yes: {yes_total} / No: {no_total} OCP)"
-			options.append((str(m.get("id")), option_label))
+	# 選択肢は募集中（未確定で締め切り前）の市場だけ、締め切りが近い順。ID の重複は索引で除いてある
+	now_ts = int(time.time())
+	options = index.choices(index.open_by_deadline(now_ts))
 	
 	if not options:
 		st.warning("現在、投票受付中のイベントはありません。")
 		st.stop()
 	
+	def _option_label(market_id):
+		# 表示ラベル作成（索引から O(1) で引く）
+		m = index.raw(market_id)
+		title = m.get('title') or 'タイトル未設定'
+		return f"{title} (Yes: {m.get('totalYes', 0)} / No: {m.get('totalNo', 0)} OCP)"
+	
 	sel = st.selectbox(
 		"投票するイベント",
 		options=options,
-		format_func=lambda x: x[1]
+		format_func=_option_label
 	)
 	
 	if st.button("このイベントを選択"):
-		st.session_state["selected_market"] = sel[0]
+		st.session_state["selected_market"] = str(sel)
 		st.rerun()
 	
 	st.stop()
@@ -157,7 +166,7 @@ if not selected_market:
 # 選択したマーケット詳細表示
 # ─────────────────────────────
 mid = str(selected_market)
-market = next((m for m in markets if str(m.get("id")) == mid), None)
+market = index.raw(mid)
 
 if not market:
 	st.error("選択したイベントが見つかりません。")
@@ -183,20 +192,38 @@ if not is_open:
 
 st.success("✅ 投票受付中です")
 
-# 投票結果表示
-col1, col2 = st.columns(2)
-with col1:
-	st.metric("Yes 投票合計", f"{market.get('totalYes', 0)} OCP")
-with col2:
-	st.metric("No 投票合計", f"{market.get('totalNo', 0)} OCP")
+# 新しいブロックを見張る係（合計額はプロセスで 1 回だけ読み直され、ここでは読むだけ）
+watcher = get_live_watcher()
 
-# Yes率表示
-total_pool = int(market.get('totalYes', 0) or 0) + int(market.get('totalNo', 0) or 0)
-if total_pool > 0:
-	yes_ratio = int(market.get('totalYes', 0) or 0) / total_pool
-	st.progress(yes_ratio, text=f"Yes率: {int(yes_ratio * 100)}%")
-else:
-	st.text("まだ投票がありません")
+
+@live_fragment
+def _render_totals():
+	# BlockWatcher が新しくしたスナップショットから、この市場の最新の合計額を読む
+	live = market
+	snapshot = get_market_snapshots().current
+	if snapshot is not None:
+		live = snapshot.index.raw(mid) or market
+
+	# 投票結果表示
+	col1, col2 = st.columns(2)
+	with col1:
+		st.metric("Yes 投票合計", f"{live.get('totalYes', 0)} OCP")
+	with col2:
+		st.metric("No 投票合計", f"{live.get('totalNo', 0)} OCP")
+
+	# Yes率表示
+	total_pool = int(live.get('totalYes', 0) or 0) + int(live.get('totalNo', 0) or 0)
+	if total_pool > 0:
+		yes_ratio = int(live.get('totalYes', 0) or 0) / total_pool
+		st.progress(yes_ratio, text=f"Yes率: {int(yes_ratio * 100)}%")
+		odds = implied_odds(int(live.get('totalYes', 0) or 0), int(live.get('totalNo', 0) or 0))
+		st.caption(f"今の配当倍率: Yes {format_odds(odds['yes_odds'])} / No {format_odds(odds['no_odds'])}")
+	else:
+		st.text("まだ投票がありません")
+	render_block_caption(watcher)
+
+
+_render_totals()
 
 st.divider()
 
@@ -211,6 +238,12 @@ with col1:
 with col2:
 	amount = st.number_input("投入ポイント", min_value=1, value=10, step=1)
 
+# 今のプールにこの金額を足したときの見込み配当（コントラクトと同じ pari-mutuel の計算）
+_latest = get_market_snapshots().current
+_pool = (_latest.index.raw(mid) if _latest is not None else None) or market
+_payout = int(quote(int(_pool.get('totalYes', 0) or 0), int(_pool.get('totalNo', 0) or 0), choice == "Yes", int(amount)))
+st.info(f"{choice} が当たった場合の受け取り見込み: **{_payout} OCP**（損益 {_payout - int(amount):+d} OCP。この後の投票で変わります）")
+
 # ─────────────────────────────
 # 投票送信ボタン
 # ─────────────────────────────
@@ -219,26 +252,10 @@ if st.button("投票する（トランザクション送信）", type="primary")
 	
 	with st.spinner("🔄 ブロックチェーンにトランザクションを送信中…"):
 		try:
-			receipt = web3_mgr.vote(int(market.get("id")), is_yes, int(amount))
-			
-			# トランザクションハッシュ取得
-			tx_hash = receipt.transactionHash.hex() if hasattr(receipt, "transactionHash") else str(receipt)
-			
-			st.success("✅ 投票がブロックチェーンに記録されました！")
-			
-			st.json({
-				"トランザクションハッシュ": tx_hash,
-				"マーケットID": market.get("id"),
-				"投票内容": choice,
-				"投入ポイント": amount,
-				"ステータス": "成功"
-			})
-			
-			# Etherscan リンク表示
-			etherscan_url = f"https://sepolia.etherscan.io/tx/{tx_hash}"
-			st.markdown(f"📍 **[Etherscan で トランザクションを確認]({etherscan_url})**")
-			
-			time.sleep(2)
+			# 採掘は待たずにすぐ戻る（状態は上の「送信したトランザクション」に表示）
+			handle = web3_mgr.vote(int(market.get("id")), is_yes, int(amount))
+			remember_tx(handle)
+			st.toast(f"✅ 投票を送信しました（{choice} / {amount} OCP）")
 			
 			# 選択をリセット
 			st.session_state.pop("selected_market", None)
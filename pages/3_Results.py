@@ -1,70 +1,39 @@
 import time
-from typing import Dict, List
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import style_config as sc
+from utils import registry
+from utils.market_model import MarketTable
+from utils.metrics_view import track_page
+from utils.settlement import implied_odds, rewards
+from utils.tx_view import remember_tx, render_tx_status
 
 #デザイン統一
 sc.apply_common_style()
 
+# このページの再実行で発生する RPC を数える
+track_page("3_Results")
 
-@st.cache_resource
-def get_web3_manager_safe():
-    """Create Web3Manager with caching; return None when setup fails."""
-    try:
-        from utils.web3_manager import Web3Manager
-
-        return Web3Manager()
-    except Exception as exc:  # noqa: BLE001
-        st.session_state.setdefault("_web3_init_error", str(exc))
-        return None
-
-
-def _normalize_market(raw: Dict) -> Dict:
-    """Convert contract market dict into a uniform shape used in the UI."""
-    try:
-        end_ts = int(raw.get("endTime") or 0)
-    except Exception:  # noqa: BLE001
-        end_ts = 0
 
-    now_ts = int(time.time())
-    if raw.get("resolved"):
-        status = "closed"
-    elif end_ts == 0 or end_ts > now_ts:
-        status = "open"
-    else:
-        status = "closed"
-
-    return {
-        "id": str(raw.get("id")),
-        "title": raw.get("title") or "タイトル未設定",
-        "end_time": end_ts,
-        "yes_bets": int(raw.get("totalYes", 0)),
-        "no_bets": int(raw.get("totalNo", 0)),
-        "status": status,
-        "result": raw.get("outcome") if raw.get("resolved") else None,
-    }
+def get_web3_manager_safe():
+    """Return the process-wide Web3Manager; None when setup fails."""
+    mgr, error = registry.get_web3_manager_safe()
+    if error:
+        st.session_state.setdefault("_web3_init_error", error)
+    return mgr
 
 
-def _pull_markets(web3_mgr) -> List[Dict]:
+def _pull_markets(web3_mgr) -> MarketTable:
     if not web3_mgr:
-        return []
+        return MarketTable.from_raw([])
     try:
-        onchain_raw = web3_mgr.get_all_markets() or []
+        # 全ページ共通のスナップショットから読む（ページを移動しても取り直さない）
+        return registry.get_market_snapshots().get().table
     except Exception as exc:  # noqa: BLE001
         st.warning(f"オンチェーン市場の取得に失敗しました: {exc}")
-        return []
-    return [_normalize_market(m) for m in onchain_raw]
-
-
-def _parse_address_lines(raw: str) -> List[str]:
-    addrs = []
-    for line in raw.splitlines():
-        addr = line.strip()
-        if addr:
-            addrs.append(addr)
-    return addrs
+        return MarketTable.from_raw([])
 
 
 st.title("🏆結果・ランキング")
@@ -75,10 +44,23 @@ if not user_id:
     st.stop()
 
 web3_mgr = get_web3_manager_safe()
+bridge = registry.get_async_bridge()
+
+# このページで使う読み出しは互いに独立なので、まとめて並列に取得する
+page_data = {}
+if web3_mgr and bridge:
+    try:
+        page_data = bridge.gather(
+            is_connected=bridge.manager.is_connected(),
+            balance=bridge.manager.get_balance(),
+        )
+    except Exception:  # noqa: BLE001
+        page_data = {}
 
 status_col1, status_col2 = st.columns(2)
 with status_col1:
-    if web3_mgr and web3_mgr.w3.is_connected():
+    is_connected = page_data["is_connected"] if "is_connected" in page_data else bool(web3_mgr and web3_mgr.is_connected())
+    if web3_mgr and is_connected:
         st.success("Web3 接続中 ✅")
     else:
         st.error("Web3 接続に失敗しました。環境変数と ABI を確認してください。")
@@ -94,22 +76,25 @@ if not web3_mgr:
 with st.spinner("オンチェーンから市場データを取得中..."):
     markets = _pull_markets(web3_mgr)
 
-open_markets = [m for m in markets if m.get("status") == "open"]
-closed_markets = [m for m in markets if m.get("status") == "closed"]
+# 募集中かどうか・プール合計は全件まとめて計算する
+now_ts = int(time.time())
+open_mask = markets.open_mask(now_ts)
+open_count = int(open_mask.sum())
 
-total_volume = sum(m.get("yes_bets", 0) + m.get("no_bets", 0) for m in markets)
+total_volume = int(markets.pool.sum())
 
 metric_cols = st.columns(3)
-metric_cols[0].metric("開催中の市場", len(open_markets))
-metric_cols[1].metric("終了した市場", len(closed_markets))
+metric_cols[0].metric("開催中の市場", open_count)
+metric_cols[1].metric("終了した市場", len(markets) - open_count)
 metric_cols[2].metric("合計プールサイズ", total_volume)
 
 st.markdown("---")
 
 # 自分のアドレスと残高表示
 my_address = web3_mgr.account.address
-current_balance = web3_mgr.get_balance()
+current_balance = page_data["balance"] if "balance" in page_data else web3_mgr.get_balance()
 st.metric("現在の所持ポイント", f"{current_balance} OCP")
+render_tx_status(web3_mgr)
 
 st.divider()
 
@@ -117,7 +102,7 @@ st.divider()
 st.subheader("💰 配当を受け取る")
 
 # 解決済み（結果が出た）市場を取得
-closed_markets_list = [m for m in markets if m.get("status") == "closed"]
+closed_markets_list = markets.to_dicts(np.flatnonzero(~open_mask), now_ts)
 
 if not closed_markets_list:
     st.info("終了したイベントはまだありません。")
@@ -126,57 +111,77 @@ else:
     options = {str(m.get("id")): f"{m.get('title')} (結果: {'Yes' if m.get('result') else 'No'})" for m in closed_markets_list}
     selected_id = st.selectbox("結果が出たイベントを選択", options.keys(), format_func=lambda x: options[x])
 
+    # 自分のベットから受け取れる額を先に見せる（コントラクトの claimReward と同じ計算）
+    closed_by_id = {str(m.get("id")): m for m in closed_markets_list}
+    selected = closed_by_id[selected_id]
+    my_bet = web3_mgr.get_user_bet(my_address, int(selected_id))
+    if selected.get("result") is None:
+        st.caption("まだ結果が確定していません。")
+    elif not my_bet["amount"]:
+        st.caption("このイベントには賭けていません。")
+    elif my_bet["claimed"]:
+        st.caption("このイベントの配当は受け取り済みです。")
+    else:
+        my_reward = int(rewards(my_bet["amount"], my_bet["isYes"], selected["result"],
+                                selected["yes_bets"], selected["no_bets"]))
+        if my_reward:
+            st.caption(f"受け取れる配当: **{my_reward} OCP**（賭け額 {my_bet['amount']} OCP）")
+        else:
+            st.caption(f"外れでした（賭け額 {my_bet['amount']} OCP）")
+
     if st.button("配当を請求する (Claim Reward)"):
         with st.spinner("ブロックチェーンを確認中..."):
             try:
-                # スマートコントラクトを実行
-                receipt = web3_mgr.claim_reward(int(selected_id))
-                
+                # スマートコントラクトを実行（採掘は待たずにすぐ戻る）
+                handle = web3_mgr.claim_reward(int(selected_id))
+                remember_tx(handle)
+
                 st.balloons()
-                st.success("🎉 配当を受け取りました！")
-                tx_hash = getattr(receipt, 'transactionHash', None)
-                if tx_hash:
-                    st.markdown(f"Tx Hash: `{tx_hash.hex()}`")
-                
-                # 残高が増えたことを確認するためにリロード
-                time.sleep(2)
-                st.rerun()
+                st.success("🎉 配当の請求を送信しました！記録されると残高に反映されます。")
+                st.markdown(f"Tx Hash: `{handle.tx_hash}`")
                 
             except Exception as e:
                 st.error("受け取り失敗（または既に受け取り済み/外れ）")
                 st.error(f"詳細: {e}")
 
 st.markdown("---")
-st.subheader("👑ウォレット別ランキング（残高順）")
-
-default_block = getattr(web3_mgr.account, "address", "")
-address_block = default_block
-
-addresses = set(_parse_address_lines(address_block))
-if default_block:
-    addresses.add(default_block)
-
-rows = []
-for addr in addresses:
-    try:
-        bal = web3_mgr.get_balance(addr)
-        bets = web3_mgr.get_all_user_bets(addr)
-        total_staked = sum(int(b.get("amount", 0)) for b in bets)
-        rows.append(
-            {
-                "address": addr,
-                "balance": bal,
-                "active_bets": len(bets),
-                "total_staked": total_staked,
-            }
-        )
-    except Exception as exc:  # noqa: BLE001
-        st.warning(f"{addr} の取得に失敗しました: {exc}")
+st.subheader("👑ウォレット別ランキング")
+
+RANK_ORDERS = {"balance": "残高順", "pnl": "確定損益順"}
+RANK_PAGE_SIZES = [20, 50, 100]
+
+leaderboard = None
+rank_rows = []
+try:
+    # 全参加者の集計はプロセスで共有していて、前回の続きのブロックのイベントだけを取り込む
+    leaderboard = registry.get_leaderboard()
+    with st.spinner("ランキングを更新中..."):
+        # インデクサが無いときは、自分のアドレスを含む知っているウォレットだけで作る
+        leaderboard.sync([my_address])
+except Exception as exc:  # noqa: BLE001
+    st.warning(f"ランキングの取得に失敗しました: {exc}")
+
+if leaderboard is not None and not leaderboard.indexed:
+    st.caption("イベントインデクサ（INDEXER_START_BLOCK）が未設定のため、このアプリで見たウォレットだけのランキングです。")
+
+if leaderboard is not None and len(leaderboard):
+    rank_col1, rank_col2, rank_col3 = st.columns([2, 1, 1])
+    rank_order = rank_col1.selectbox("並び順", list(RANK_ORDERS), format_func=RANK_ORDERS.get, key="rank_order")
+    rank_page_size = rank_col2.selectbox("表示件数", RANK_PAGE_SIZES, index=len(RANK_PAGE_SIZES) - 1, key="rank_page_size")
+    rank_pages = max(1, -(-len(leaderboard) // rank_page_size))
+    # 件数や人数が変わるとページの選択肢も変わるので、key は付けずに 1 ページ目に戻す
+    rank_page = rank_col3.selectbox("ページ", range(1, rank_pages + 1))
+
+    my_rank = leaderboard.rank_of(my_address, rank_order)
+    st.caption(
+        f"{len(leaderboard)} ウォレット中 {(rank_page - 1) * rank_page_size + 1}位〜"
+        + (f" ／ あなたは {my_rank} 位" if my_rank else " ／ あなたはまだランキングに載っていません")
+    )
+    # ソート済みのランキングから表示するページの分だけ取り出す
+    rank_rows = leaderboard.page(rank_order, (rank_page - 1) * rank_page_size, rank_page_size)
 
-if rows:
-    df_rank = pd.DataFrame(rows)
-    df_rank = df_rank.sort_values(by=["balance", "total_staked"], ascending=False).reset_index(drop=True)
-    df_rank.insert(0, "rank", df_rank.index + 1)
+if rank_rows:
+    df_rank = pd.DataFrame(rank_rows, columns=["rank", "address", "balance", "total_staked", "bets", "wins", "losses", "pnl"])
     st.dataframe(
         df_rank,
         use_container_width=True,
@@ -184,7 +189,10 @@ if rows:
         column_config={
             "balance": st.column_config.NumberColumn("残高 (OCP)", format="%d"),
             "total_staked": st.column_config.NumberColumn("累計ベット額", format="%d"),
-            "active_bets": st.column_config.NumberColumn("ベット件数"),
+            "bets": st.column_config.NumberColumn("ベット件数"),
+            "wins": st.column_config.NumberColumn("的中"),
+            "losses": st.column_config.NumberColumn("外れ"),
+            "pnl": st.column_config.NumberColumn("確定損益 (OCP)", format="%d"),
         },
     )
 else:
@@ -193,27 +201,24 @@ else:
 st.markdown("---")
 st.subheader("市場の結果とプールランキング")
 
-if not markets:
+if not len(markets):
     st.info("オンチェーン市場がまだありません。")
 else:
-    top_by_pool = sorted(
-        markets,
-        key=lambda m: m.get("yes_bets", 0) + m.get("no_bets", 0),
-        reverse=True,
-    )
-    st.caption("プール=Yes/Noに積まれたOCPの合計です。")
+    top_by_pool = markets.by_pool()
+    st.caption("プール=Yes/Noに積まれたOCPの合計です。倍率は当たったときに 1 OCP あたり戻る額（今のプールで計算）です。")
+    odds = implied_odds(markets.yes_bets[top_by_pool], markets.no_bets[top_by_pool])
+    # 列ごとに配列から直接 DataFrame を作る（1 件ずつ dict を作らない）
     pool_df = pd.DataFrame(
-        [
-            {
-                "title": m.get("title"),
-                "status": m.get("status"),
-                "result": m.get("result", "未確定"),
-                "pool": m.get("yes_bets", 0) + m.get("no_bets", 0),
-                "yes": m.get("yes_bets", 0),
-                "no": m.get("no_bets", 0),
-            }
-            for m in top_by_pool
-        ]
+        {
+            "title": [markets.titles[i] for i in top_by_pool.tolist()],
+            "status": np.where(open_mask[top_by_pool], "open", "closed"),
+            "result": np.where(markets.resolved[top_by_pool], markets.outcome[top_by_pool], None),
+            "pool": markets.pool[top_by_pool],
+            "yes": markets.yes_bets[top_by_pool],
+            "no": markets.no_bets[top_by_pool],
+            "yes_odds": odds["yes_odds"],
+            "no_odds": odds["no_odds"],
+        }
     )
     st.dataframe(
         pool_df,
@@ -223,5 +228,7 @@ else:
             "pool": st.column_config.NumberColumn("プール合計", format="%d"),
             "yes": st.column_config.NumberColumn("Yes", format="%d"),
             "no": st.column_config.NumberColumn("No", format="%d"),
+            "yes_odds": st.column_config.NumberColumn("Yes 倍率", format="x%.2f"),
+            "no_odds": st.column_config.NumberColumn("No 倍率", format="x%.2f"),
         },
     )
\ No newline at end of file
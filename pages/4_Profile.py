@@ -7,13 +7,18 @@ sc.apply_common_style()
 
 
 try:
-    from utils.web3_manager import Web3Manager
+    from utils.accuracy import SBT_MIN_ACCURACY, SBT_MIN_BETS
+    from utils.registry import get_accuracy_service, get_market_snapshots, get_web3_manager
+    from utils.tx_view import remember_tx, render_tx_status
+    from utils.metrics_view import track_page
 except ImportError:
     st.error("utils/web3_manager.py が見つかりません")
     st.stop()
 
 def app():
     st.set_page_config(page_title="マイプロフィール", page_icon="👤")
+    # このページの再実行で発生する RPC を数える
+    track_page("4_Profile")
     user_id = st.session_state.get("user_id")
     if not user_id:
         st.warning("まずトップページでユーザーを選択してください。")
@@ -22,7 +27,7 @@ def app():
     display_name = user_id
     st.title(f"👤{display_name}さんのプロフィール&実績")
     try:
-        manager = Web3Manager()
+        manager = get_web3_manager()
     except Exception as e:
         st.error("Web3接続エラー")
         st.stop()
@@ -36,37 +41,30 @@ def app():
     # 残高表示
     balance = manager.get_my_balance()
     st.metric("現在の資産", f"{balance} OCP")
+    render_tx_status(manager)
 
     st.divider()
 
-    # 2. 的中率の計算（Pythonで頑張るパート）
+    # 2. 的中率の計算
     st.subheader("📊 予言の戦績")
 
-    # 全市場データを取得
-    all_markets = manager.get_all_markets()
-
-    # 集計用変数
-    total_bets = 0
-    wins = 0
-
-    # ※注意: ここは簡易ロジックです。
-    # 本当は「自分が賭けた履歴」を保存しておくべきですが、
-    # 今回は「結果が出た市場」をループして「もし賞金を請求済みなら勝ち」とみなす等の工夫が必要です。
-    # 5週間開発用の「簡略化ロジック」として、ここではデモ用に数字をシミュレーションします。
-    # ★プレゼン本番では、手動で変数をいじって「80%超え」を見せるとスムーズです！
-
-    # --- デモ用ダミーロジック (プレゼンで動かす用) ---
-    # 実際はここでデータベース等から履歴を引く
-    total_bets = 10  # 仮: 10回参加
-    wins = 8         # 仮: 8回的中
-    # -------------------------------------------
+    # 自分のベットと、全ページ共通の市場スナップショットの確定結果を突き合わせる
+    # （ベットはアドレスごとにキャッシュされ、新しく確定した市場の分だけ足される）
+    try:
+        stats = get_accuracy_service().get(my_address, get_market_snapshots().get())
+    except Exception as e:
+        st.error(f"戦績の取得に失敗しました: {e}")
+        st.stop()
 
-    accuracy = (wins / total_bets) * 100 if total_bets > 0 else 0
+    settled = stats["settled"]
+    wins = stats["wins"]
+    accuracy = stats["accuracy"]
 
-    col1, col2, col3 = st.columns(3)
-    col1.metric("参加回数", f"{total_bets} 回")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("参加回数", f"{stats['bets']} 回", help=f"うち結果が出たもの {settled} 回")
     col2.metric("的中回数", f"{wins} 回")
     col3.metric("的中率", f"{accuracy:.1f} %")
+    col4.metric("確定損益", f"{stats['pnl']:+d} OCP")
 
     st.divider()
 
@@ -82,17 +80,18 @@ def app():
         st.caption("このバッジはブロックチェーンに刻まれ、他人に譲渡することはできません。")
 
     else:
-        if accuracy >= 80 and total_bets >= 5:
-            st.info("🔥 おめでとうございます！的中率が80%を超えました。")
+        if stats["sbt_eligible"]:
+            st.info(f"🔥 おめでとうございます！的中率が{SBT_MIN_ACCURACY:.0f}%を超えました。")
             st.write("予言者の称号（SBT）を獲得できます。")
             
             if st.button("SBTを受け取る (Mint)"):
                 with st.spinner("ブロックチェーンに称号を刻んでいます..."):
-                    manager.mint_sbt(my_address)
+                    remember_tx(manager.mint_sbt(my_address))
                     st.balloons()
-                    st.success("獲得しました！リロードしてください。")
+                    st.success("送信しました！記録されると自動で表示が切り替わります。")
         else:
-            st.warning("🔒 バッジ獲得条件: 5回以上参加し、的中率80%以上")
-            st.write(f"あと {5 - total_bets} 回の参加が必要です。")
+            st.warning(f"🔒 バッジ獲得条件: 結果が出た参加が{SBT_MIN_BETS}回以上で、的中率{SBT_MIN_ACCURACY:.0f}%以上")
+            if settled < SBT_MIN_BETS:
+                st.write(f"あと {SBT_MIN_BETS - settled} 回、結果が出た参加が必要です。")
 if __name__ == "__main__":
     app()
\ No newline at end of file
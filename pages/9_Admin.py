@@ -111,18 +111,33 @@ if user_id != "admin":
     st.error("⛔️ アクセス権限がありません！")
     st.warning("このページは管理者専用です。サイドバーから他のページに移動してください。")
     st.stop()  # ←これで処理を強制終了させる
-from utils.web3_manager import Web3Manager
+import numpy as np
+import pandas as pd
+from utils.registry import get_leaderboard, get_market_snapshots, get_web3_manager
+from utils.settlement import settle
+from utils.tx_view import remember_tx, render_tx_status
+from utils.bulk_admin import read_create_csv, read_resolve_csv
+from utils.metrics_view import render_metrics_panel, track_page
+
+# このページの再実行で発生する RPC を数える
+track_page("9_Admin")
 # 1. Web3接続チェック
 try:
-    manager = Web3Manager()
-    st.success("Web3 接続成功 ✅")
+    manager = get_web3_manager()
+    st.success("Web3 準備完了 ✅")
 except Exception as e:
     st.error(f"Web3接続エラー: {e}")
     st.warning("⚠️ .envファイルの設定を確認してください。")
     st.stop()
 
+# 送信したトランザクションの状態（採掘待ち / 記録済み / 失敗）
+render_tx_status(manager)
+
+# サイドバー: ページごとの RPC 使用量（折りたたみ）
+render_metrics_panel()
+
 # タブで機能を分ける
-tab1, tab2 = st.tabs(["📝 マーケット作成", "⚖️ 結果確定 (Oracle)"])
+tab1, tab2, tab3 = st.tabs(["📝 マーケット作成", "⚖️ 結果確定 (Oracle)", "📦 一括操作 (CSV)"])
 
 # -------------------------
 # ① マーケット作成 UI
@@ -170,10 +185,11 @@ with tab1:
                 with st.spinner("ブロックチェーンに書き込み中... (署名して送信)"):
                     try:
                         # 整数に変換して渡す
-                        tx_receipt = manager.create_market(title, int(duration_sec))
-                        
-                        st.success("マーケット作成成功！ブロックチェーンに刻まれました。")
-                        st.write(f"Tx Hash: `{tx_receipt['transactionHash'].hex()}`")
+                        handle = manager.create_market(title, int(duration_sec))
+                        remember_tx(handle)
+
+                        st.success("マーケット作成を送信しました！記録されると一覧に表示されます。")
+                        st.write(f"Tx Hash: `{handle.tx_hash}`")
                         st.balloons()
                     except Exception as e:
                         st.error(f"作成失敗: {e}")
@@ -185,28 +201,28 @@ with tab2:
     st.header("結果の確定 (Oracle機能)")
     st.caption("イベントが終了したら、ここで正解を入力して配当を分配可能にします。")
     
-    # Web3から最新データを取得
+    # 全ページ共通の市場スナップショットから取得（採掘されると自動で取り直す）
     try:
-        markets = manager.get_all_markets()
+        index = get_market_snapshots().get().index
     except Exception as e:
         st.error("データ取得失敗")
         st.stop()
     
-    # まだ解決していない(resolved=False)市場だけ抽出
-    active_markets = [m for m in markets if not m['resolved']]
+    # まだ解決していない(resolved=False)市場だけ。締め切りを過ぎたものが先
+    active_ids = index.choices(index.unresolved())
     
-    if not active_markets:
+    if not active_ids:
         st.info("現在、結果待ちのイベントはありません。")
     else:
-        # ドロップダウンで選ばせる
+        # ドロップダウンで選ばせる（ラベルは索引から O(1) で引く）
         selected_market_id = st.selectbox(
             "結果を確定するイベントを選択",
-            options=[m['id'] for m in active_markets],
-            format_func=lambda x: f"ID:{x} {next((m['title'] for m in active_markets if m['id']==x), '')}"
+            options=active_ids,
+            format_func=lambda x: f"ID:{x} {index.raw(x)['title']}"
         )
         
         # 選ばれた市場の情報を表示
-        target = next((m for m in active_markets if m['id'] == selected_market_id), None)
+        target = index.raw(selected_market_id)
         
         if target:
             st.info(f"イベント: **{target['title']}**")
@@ -219,16 +235,111 @@ with tab2:
             if datetime.now() < deadline:
                 st.warning("⚠️ 注意: まだ締め切り時刻を過ぎていません。今確定すると早期終了になります。")
             
+            # 確定したときの精算（賭けている全員の配当）を YES / NO それぞれで先に見る
+            if st.toggle("💹 精算プレビューを表示", key="settlement_preview"):
+                positions = None
+                try:
+                    leaderboard = get_leaderboard()
+                    with st.spinner("ベットを集計中..."):
+                        leaderboard.sync()
+                    positions = leaderboard.positions(target['id'])
+                    if not leaderboard.indexed:
+                        st.warning("イベントインデクサ（INDEXER_START_BLOCK）が未設定のため、このアプリで見たウォレットの分だけです。")
+                except Exception as e:
+                    st.warning(f"ベットの取得に失敗しました: {e}")
+
+                if positions is not None and not positions["addresses"]:
+                    st.info("このイベントにはまだ誰も賭けていません。")
+                elif positions is not None:
+                    previews = {
+                        label: settle(positions["amounts"], positions["is_yes"], outcome,
+                                      int(target['totalYes']), int(target['totalNo']))
+                        for label, outcome in (("YES", True), ("NO", False))
+                    }
+                    st.dataframe(
+                        pd.DataFrame(
+                            {
+                                "outcome": list(previews),
+                                "winners": [p["winners"] for p in previews.values()],
+                                "losers": [p["losers"] for p in previews.values()],
+                                "paid": [p["paid"] for p in previews.values()],
+                                "dust": [p["dust"] for p in previews.values()],
+                                "max_reward": [int(p["reward"].max()) for p in previews.values()],
+                            }
+                        ),
+                        hide_index=True,
+                        column_config={
+                            "outcome": "結果",
+                            "winners": st.column_config.NumberColumn("当たり（人）"),
+                            "losers": st.column_config.NumberColumn("外れ（人）"),
+                            "paid": st.column_config.NumberColumn("配当の合計", format="%d"),
+                            "dust": st.column_config.NumberColumn("未払い（切り捨て分）", format="%d"),
+                            "max_reward": st.column_config.NumberColumn("最大の配当", format="%d"),
+                        },
+                    )
+                    detail = st.radio("明細を見る結果", list(previews), horizontal=True, key="settlement_preview_outcome")
+                    preview = previews[detail]
+                    st.dataframe(
+                        pd.DataFrame(
+                            {
+                                "address": positions["addresses"],
+                                "side": np.where(positions["is_yes"], "Yes", "No"),
+                                "amount": positions["amounts"],
+                                "reward": preview["reward"],
+                                "pnl": preview["pnl"],
+                            }
+                        ).sort_values("pnl", ascending=False),
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "amount": st.column_config.NumberColumn("賭け額", format="%d"),
+                            "reward": st.column_config.NumberColumn("配当", format="%d"),
+                            "pnl": st.column_config.NumberColumn("損益", format="%d"),
+                        },
+                    )
+
             st.write("---")
             st.write("##### 正解はどっちでしたか？")
             col_yes, col_no = st.columns(2)
             
             if col_yes.button("⭕️ YES (正解)"):
-                with st.spinner("結果をブロックチェーンに記録中..."):
-                    manager.resolve_market(target['id'], True)
-                    st.success("結果を YES で確定しました！配当分配の準備完了です。")
+                with st.spinner("結果をブロックチェーンに送信中..."):
+                    remember_tx(manager.resolve_market(target['id'], True))
+                    st.success("結果 YES を送信しました！記録されると配当分配の準備完了です。")
                     
             if col_no.button("❌ NO (不正解)"):
-                with st.spinner("結果をブロックチェーンに記録中..."):
-                    manager.resolve_market(target['id'], False)
-                    st.success("結果を NO で確定しました！配当分配の準備完了です。")
+                with st.spinner("結果をブロックチェーンに送信中..."):
+                    remember_tx(manager.resolve_market(target['id'], False))
+                    st.success("結果 NO を送信しました！記録されると配当分配の準備完了です。")
+
+# -------------------------
+# ③ 一括操作 UI
+# -------------------------
+with tab3:
+    st.header("CSV でまとめて作成・確定")
+    st.caption("全件を連続した nonce で一度に送信するので、数十件でもおおよそ 1 ブロック分の時間で終わります。")
+
+    st.subheader("市場の一括作成")
+    st.caption("列: `title`, `deadline`（例: 2025-12-24 18:00）または `duration_sec`")
+    create_file = st.file_uploader("作成用 CSV", type="csv", key="bulk_create_csv")
+    if create_file is not None and st.button("🚀 まとめて発行する"):
+        try:
+            new_markets = read_create_csv(create_file.getvalue())
+            for handle in manager.create_markets(new_markets):
+                remember_tx(handle)
+            st.success(f"{len(new_markets)} 件の作成を送信しました。")
+        except Exception as e:
+            st.error(f"一括作成失敗: {e}")
+
+    st.write("---")
+    st.subheader("結果の一括確定")
+    st.caption("列: `market_id`, `outcome`（yes / no）")
+    resolve_file = st.file_uploader("確定用 CSV", type="csv", key="bulk_resolve_csv")
+    if resolve_file is not None and st.button("⚖️ まとめて確定する"):
+        try:
+            outcomes = read_resolve_csv(resolve_file.getvalue())
+            for handle in manager.resolve_markets(outcomes):
+                remember_tx(handle)
+            st.success(f"{len(outcomes)} 件の確定を送信しました。")
+        except Exception as e:
+            st.error(f"一括確定失敗: {e}")
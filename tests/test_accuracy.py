@@ -0,0 +1,46 @@
+import threading
+import time
+
+from utils import accuracy
+from utils.accuracy import AccuracyService
+from utils.market_snapshot import MarketSnapshot
+from utils.settlement import rewards
+
+
+class _Manager:
+    def get_all_user_bets(self, address):
+        return [{"market_id": 1, "amount": 10, "isYes": True}, {"market_id": 2, "amount": 5, "isYes": False}]
+
+
+MARKETS = [
+    {"id": 1, "endTime": 1, "totalYes": 10, "totalNo": 10, "resolved": True, "outcome": True},
+    {"id": 2, "endTime": 1, "totalYes": 10, "totalNo": 5, "resolved": True, "outcome": True},
+]
+
+
+def test_stats_against_the_contract_formula():
+    stats = AccuracyService(_Manager()).get("0xabc", MarketSnapshot(MARKETS, 1, 1))
+    assert stats["settled"] == 2
+    assert stats["wins"] == 1
+    # 当たり: 10 * 20 // 10 - 10 = 10、外れ: -5
+    assert stats["pnl"] == 5
+
+
+def test_concurrent_reads_settle_each_bet_once(monkeypatch):
+    # 未確定のベットを読んでから集計に足すまでの間にほかのスレッドが入りやすいように遅らせる
+    def slow_rewards(*args):
+        time.sleep(0.01)
+        return rewards(*args)
+
+    monkeypatch.setattr(accuracy, "rewards", slow_rewards)
+    service = AccuracyService(_Manager())
+    snapshot = MarketSnapshot(MARKETS, 1, 1)
+    service.get("0xabc", MarketSnapshot([], 0, 0))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get("0xabc", snapshot))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {(r["settled"], r["wins"], r["pnl"]) for r in results} == {(2, 1, 5)}
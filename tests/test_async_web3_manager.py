@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from utils.async_web3_manager import AsyncWeb3Manager, SyncBridge
+
+
+class _Manager:
+    """呼ばれた読み出しを数える同期版の代わり"""
+
+    def __init__(self):
+        self.w3 = None
+        self.account = SimpleNamespace(address="0xabc")
+        self.chain_id = 1
+        self.contract = None
+        self.calls = []
+
+    def get_all_markets(self):
+        self.calls.append("get_all_markets")
+        return [{"id": 0}, {"id": 1}]
+
+    def get_balance(self, address=None):
+        self.calls.append("get_balance")
+        return 1000
+
+    def vote(self, market_id, is_yes, amount):
+        self.calls.append("vote")
+        return SimpleNamespace(wait=lambda: {"status": 1})
+
+
+def test_reads_and_sends_go_through_the_shared_manager():
+    manager = _Manager()
+    bridge = SyncBridge(AsyncWeb3Manager(manager))
+    data = bridge.gather(markets=bridge.manager.get_all_markets(), balance=bridge.manager.get_balance())
+    assert data == {"markets": [{"id": 0}, {"id": 1}], "balance": 1000}
+    assert bridge.vote(0, True, 10) == {"status": 1}
+    # 市場ごとの eth_call ではなく、同期版の（バッチで読む）get_all_markets を 1 回だけ呼ぶ
+    assert sorted(manager.calls) == ["get_all_markets", "get_balance", "vote"]
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from utils.bet_log import BetLog, main
+from utils.storage import JournalStore
+
+
+def _bet(user, amount):
+    return {"user": user, "market_id": 1, "choice": "yes", "amount": amount, "ts": "2025-12-05T06:02:39"}
+
+
+def test_main_includes_journal_bets(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps({"users": {}, "markets": [], "bets": [_bet("user1", 5)]}), encoding="utf-8")
+    JournalStore(str(path)).append_bet(_bet("user2", 3))
+
+    out = tmp_path / "bets.oclog"
+    assert main(["--json", str(path), "--out", str(out)]) == 0
+
+    log = BetLog.open(str(out))
+    assert log.to_dicts() == [_bet("user1", 5), _bet("user2", 3)]
+    log.close()
+
+
+def test_catch_up_adds_only_new_bets():
+    bets = [_bet("user1", 5)]
+    log = BetLog.from_dicts(bets)
+    bets += [_bet("user2", 3), _bet("user1", 2)]
+
+    assert log.catch_up(bets) == 2
+    assert log.catch_up(bets) == 0
+    assert log.totals_of_market(1) == {"yes_bets": 10, "no_bets": 0, "bets": 3}
+    with pytest.raises(ValueError):
+        log.catch_up(bets[:1])
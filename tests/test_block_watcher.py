@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+from utils import block_watcher, live_view
+from utils.block_watcher import BlockWatcher
+from utils.market_snapshot import MarketSnapshotService
+from utils.web3_manager import Web3Manager
+
+
+class _Manager:
+    """ブロック番号・イベントの有無を外から決められるマネージャ（呼ばれた回数を数える）"""
+
+    def __init__(self):
+        self.block = 10
+        self.active = False
+        self.activity_calls = []
+        self.snapshot_calls = 0
+        self.balance_calls = []
+
+    def get_block_number(self):
+        return self.block
+
+    def has_market_activity(self, from_block, to_block):
+        self.activity_calls.append((from_block, to_block))
+        if isinstance(self.active, Exception):
+            raise self.active
+        return self.active
+
+    def get_market_snapshot(self):
+        self.snapshot_calls += 1
+        return self.block, [{"id": 0}]
+
+    def get_balances(self, addresses):
+        self.balance_calls.append(list(addresses))
+        return {a: self.block for a in addresses}
+
+    def get_balance(self, address):
+        return -1
+
+
+def _watcher():
+    manager = _Manager()
+    return manager, BlockWatcher(manager, MarketSnapshotService(manager, max_age=0))
+
+
+def test_reads_once_per_block():
+    manager, watcher = _watcher()
+    watcher.watch_address("0xa")
+
+    assert watcher.poll_once()
+    assert not watcher.poll_once()
+    assert not watcher.poll_once()
+    assert (manager.snapshot_calls, len(manager.balance_calls), watcher.version) == (1, 1, 1)
+    assert watcher.block == 10 and watcher.balance("0xa") == 10
+
+
+def test_snapshot_is_refreshed_only_when_the_contract_emitted_events():
+    manager, watcher = _watcher()
+    watcher.watch_address("0xa")
+    watcher.poll_once()
+
+    manager.block = 12
+    assert watcher.poll_once()
+    assert manager.activity_calls == [(11, 12)]
+    assert manager.snapshot_calls == 1
+    # 残高は faucet がイベントを出さないので、ブロックが進むたびに読む
+    assert watcher.balance("0xa") == 12
+
+    manager.block, manager.active = 13, True
+    assert watcher.poll_once()
+    assert manager.activity_calls[-1] == (13, 13)
+    assert manager.snapshot_calls == 2
+
+
+def test_first_poll_checks_from_the_snapshot_block():
+    manager, watcher = _watcher()
+    watcher.snapshots.get()
+    manager.block = 15
+
+    watcher.poll_once()
+    assert manager.activity_calls == [(11, 15)]
+    assert manager.snapshot_calls == 1
+
+
+def test_activity_check_errors_refresh_to_be_safe():
+    manager, watcher = _watcher()
+    watcher.poll_once()
+    manager.block, manager.active = 11, RuntimeError("getLogs failed")
+
+    watcher.poll_once()
+    assert manager.snapshot_calls == 2
+
+
+def test_no_addresses_means_no_balance_batch():
+    manager, watcher = _watcher()
+    watcher.poll_once()
+    assert manager.balance_calls == []
+
+
+def test_watched_addresses_forget_the_oldest(monkeypatch):
+    monkeypatch.setattr(block_watcher, "MAX_WATCHED_ADDRESSES", 2)
+    manager, watcher = _watcher()
+    for address in ("0xa", "0xb", "0xa", "0xc", None):
+        watcher.watch_address(address)
+
+    watcher.poll_once()
+    assert manager.balance_calls == [["0xa", "0xc"]]
+
+
+def test_has_market_activity_assumes_activity_for_wide_ranges():
+    logs = []
+    manager = SimpleNamespace(
+        contract=SimpleNamespace(address="0x" + "1" * 40),
+        w3=SimpleNamespace(eth=SimpleNamespace(get_logs=lambda params: logs.append(params) or [])),
+    )
+
+    # 1000 ブロックを超える範囲は getLogs せずに「変化あり」とみなす
+    assert Web3Manager.has_market_activity(manager, 1, 1002)
+    assert logs == []
+    assert not Web3Manager.has_market_activity(manager, 1, 1001)
+    assert (logs[0]["fromBlock"], logs[0]["toBlock"]) == (1, 1001)
+
+
+def test_live_balance_prefers_the_watcher():
+    manager, watcher = _watcher()
+    watcher.watch_address("0xa")
+    watcher.poll_once()
+
+    assert live_view.live_balance(watcher, manager, "0xa") == 10
+    assert live_view.live_balance(watcher, manager, "0xb") == -1
+    assert live_view.live_balance(None, manager, "0xa") == -1
+
+
+def test_get_live_watcher_registers_the_address(monkeypatch):
+    manager, watcher = _watcher()
+    monkeypatch.setattr("utils.registry.get_block_watcher", lambda: watcher)
+
+    assert live_view.get_live_watcher("0xa") is watcher
+    watcher.poll_once()
+    assert manager.balance_calls == [["0xa"]]
+
+
+def test_get_live_watcher_is_none_when_it_cannot_be_built(monkeypatch):
+    def broken():
+        raise RuntimeError("no rpc")
+
+    monkeypatch.setattr("utils.registry.get_block_watcher", broken)
+    assert live_view.get_live_watcher("0xa") is None
@@ -0,0 +1,144 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from utils.bulk_admin import read_create_csv, read_resolve_csv
+from utils.nonce_manager import NonceManager
+from utils.tx_tracker import FAILED, TxHandle
+from utils.web3_manager import Web3Manager
+
+
+NOW = datetime(2025, 12, 1, 12, 0)
+
+
+def test_read_create_csv_with_deadlines_and_durations():
+    source = "title,deadline,duration_sec\n学祭は晴れる？,2025-12-01 13:00,\n来場者は 1 万人超え？,,90\n".encode()
+    assert read_create_csv(source, now=NOW) == [
+        {"title": "学祭は晴れる？", "duration_sec": 3600},
+        {"title": "来場者は 1 万人超え？", "duration_sec": 90},
+    ]
+
+
+def test_read_create_csv_accepts_a_bom_and_a_file_object(tmp_path):
+    path = tmp_path / "markets.csv"
+    path.write_bytes("﻿title,duration_sec\nA,60\n".encode())
+    assert read_create_csv(str(path)) == [{"title": "A", "duration_sec": 60}]
+    with open(path, "rb") as f:
+        assert read_create_csv(f) == [{"title": "A", "duration_sec": 60}]
+
+
+@pytest.mark.parametrize("body, message", [
+    ("title,deadline\nA,2025-12-01 11:59\n", "2 行目: 締め切りが過去"),
+    ("title,deadline\nA,2025-12-01 12:00\n", "2 行目: 締め切りが過去"),
+    ("title,duration_sec\nA,60\n ,60\n", "3 行目: title が空"),
+    ("title,deadline\nA,\n", "2 行目: deadline か duration_sec"),
+])
+def test_read_create_csv_rejects_bad_rows(body, message):
+    with pytest.raises(ValueError, match=message):
+        read_create_csv(body.encode(), now=NOW)
+
+
+def test_read_resolve_csv_words():
+    source = "market_id,outcome\n0,⭕️\n1,⭕\n2,❌\n3,YES\n4, no \n5,1\n6,x\n".encode()
+    assert read_resolve_csv(source) == {0: True, 1: True, 2: False, 3: True, 4: False, 5: True, 6: False}
+
+
+@pytest.mark.parametrize("body, message", [
+    ("market_id,outcome\nabc,yes\n", "2 行目: market_id"),
+    ("market_id,outcome\n1.5,yes\n", "2 行目: market_id"),
+    ("outcome\nyes\n", "2 行目: market_id"),
+    ("market_id,outcome\n1,yes\n2,maybe\n", "3 行目: outcome"),
+])
+def test_read_resolve_csv_rejects_bad_rows(body, message):
+    with pytest.raises(ValueError, match=message):
+        read_resolve_csv(body.encode())
+
+
+class _Call:
+    def __init__(self, name, args):
+        self.name, self.args = name, args
+
+    def build_transaction(self, tx):
+        return dict(tx, call=(self.name,) + self.args)
+
+
+class _Node:
+    """送られたトランザクションを記録し、fail_nonces の nonce は送信エラーにする"""
+
+    def __init__(self, fail_nonces=()):
+        self.sent = []
+        self.fail_nonces = set(fail_nonces)
+
+    def pending_count(self):
+        return 7 + len(self.sent)
+
+    def send_raw_transaction(self, tx):
+        if tx["nonce"] in self.fail_nonces:
+            self.fail_nonces.discard(tx["nonce"])
+            raise ValueError("connection reset")
+        self.sent.append(tx)
+        return bytes([len(self.sent)]) * 32
+
+
+def _manager(node):
+    functions = SimpleNamespace(
+        createMarket=lambda title, duration: _Call("createMarket", (title, duration)),
+        resolveMarket=lambda market_id, outcome: _Call("resolveMarket", (market_id, outcome)),
+    )
+    manager = SimpleNamespace(
+        chain_id=11155111,
+        contract=SimpleNamespace(functions=functions),
+        nonces=NonceManager(node.pending_count),
+        get_gas_price=lambda: 1,
+        w3=SimpleNamespace(eth=SimpleNamespace(
+            account=SimpleNamespace(sign_transaction=lambda tx, private_key: SimpleNamespace(raw_transaction=tx)),
+            send_raw_transaction=node.send_raw_transaction,
+        )),
+        tx_tracker=SimpleNamespace(track=TxHandle, add=lambda handle: handle),
+    )
+    manager._send_transaction = lambda *a: Web3Manager._send_transaction(manager, *a)
+    manager._send_transactions = lambda *a: Web3Manager._send_transactions(manager, *a)
+    return manager
+
+
+def test_create_markets_uses_consecutive_nonces():
+    node = _Node()
+    markets = read_create_csv("title,duration_sec\nA,60\nB,120\nC,180\n".encode())
+    handles = Web3Manager.create_markets(_manager(node), markets)
+
+    assert [tx["nonce"] for tx in node.sent] == [7, 8, 9]
+    assert [tx["call"] for tx in node.sent] == [("createMarket", "A", 60), ("createMarket", "B", 120),
+                                                ("createMarket", "C", 180)]
+    assert [h.label for h in handles] == ["create_market: A", "create_market: B", "create_market: C"]
+
+
+def test_resolve_markets_resends_the_rest_after_a_failed_send():
+    node = _Node(fail_nonces={8})
+    outcomes = read_resolve_csv("market_id,outcome\n3,yes\n4,no\n5,⭕️\n".encode())
+    handles = Web3Manager.resolve_markets(_manager(node), outcomes)
+
+    # 8 で失敗したので数え直し、残りは欠番を埋めて 8, 9 で送り直す
+    assert [tx["nonce"] for tx in node.sent] == [7, 8, 9]
+    assert [tx["call"] for tx in node.sent] == [("resolveMarket", 3, True), ("resolveMarket", 4, False),
+                                                ("resolveMarket", 5, True)]
+    assert all(h.status != FAILED for h in handles)
+
+
+def test_resolve_markets_reports_rows_that_still_fail():
+    node = _Node(fail_nonces={7})
+    manager = _manager(node)
+
+    # 最初の一括送信は 7 で切れ、1 件ずつの送り直しでは市場 4 だけがリバートする
+    def always_fail_second(tx, _send=node.send_raw_transaction):
+        if tx["call"][1] == 4:
+            raise ValueError("execution reverted: Already resolved")
+        return _send(tx)
+
+    manager.w3.eth.send_raw_transaction = always_fail_second
+    handles = Web3Manager.resolve_markets(manager, {3: True, 4: False, 5: True})
+
+    assert [h.status for h in handles][1] == FAILED
+    assert "Already resolved" in handles[1].error
+    assert [tx["call"][1] for tx in node.sent] == [3, 5]
+    assert [tx["nonce"] for tx in node.sent] == [7, 8]
@@ -0,0 +1,76 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from utils import web3_manager
+from utils.event_indexer import EventIndexer
+from utils.web3_manager import Web3Manager
+
+
+def test_indexer_requires_a_deploy_block(monkeypatch):
+    monkeypatch.setattr("utils.event_indexer.DEFAULT_START_BLOCK", None)
+    with pytest.raises(ValueError):
+        EventIndexer(SimpleNamespace(w3=None), db_path=":memory:")
+
+
+def test_balance_history_is_empty_without_a_deploy_block(monkeypatch):
+    monkeypatch.setattr(web3_manager, "DEFAULT_START_BLOCK", None)
+    manager = SimpleNamespace(indexer=None, _indexer_lock=threading.Lock(), account=SimpleNamespace(address="0xabc"))
+    manager.get_indexer = lambda: Web3Manager.get_indexer(manager)
+    assert Web3Manager.get_balance_history(manager) == []
+    assert manager.indexer is None
+
+
+def _log(contract, event, market_id):
+    return {"topics": [_topic(contract, event), market_id.to_bytes(32, "big")]}
+
+
+def _topic(contract, event):
+    return bytes.fromhex(next(e.topic for e in contract.all_events() if e.event_name == event)[2:])
+
+
+def _market(market_id, yes=0, no=0, resolved=False):
+    return {"id": market_id, "title": f"m{market_id}", "endTime": 100, "totalYes": yes, "totalNo": no,
+            "resolved": resolved, "outcome": False}
+
+
+def test_indexed_snapshot_merges_the_unconfirmed_head():
+    from web3 import Web3
+    from utils.contracts import load_abi
+
+    contract = Web3().eth.contract(address="0x" + "1" * 40, abi=load_abi("abi.json"))
+    head = {1: (1, "m1", 100, 5, 9, False, False), 2: (2, "new", 200, 0, 3, False, False)}
+    requested = {}
+
+    def get_logs(params):
+        requested.update(params)
+        # 未確定の範囲で市場 1 に投票され、市場 2 が作られた。RewardClaimed は市場を変えない
+        claimed = {"topics": [_topic(contract, "RewardClaimed"), bytes(12) + bytes.fromhex("1" * 40)]}
+        return [_log(contract, "Voted", 1), _log(contract, "MarketCreated", 2), claimed]
+
+    indexer = SimpleNamespace(last_block=94, sync=lambda: 0,
+                              get_all_markets=lambda: [_market(0, 1, 1, True), _market(1, 5, 0)])
+    manager = SimpleNamespace(
+        indexer=indexer, contract=contract, w3=SimpleNamespace(eth=SimpleNamespace(get_logs=get_logs)),
+        _latest_block=lambda: 100, _market_from_tuple=Web3Manager._market_from_tuple,
+        _batch_call=lambda calls, batch_size=None, block_identifier=None: [head[fn.args[0]] for fn in calls],
+    )
+    manager._synced_indexer = lambda: Web3Manager._synced_indexer(manager)
+
+    block, markets = Web3Manager._indexed_snapshot(manager)
+
+    assert block == 100
+    assert (requested["fromBlock"], requested["toBlock"]) == (95, 100)
+    assert [m["id"] for m in markets] == [0, 1, 2]
+    assert markets[0] == _market(0, 1, 1, True)
+    assert (markets[1]["totalYes"], markets[1]["totalNo"]) == (5, 9)
+    assert markets[2]["title"] == "new"
+
+
+def test_indexed_snapshot_skips_rpc_when_the_index_is_at_the_head():
+    indexer = SimpleNamespace(last_block=100, sync=lambda: 0, get_all_markets=lambda: [_market(0)])
+    manager = SimpleNamespace(indexer=indexer, _latest_block=lambda: 100)
+    manager._synced_indexer = lambda: Web3Manager._synced_indexer(manager)
+
+    assert Web3Manager._indexed_snapshot(manager) == (100, [_market(0)])
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.event_indexer import EventIndexer
+from utils.leaderboard import Leaderboard
+
+
+class _Contract:
+    address = "0x0000000000000000000000000000000000000001"
+
+    def all_events(self):
+        return []
+
+
+class _Manager:
+    def __init__(self, indexer):
+        self.indexer = indexer
+        self.balance_blocks = []
+
+    def get_indexer(self):
+        return self.indexer
+
+    def get_balances(self, addresses, block_identifier="latest"):
+        self.balance_blocks.append(block_identifier)
+        return {address: 1000 for address in addresses}
+
+
+@pytest.fixture
+def indexer():
+    manager = SimpleNamespace(w3=None, contract=_Contract())
+    indexer = EventIndexer(manager, db_path=":memory:", start_block=100)
+    with indexer.conn:
+        indexer.conn.executemany(
+            "INSERT INTO votes VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [("0x01", 0, 101, 1, "0xaaa", 1, 30), ("0x02", 0, 102, 1, "0xbbb", 0, 70),
+             ("0x03", 1, 103, 1, "0xccc", 1, 20)],
+        )
+        indexer.conn.execute("INSERT INTO resolutions VALUES (1, 1, '0x04', 103)")
+        indexer._set_meta("last_block", 103)
+    return indexer
+
+
+def test_indexer_events_put_resolution_after_votes_in_the_same_block(indexer):
+    events = indexer.get_market_events(0, 103)
+    assert [e["event"] for e in events] == ["Voted", "Voted", "Voted", "MarketResolved"]
+    assert events[-1]["args"] == {"marketId": 1, "outcome": True}
+
+
+def test_resolution_pnl_matches_the_contract_formula(indexer):
+    manager = _Manager(indexer)
+    board = Leaderboard(manager)
+    assert board.sync() == 4
+    # 当たり: amount * (yes + no) // yes。yes = 50, no = 70
+    assert board.get("0xaaa")["pnl"] == 30 * 120 // 50 - 30
+    assert board.get("0xccc")["pnl"] == 20 * 120 // 50 - 20
+    assert board.get("0xbbb")["pnl"] == -70
+    # 残高はイベントと同じブロック時点で読む
+    assert manager.balance_blocks == [103]
+
+
+def test_rewind_rebuilds_the_leaderboard(indexer):
+    board = Leaderboard(_Manager(indexer))
+    board.sync()
+    indexer._rewind(101)
+    board.sync()
+    assert len(board) == 1
+    assert board.get("0xaaa")["wins"] == 0
+
+
+class _NoIndexerManager(_Manager):
+    """インデクサが無い（INDEXER_START_BLOCK 未設定の）チェーン"""
+
+    account = SimpleNamespace(address="0xAAA")
+
+    def __init__(self):
+        super().__init__(None)
+
+    def get_all_markets(self):
+        return [{"id": 1, "totalYes": 50, "totalNo": 70, "resolved": True, "outcome": True},
+                {"id": 2, "totalYes": 0, "totalNo": 0, "resolved": False, "outcome": False}]
+
+    def get_bet_matrix(self, addresses, market_ids=None):
+        bets = {"0xaaa": (30, True), "0xbbb": (70, False)}
+        return {
+            "addresses": addresses,
+            "market_ids": market_ids,
+            "amount": [[bets.get(a.lower(), (0, False))[0] if m == 1 else 0 for m in market_ids] for a in addresses],
+            "isYes": [[bets.get(a.lower(), (0, False))[1] for _ in market_ids] for a in addresses],
+        }
+
+
+def test_sync_without_an_indexer_ranks_the_known_addresses():
+    board = Leaderboard(_NoIndexerManager())
+    assert board.sync(["0xBBB"]) == 0
+    assert not board.indexed
+    assert len(board) == 2
+    # 配当は市場全体のプール（yes = 50, no = 70）で計算する
+    assert board.get("0xaaa")["pnl"] == 30 * 120 // 50 - 30
+    assert board.get("0xbbb")["losses"] == 1
+    assert board.get("0xaaa")["balance"] == 1000
+    # 作り直しても二重に数えない
+    board.sync()
+    assert board.get("0xaaa")["bets"] == 1
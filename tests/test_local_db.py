@@ -0,0 +1,38 @@
+import json
+
+from utils.local_db import LocalDB, migrate
+from utils.storage import JournalStore
+
+
+SAMPLE = {
+    "users": {"user1": {"points": 1000}},
+    "markets": [{"id": 1, "title": "A", "status": "open", "yes_bets": 0, "no_bets": 0}],
+    "bets": [],
+}
+
+
+def test_migrate_includes_journal_entries(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    store = JournalStore(str(path))
+    store.append_bet({"user": "user1", "market_id": 1, "choice": "yes", "amount": 3, "ts": None})
+    store.set_points("user1", 997)
+
+    db = LocalDB(str(tmp_path / "local.sqlite3"))
+    counts = migrate(db, str(path))
+
+    assert counts["bets"] == 1
+    data = db.load()
+    assert data["users"]["user1"]["points"] == 997
+    assert [bet["amount"] for bet in data["bets"]] == [3]
+
+
+def test_migrate_replace_clears_old_meta(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    db = LocalDB(str(tmp_path / "local.sqlite3"))
+    db.append([{"op": "put", "key": "stale", "value": {"k": 1}}])
+
+    migrate(db, str(path), replace=True)
+
+    assert "stale" not in db.load()
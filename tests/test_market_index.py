@@ -0,0 +1,66 @@
+import numpy as np
+
+from utils.market_index import MarketIndex
+from utils.market_model import MarketTable
+
+
+NOW = 1_000_000
+
+
+def _raw(market_id, end_time, resolved=False, title=None):
+    return {"id": market_id, "title": title or f"m{market_id}", "endTime": end_time,
+            "totalYes": 0, "totalNo": 0, "resolved": resolved, "outcome": False}
+
+
+MARKETS = [
+    _raw(10, NOW - 5),                  # 締め切りを過ぎて未確定
+    _raw(11, NOW),                      # ちょうど締め切り（もう募集していない）
+    _raw(12, NOW + 1),
+    _raw(13, 0),                        # 無期限
+    _raw(14, NOW + 100, resolved=True),  # 締め切り前に確定
+    _raw(15, NOW - 50, resolved=True),
+    _raw(16, NOW + 1),
+]
+
+
+def _index(markets=MARKETS):
+    return MarketIndex(MarketTable.from_raw(markets), markets)
+
+
+def test_open_by_deadline_matches_the_table_at_the_boundary():
+    index = _index()
+    for now in (NOW - 5, NOW - 1, NOW, NOW + 1, NOW + 200):
+        assert index.open_by_deadline(now).tolist() == index.table.open_by_deadline(now).tolist(), now
+
+
+def test_time_sliced_views():
+    index = _index()
+    assert index.choices(index.open_by_deadline(NOW)) == [13, 12, 16]
+    assert index.choices(index.awaiting_resolution(NOW)) == [10, 11]
+    assert index.choices(index.unresolved(NOW)) == [10, 11, 13, 12, 16]
+    assert sorted(index.choices(index.closed(NOW))) == [10, 11, 14, 15]
+    # 締め切り前に確定した市場は募集中にも確定待ちにも入らない
+    assert 14 not in index.choices(index.unresolved(NOW))
+
+
+def test_lookup_by_id_accepts_strings_and_rejects_garbage():
+    index = _index()
+    assert index.position("12") == 2
+    assert 12 in index and "x" not in index and None not in index
+    assert index.raw(13)["title"] == "m13"
+    assert index.market(14).resolved
+    assert index.raw(99) is None and index.market(99) is None
+
+
+def test_duplicate_ids_keep_the_last_row():
+    markets = MARKETS + [_raw(12, NOW + 9, title="again")]
+    index = _index(markets)
+    assert len(index) == len(MARKETS)
+    assert index.raw(12)["title"] == "again"
+    assert index.choices(index.open_by_deadline(NOW)) == [13, 16, 12]
+
+
+def test_rows_of_maps_ids_and_marks_missing_ones():
+    index = _index()
+    assert index.rows_of([16, 10, 99, 13]).tolist() == [6, 0, -1, 3]
+    assert _index([]).rows_of(np.array([1, 2])).tolist() == [-1, -1]
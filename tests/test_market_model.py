@@ -0,0 +1,107 @@
+import numpy as np
+
+from utils.market_model import CLOSED, OPEN, Market, MarketTable, normalize_market
+
+
+NOW = 1_000_000
+
+
+def _raw(market_id, end_time, yes=0, no=0, resolved=False, outcome=False):
+    return {"id": market_id, "title": f"m{market_id}", "endTime": end_time,
+            "totalYes": yes, "totalNo": no, "resolved": resolved, "outcome": outcome}
+
+
+MARKETS = [
+    _raw(0, NOW - 1),                               # 締め切りを過ぎた
+    _raw(1, NOW),                                   # ちょうど締め切り
+    _raw(2, NOW + 1, yes=3, no=1),                  # 締め切り直前
+    _raw(3, 0, yes=1, no=1),                        # 無期限
+    _raw(4, NOW + 500, yes=9, resolved=True, outcome=True),  # 締め切り前に確定
+    _raw(5, NOW + 1, no=4),                         # 2 と同じ締め切り
+]
+
+
+def test_status_at_the_deadline_boundary():
+    statuses = [Market.from_raw(m).status(NOW) for m in MARKETS]
+    assert statuses == [CLOSED, CLOSED, OPEN, OPEN, CLOSED, OPEN]
+
+    table = MarketTable.from_raw(MARKETS)
+    assert table.open_mask(NOW).tolist() == [s == OPEN for s in statuses]
+    assert [d["status"] for d in table.to_dicts(now=NOW)] == statuses
+
+
+def test_resolved_before_the_deadline_is_closed_with_a_result():
+    market = Market.from_raw(MARKETS[4])
+    assert not market.is_open(NOW)
+    assert market.result is True
+    assert normalize_market(MARKETS[4], now=NOW)["result"] is True
+    assert normalize_market(MARKETS[2], now=NOW)["result"] is None
+
+
+def test_table_rows_match_the_single_market_model():
+    table = MarketTable.from_raw(MARKETS)
+    assert table.to_dicts(now=NOW) == [normalize_market(m, now=NOW) for m in MARKETS]
+    assert table.get("2").yes_ratio == 0.75
+    assert table.get(99) is None
+
+
+def test_from_raw_tolerates_missing_and_bad_values():
+    market = Market.from_raw({"id": "7", "title": "", "endTime": None, "totalYes": "x"})
+    assert (market.id, market.end_time, market.yes_bets, market.pool) == (7, 0, 0, 0)
+    assert market.yes_ratio is None
+    assert market.is_open(NOW)
+
+
+def test_open_and_closed_by_deadline():
+    table = MarketTable.from_raw(MARKETS)
+    assert table.open_by_deadline(NOW).tolist() == [3, 2, 5]
+    assert table.closed_by_deadline(NOW).tolist() == [4, 1, 0]
+
+
+def _pages(table, rows, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = table.window(rows, cursor=cursor, **kwargs)
+        pages.append(page)
+        cursor = page["next"]
+        if cursor is None:
+            return pages
+
+
+def test_window_pages_cover_every_row_once_in_order():
+    rng = np.random.default_rng(0)
+    markets = [_raw(i, int(rng.integers(1, 5)), yes=int(rng.integers(0, 3)), no=int(rng.integers(0, 3)))
+               for i in range(23)]
+    table = MarketTable.from_raw(markets)
+    rows = np.arange(len(table))
+
+    for sort in ("deadline", "pool", "yes_ratio"):
+        for descending in (False, True):
+            pages = _pages(table, rows, sort=sort, descending=descending, page_size=5)
+            seen = np.concatenate([p["rows"] for p in pages]).tolist()
+            key = table.sort_key(sort) * (-1 if descending else 1)
+            # 同じキーは市場 ID の小さい順
+            assert seen == sorted(rows.tolist(), key=lambda r: (key[r], r))
+            assert [p["start"] for p in pages] == [0, 5, 10, 15, 20]
+            assert all(p["total"] == 23 for p in pages)
+
+
+def test_window_deadline_cursor_starts_at_a_timestamp():
+    table = MarketTable.from_raw(MARKETS)
+    rows = table.open_by_deadline(NOW)
+
+    page = table.window(rows, sort="deadline", cursor=(NOW + 1, -1))
+    assert page["rows"].tolist() == [2, 5]
+    assert page["start"] == 1 and page["next"] is None
+
+
+def test_window_cursor_past_the_end_is_an_empty_page():
+    table = MarketTable.from_raw(MARKETS)
+    page = table.window(np.arange(len(table)), sort="pool", cursor=(10 ** 9, 0))
+    assert page["rows"].tolist() == [] and page["next"] is None and page["start"] == len(table)
+
+
+def test_yes_ratio_sorts_markets_without_bets_first():
+    table = MarketTable.from_raw(MARKETS)
+    assert np.isnan(table.yes_ratio[0])
+    assert table.sort_key("yes_ratio")[0] == -1.0
@@ -0,0 +1,102 @@
+import json
+import threading
+
+import pytest
+
+import utils
+from utils.local_db import LocalDB
+from utils.market_registry import CLOSED, MarketRegistry
+from utils.storage import JournalStore
+
+
+SAMPLE = {
+    "users": {"user1": {"points": 1000}},
+    "markets": [
+        {"id": 1, "title": "A", "status": "open", "end_time": 2000000000, "yes_bets": 0, "no_bets": 0},
+    ],
+    "bets": [],
+}
+
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    monkeypatch.setattr(utils, "DATA_FILE", str(path))
+    monkeypatch.setattr(utils, "DEFAULT_DB_BACKEND", "json")
+    monkeypatch.setattr(utils, "_registry", None)
+    return path
+
+
+def test_concurrent_creates_get_distinct_ids(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    registry = MarketRegistry(JournalStore(str(path)))
+    created = []
+
+    def worker():
+        for i in range(20):
+            created.append(registry.create(f"m{i}", "", None)["id"])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(created) == list(range(2, 162))
+    # 作った市場はすべて store にも書かれている
+    assert len(JournalStore(str(path)).load()["markets"]) == 161
+
+
+@pytest.mark.parametrize("backend", ["journal", "sqlite"])
+def test_registries_in_two_processes_get_distinct_ids(tmp_path, backend):
+    # 同じファイルを別々のプロセスが開いた状態（store も registry も別のインスタンス）
+    if backend == "journal":
+        path = tmp_path / "database.json"
+        path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+        open_store = lambda: JournalStore(str(path))  # noqa: E731
+    else:
+        path = tmp_path / "local.sqlite3"
+        LocalDB(str(path)).append([{"op": "put", "key": "markets", "value": SAMPLE["markets"]}])
+        open_store = lambda: LocalDB(str(path))  # noqa: E731
+    first = MarketRegistry(open_store())
+    second = MarketRegistry(open_store())
+
+    a = first.create("A", "", None)
+    # second はまだ A を読んでいない
+    b = second.create("B", "", None)
+
+    assert (a["id"], b["id"]) == (2, 3)
+    titles = {m["id"]: m["title"] for m in open_store().load()["markets"]}
+    assert titles == {1: "A", 2: "A", 3: "B"}
+
+
+def test_returned_dicts_do_not_alias_the_index():
+    registry = MarketRegistry(markets=SAMPLE["markets"])
+    registry.get(1)["status"] = CLOSED
+    registry.list()[0]["status"] = CLOSED
+    assert [m["id"] for m in registry.open_by_deadline(now=0)] == [1]
+
+
+def test_stale_save_data_does_not_revert_resolve_market(data_file):
+    session = utils.load_data()
+    utils.resolve_market(1, "Yes")
+
+    # 確定前の状態を持ったセッションがベットを保存する
+    session["markets"][0]["yes_bets"] += 10
+    session["bets"].append({"user": "user1", "market_id": 1, "choice": "yes", "amount": 10, "ts": None})
+    utils.save_data(session)
+
+    registry = utils.get_market_registry()
+    assert registry.get(1)["status"] == CLOSED
+    assert registry.get(1)["yes_bets"] == 10
+    assert registry.open_by_deadline(now=0) == []
+    # セッションの dict を後から書き換えても索引は変わらない
+    session["markets"][0]["status"] = "open"
+    assert registry.get(1)["status"] == CLOSED
+
+    market = JournalStore(str(data_file)).load()["markets"][0]
+    assert market["status"] == CLOSED
+    assert market["result"] == "Yes"
+    assert market["yes_bets"] == 10
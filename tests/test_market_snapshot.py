@@ -0,0 +1,48 @@
+import threading
+
+from utils.market_snapshot import MarketSnapshotService
+
+
+class _Manager:
+    """get_market_snapshot() を呼ばれた回数を数え、release が立つまで止まる"""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_market_snapshot(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.calls, [{"id": 0, "totalYes": self.calls}]
+
+
+def test_snapshot_is_shared_until_cleared():
+    manager = _Manager()
+    service = MarketSnapshotService(manager, max_age=0)
+    first = service.get()
+    assert service.get() is first
+    service.clear()
+    assert service.get().block == 2
+    assert manager.calls == 2
+
+
+def test_clear_during_a_fetch_is_not_lost():
+    manager = _Manager()
+    service = MarketSnapshotService(manager, max_age=0)
+    manager.release.clear()
+    fetch = threading.Thread(target=service.get)
+    fetch.start()
+    assert manager.started.wait(5)
+
+    # 取りに行っている途中でトランザクションが採掘された
+    service.clear()
+    manager.release.set()
+    fetch.join(5)
+
+    # 途中で取ってきた分は採掘前の状態かもしれないので、次の get() で取り直す
+    assert service.get().block == 2
+    assert manager.calls == 2
+    assert service.get().block == 2
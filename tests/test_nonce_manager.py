@@ -0,0 +1,107 @@
+import random
+import threading
+
+from utils.nonce_manager import NonceManager, is_nonce_error
+
+
+class _Node:
+    """pending の件数 = 0 から欠番なく届いている nonce の数、を返すノード"""
+
+    def __init__(self, start=0):
+        self.start = start
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def pending_count(self):
+        with self.lock:
+            received = set(self.sent)
+        count = self.start
+        while count in received:
+            count += 1
+        return count
+
+    def broadcast(self, nonce):
+        with self.lock:
+            assert nonce not in self.sent, f"nonce {nonce} sent twice"
+            self.sent.append(nonce)
+
+
+def test_concurrent_allocations_are_unique_and_contiguous():
+    nonces = NonceManager(lambda: 5)
+    got = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(50):
+            nonce = nonces.allocate()
+            with lock:
+                got.append(nonce)
+            nonces.release(nonce)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(got) == list(range(5, 405))
+
+
+def test_resync_waits_for_reservations_that_are_not_broadcast_yet():
+    node = _Node()
+    nonces = NonceManager(node.pending_count)
+    in_flight = nonces.allocate()
+    failed = nonces.allocate()
+
+    # 別のスレッドの送信が失敗して数え直すが、in_flight はまだノードに届いていない
+    nonces.release(failed)
+    nonces.resync()
+    assert nonces.allocate() not in (in_flight, failed)
+
+    node.broadcast(in_flight)
+    nonces.release(in_flight)
+    nonces.release(in_flight + 2)
+    # 予約がすべて外れたので数え直し、欠番（failed）から埋める
+    assert nonces.allocate() == failed
+
+
+def test_resync_with_nothing_outstanding_fetches_now():
+    counts = iter([3, 9])
+    nonces = NonceManager(lambda: next(counts))
+    nonces.release(nonces.allocate())
+
+    assert nonces.resync() == 9
+    assert nonces.allocate() == 9
+
+
+def test_threads_with_failures_never_broadcast_a_nonce_twice():
+    node = _Node()
+    nonces = NonceManager(node.pending_count)
+    rng = random.Random(0)
+    failures = [rng.random() < 0.2 for _ in range(400)]
+    errors = []
+
+    def worker(plan):
+        try:
+            for fail in plan:
+                nonce = nonces.allocate()
+                if fail:
+                    nonces.release(nonce)
+                    nonces.resync()
+                else:
+                    node.broadcast(nonce)
+                    nonces.release(nonce)
+        except AssertionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(failures[i::8],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(node.sent) == failures.count(False)
+
+
+def test_is_nonce_error():
+    assert is_nonce_error(ValueError({"message": "nonce too low: next nonce 7"}))
+    assert not is_nonce_error(ValueError("insufficient funds"))
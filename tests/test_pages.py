@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from utils import registry
+from utils.sim_backend import DEFAULT_ADDRESS, SimChain, SimulatedWeb3Manager
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """シミュレータをインデクサ無し（INDEXER_START_BLOCK 未設定の本番と同じ）にしたもの"""
+    monkeypatch.setenv("ORACLE_BACKEND", "sim")
+    # 即時採掘（送ったトランザクションはすぐに反映される）
+    manager = SimulatedWeb3Manager(SimChain(admin=DEFAULT_ADDRESS, block_time=0))
+    manager.chain.seed(6, 4)
+    monkeypatch.setattr(manager, "get_indexer", lambda: None)
+    monkeypatch.setattr(registry, "_manager", manager)
+    for name in ("_snapshots", "_watcher", "_leaderboard", "_accuracy", "_bridge"):
+        monkeypatch.setattr(registry, name, None)
+    return manager
+
+
+def _run(page, user="student1"):
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=30)
+    at.session_state["user_id"] = user
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_results_ranks_the_connected_address_without_an_indexer(manager):
+    manager.faucet()
+    market_id = next(int(m["id"]) for m in manager.get_all_markets() if not m["resolved"])
+    manager.vote(market_id, True, 10)
+
+    at = _run("pages/3_Results.py")
+
+    assert not [w.value for w in at.warning if "ランキング" in w.value]
+    assert any("INDEXER_START_BLOCK" in c.value for c in at.caption)
+    ranking = next(df.value for df in at.dataframe if "total_staked" in df.value.columns)
+    row = ranking[ranking["address"].str.lower() == manager.account.address.lower()].iloc[0]
+    assert row["total_staked"] == 10
+    assert row["bets"] == 1
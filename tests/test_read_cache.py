@@ -0,0 +1,64 @@
+from utils.read_cache import BlockCache, cached_read
+
+
+class _Reader:
+    """_latest_block() が返すブロックと、読み出しに渡された block_identifier を記録する"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.head = 10
+        self.reads = []
+
+    def _latest_block(self):
+        return self.cache.block_number(lambda: self.head)
+
+    @cached_read
+    def balance(self, address, block_identifier="latest"):
+        self.reads.append((address, block_identifier))
+        return {"address": address, "block": block_identifier}
+
+    @cached_read
+    def gas_price(self):
+        self.reads.append(("gas", None))
+        return 1
+
+
+def test_loader_reads_the_block_the_entry_is_keyed_by():
+    reader = _Reader(BlockCache(block_poll_sec=0))
+
+    assert reader.balance("0xa")["block"] == 10
+    reader.head = 11
+    assert reader.balance("0xa")["block"] == 11
+    assert reader.reads == [("0xa", 10), ("0xa", 11)]
+
+
+def test_latest_and_the_current_block_share_one_entry():
+    reader = _Reader(BlockCache(block_poll_sec=60))
+
+    first = reader.balance("0xa")
+    assert reader.balance("0xa", block_identifier="latest") is first
+    assert reader.balance("0xa", block_identifier=10) is first
+    assert reader.cache.hits == 2 and len(reader.reads) == 1
+
+
+def test_an_explicit_older_block_is_passed_through():
+    reader = _Reader(BlockCache(block_poll_sec=60))
+
+    assert reader.balance("0xa", block_identifier=7)["block"] == 7
+    assert reader.balance("0xa")["block"] == 10
+    assert reader.reads == [("0xa", 7), ("0xa", 10)]
+
+
+def test_methods_without_a_block_parameter_are_still_cached():
+    reader = _Reader(BlockCache(block_poll_sec=60))
+
+    assert reader.gas_price() == reader.gas_price() == 1
+    assert reader.reads == [("gas", None)]
+
+
+def test_disabled_cache_calls_through_with_latest():
+    reader = _Reader(BlockCache(max_size=0))
+
+    assert reader.balance("0xa")["block"] == "latest"
+    assert reader.balance("0xa")["block"] == "latest"
+    assert len(reader.reads) == 2
@@ -0,0 +1,39 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from utils import rpc_metrics
+
+
+def test_metrics_host_defaults_to_loopback():
+    assert rpc_metrics.METRICS_HOST == "127.0.0.1"
+
+
+def test_start_exporters_binds_the_configured_host(monkeypatch):
+    bound = []
+    monkeypatch.setattr(rpc_metrics, "_exporters_started", False)
+    monkeypatch.setattr(rpc_metrics, "METRICS_FILE", "")
+    monkeypatch.setattr(rpc_metrics, "METRICS_PORT", 9123)
+    monkeypatch.setattr(rpc_metrics, "serve_metrics", lambda host, port: bound.append((host, port)))
+
+    rpc_metrics._start_exporters()
+    rpc_metrics._start_exporters()
+
+    assert bound == [("127.0.0.1", 9123)]
+
+
+def test_serve_metrics_answers_only_on_metrics_path():
+    server = rpc_metrics.serve_metrics("127.0.0.1", 0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain")
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(f"http://{host}:{port}/other", timeout=5)
+        assert e.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+import requests
+
+from utils import rpc_transport
+from utils.rpc_transport import FailoverHTTPProvider
+
+
+class _Response:
+    def __init__(self, payload, status_code=200):
+        self.content = json.dumps(payload).encode()
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code), response=self)
+
+
+class _Session:
+    """URL ごとに決めた応答（例外なら送出）を返し、送り先を記録する"""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.posted = []
+
+    def post(self, url, data, timeout):
+        self.posted.append((url, json.loads(data)["method"]))
+        reply = self.replies[url]
+        if isinstance(reply, Exception):
+            raise reply
+        return _Response(reply(json.loads(data)) if callable(reply) else reply)
+
+
+def _provider(replies, urls=("http://a", "http://b")):
+    provider = FailoverHTTPProvider(list(urls), backoff=0, retries=3)
+    provider.session = _Session(replies)
+    return provider
+
+
+def _ok(result):
+    return lambda request: {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+
+def _behind(request):
+    return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32000, "message": "header not found"}}
+
+
+def test_no_rpc_url_keeps_the_old_default(monkeypatch):
+    monkeypatch.delenv("WEB3_RPC_URLS", raising=False)
+    monkeypatch.delenv("WEB3_RPC_URL", raising=False)
+
+    assert rpc_transport.rpc_urls_from_env() == [rpc_transport.DEFAULT_RPC_URL]
+    assert rpc_transport.make_provider().endpoint_uri == rpc_transport.DEFAULT_RPC_URL
+
+
+def test_rpc_urls_from_env_splits_the_list(monkeypatch):
+    monkeypatch.setenv("WEB3_RPC_URLS", "http://a, http://b,")
+    assert rpc_transport.rpc_urls_from_env() == ["http://a", "http://b"]
+
+
+def test_read_fails_over_to_the_next_endpoint():
+    provider = _provider({"http://a": requests.ConnectionError("down"), "http://b": _ok("0x10")})
+
+    assert provider.make_request("eth_blockNumber", [])["result"] == "0x10"
+    status = {s["url"]: s for s in provider.status()}
+    assert not status["http://a"]["healthy"] and status["http://a"]["failures"] == 1
+    assert status["http://b"]["healthy"]
+
+
+def test_read_pinned_to_a_block_skips_a_lagging_endpoint():
+    provider = _provider({"http://a": _behind, "http://b": _ok("0x1")})
+
+    assert provider.make_request("eth_call", [{}, "0x20"])["result"] == "0x1"
+    assert [url for url, _ in provider.session.posted] == ["http://a", "http://b"]
+    # 遅れていただけなので不調扱いにはしない
+    assert all(s["healthy"] for s in provider.status())
+
+
+def test_read_returns_the_error_when_no_endpoint_has_the_block():
+    provider = _provider({"http://a": _behind, "http://b": _behind})
+
+    assert provider.make_request("eth_call", [{}, "0x20"])["error"]["message"] == "header not found"
+    assert len(provider.session.posted) == 2
+
+
+def test_write_is_not_retried_but_the_failure_moves_the_next_write():
+    provider = _provider({"http://a": requests.Timeout("slow"), "http://b": _ok("0xabc")})
+
+    with pytest.raises(requests.Timeout):
+        provider.make_request("eth_sendRawTransaction", ["0x00"])
+    assert provider.session.posted == [("http://a", "eth_sendRawTransaction")]
+    assert provider.endpoint_uri == "http://b"
+
+    assert provider.make_request("eth_getTransactionCount", ["0x0", "pending"])["result"] == "0xabc"
+    assert provider.session.posted[-1] == ("http://b", "eth_getTransactionCount")
@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+
+from utils.settlement import format_odds, implied_odds, quote, rewards, settle
+from utils.sim_backend import SimChain
+
+
+ADMIN = "0x" + "a" * 40
+
+
+def _claimed(amounts, sides, outcome):
+    """SimChain の claimReward（コントラクトと同じ require と式）で実際に受け取れた額"""
+    chain = SimChain(admin=ADMIN, block_time=0)
+    users = [f"0x{i:040x}" for i in range(len(amounts))]
+    yes = sum(a for a, s in zip(amounts, sides) if s)
+    no = sum(a for a, s in zip(amounts, sides) if not s)
+    chain.markets.append([0, "m", 0, yes, no, True, outcome])
+    claimed = []
+    for user, amount, side in zip(users, amounts, sides):
+        chain.bets[(user, 0)] = [amount, side, False]
+        before = chain.balances.get(user, 0)
+        if side == outcome:
+            chain._tx_claimReward(user, 0)
+        claimed.append(chain.balances.get(user, 0) - before)
+    return claimed
+
+
+def test_rewards_match_the_simulated_contract():
+    rng = random.Random(0)
+    for _ in range(200):
+        n = rng.randint(1, 20)
+        amounts = [rng.randint(1, 10 ** 6) for _ in range(n)]
+        sides = [rng.random() < 0.5 for _ in range(n)]
+        outcome = rng.random() < 0.5
+        yes = sum(a for a, s in zip(amounts, sides) if s)
+        no = sum(a for a, s in zip(amounts, sides) if not s)
+        assert rewards(amounts, sides, outcome, yes, no).tolist() == _claimed(amounts, sides, outcome)
+
+
+def test_rewards_fixed_vectors():
+    # amount * (yes + no) // 勝った側のプール を手で計算した値
+    assert rewards([10, 20, 7], [True, True, False], True, 30, 7).tolist() == [12, 24, 0]
+    assert rewards([3, 4], [False, False], False, 1, 7).tolist() == [3, 4]
+    assert rewards([1], [True], True, 3, 3).tolist() == [2]
+
+
+def test_rewards_do_not_overflow_int64():
+    # yes + no だけで int64 を超える（amount * (yes + no) はもちろん超える）
+    yes = no = 6 * 10 ** 18
+    amounts = [3 * 10 ** 18, 3 * 10 ** 18]
+    assert rewards(amounts, [True, True], True, yes, no).tolist() == [6 * 10 ** 18, 6 * 10 ** 18]
+    assert rewards(amounts, [True, True], True, yes, no).tolist() == _claimed(
+        amounts + [no], [True, True, False], True)[:2]
+
+
+def test_settle_totals_and_dust():
+    result = settle([10, 20, 7], [True, True, False], True)
+    assert result["reward"].tolist() == [12, 24, 0]
+    assert result["pnl"].tolist() == [2, 4, -7]
+    assert (result["winners"], result["losers"], result["pool"]) == (2, 1, 37)
+    assert result["paid"] == 36
+    assert result["dust"] == 1
+
+
+def test_settle_with_no_winners_keeps_the_pool():
+    result = settle([5, 5], [False, False], True)
+    assert result["paid"] == 0
+    assert result["dust"] == 10
+
+
+def test_quote_includes_the_new_stake():
+    # 10 賭けると yes=60, no=50 → 10 * 110 // 60、100 なら 100 * 200 // 150
+    assert quote(50, 50, True, np.array([10, 100])).tolist() == [18, 133]
+
+
+def test_implied_odds_and_format():
+    odds = implied_odds([30, 0], [70, 0])
+    assert odds["yes_prob"][0] == 0.3
+    assert format_odds(odds["no_odds"][0]) == "x1.43"
+    assert format_odds(odds["yes_odds"][1]) == "—"
@@ -0,0 +1,62 @@
+from utils.contracts import load_abi
+from utils.sim_backend import DEFAULT_ADDRESS, FAUCET_AMOUNT, SimChain, SimulatedWeb3Manager
+from utils.tx_tracker import FAILED, MINED
+
+
+ALICE = "0x" + "1" * 40
+BOB = "0x" + "2" * 40
+
+
+def _manager():
+    admin = SimulatedWeb3Manager(chain=SimChain(admin=DEFAULT_ADDRESS, block_time=0))
+    admin.create_market("m0", 3600)
+    alice, bob = admin.as_user(ALICE), admin.as_user(BOB)
+    for user in (alice, bob):
+        user.faucet()
+    alice.vote(0, True, 30)
+    bob.vote(0, False, 70)
+    admin.resolve_market(0, True)
+    return admin, alice, bob
+
+
+def _event_inputs(name):
+    event = next(e for e in load_abi("abi.json") if e.get("type") == "event" and e["name"] == name)
+    return {i["name"] for i in event["inputs"]}
+
+
+def test_logs_have_the_same_shape_as_the_contract_events():
+    admin, alice, _ = _manager()
+    alice.claim_reward(0)
+
+    for log in admin.chain.logs:
+        assert set(log["args"]) == _event_inputs(log["event"]), log["event"]
+
+
+def test_claim_pays_the_whole_pool_and_keeps_the_market_in_the_history():
+    admin, alice, _ = _manager()
+    handle = alice.claim_reward(0)
+
+    assert handle.status == MINED
+    assert alice.get_my_balance() == FAUCET_AMOUNT - 30 + 100
+    claim = alice.get_balance_history()[-1]
+    assert (claim["kind"], claim["delta"], claim["market_id"]) == ("claim", 100, 0)
+    assert [e["event"] for e in admin.get_market_events(0, admin.last_block)][-1] == "RewardClaimed"
+
+
+def test_claim_reverts_like_the_contract():
+    _, alice, bob = _manager()
+    alice.claim_reward(0)
+
+    again = alice.claim_reward(0)
+    lost = bob.claim_reward(0)
+    assert (again.status, again.error) == (FAILED, "Already claimed")
+    assert (lost.status, lost.error) == (FAILED, "You lost")
+    assert again.transactionHash is not None
+
+
+def test_transactions_wait_for_the_next_block():
+    chain = SimChain(admin=DEFAULT_ADDRESS, block_time=3600)
+    handle = SimulatedWeb3Manager(chain=chain).create_market("m0", 3600)
+
+    assert handle.status == "pending"
+    assert chain.markets == []
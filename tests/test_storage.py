@@ -0,0 +1,177 @@
+import json
+
+import pytest
+
+from utils.local_db import LocalDB
+from utils.storage import GENERATION_KEY, JournalStore, apply_op, diff_ops
+
+
+SAMPLE = {
+    "users": {"user1": {"points": 1000}, "user2": {"points": 500}},
+    "markets": [
+        {"id": 1, "title": "A", "status": "open", "yes_bets": 0, "no_bets": 0, "result": None},
+        {"id": 2, "title": "B", "status": "open", "yes_bets": 5, "no_bets": 5, "result": None},
+    ],
+    "bets": [{"user": "user1", "market_id": 2, "choice": "yes", "amount": 5, "ts": "2025-12-05T06:02:39"}],
+}
+
+
+@pytest.fixture(params=["journal", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "journal":
+        path = tmp_path / "database.json"
+        path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+        return JournalStore(str(path))
+    db = LocalDB(str(tmp_path / "local.sqlite3"))
+    db.append([{"op": "put", "key": key, "value": value} for key, value in SAMPLE.items()])
+    return db
+
+
+def test_diff_ops_replay_round_trip():
+    current = json.loads(json.dumps(SAMPLE))
+    new = json.loads(json.dumps(SAMPLE))
+    new["users"]["user1"]["points"] = 990
+    new["users"]["user3"] = {"points": 1000, "name": "C"}
+    new["markets"][0]["yes_bets"] = 10
+    del new["markets"][1]["result"]
+    new["markets"].append({"id": 3, "title": "C", "status": "open"})
+    new["bets"].append({"user": "user1", "market_id": 1, "choice": "yes", "amount": 10, "ts": None})
+    new["extra"] = {"k": 1}
+
+    ops = diff_ops(current, new)
+    replayed = json.loads(json.dumps(current))
+    for op in json.loads(json.dumps(ops)):
+        apply_op(replayed, op)
+
+    assert replayed == new
+    # 既にある市場は変わった項目だけ、新しい市場だけ丸ごと
+    market_ops = [op for op in ops if op["op"].startswith("market")]
+    assert market_ops[0] == {"op": "market_fields", "id": 1, "fields": {"yes_bets": 10}}
+    assert market_ops[1] == {"op": "market_fields", "id": 2, "fields": {}, "unset": ["result"]}
+    assert market_ops[2]["op"] == "market"
+
+
+def test_diff_ops_no_change_writes_nothing():
+    assert diff_ops(SAMPLE, json.loads(json.dumps(SAMPLE))) == []
+
+
+def test_save_round_trip(store):
+    data = store.load()
+    data["bets"].append({"user": "user2", "market_id": 1, "choice": "no", "amount": 7, "ts": None})
+    data["users"]["user2"]["points"] -= 7
+    store.save(data)
+    # 同じ dict をもう一度保存しても二重に書かない
+    store.save(data)
+
+    reloaded = store.load()
+    assert len(reloaded["bets"]) == 2
+    assert reloaded["users"]["user2"]["points"] == 493
+
+
+def test_stale_session_does_not_revert_resolution(store):
+    session = store.load()
+    # 別のセッション（管理者）が市場 1 を確定する
+    store.append([{"op": "market_fields", "id": 1, "fields": {"status": "closed", "result": "Yes"}}])
+    # 古い状態を持ったままのセッションがベットを保存する
+    session["markets"][0]["yes_bets"] += 10
+    session["bets"].append({"user": "user1", "market_id": 1, "choice": "yes", "amount": 10, "ts": None})
+    store.save(session)
+
+    market = next(m for m in store.load()["markets"] if m["id"] == 1)
+    assert market["status"] == "closed"
+    assert market["result"] == "Yes"
+    assert market["yes_bets"] == 10
+
+
+def test_concurrent_sessions_keep_each_others_bets(store):
+    a = store.load()
+    b = store.load()
+    a["bets"].append({"user": "user1", "market_id": 1, "choice": "yes", "amount": 1, "ts": None})
+    b["bets"].append({"user": "user2", "market_id": 1, "choice": "no", "amount": 2, "ts": None})
+    store.save(a)
+    store.save(b)
+    assert [bet["amount"] for bet in store.load()["bets"]] == [5, 1, 2]
+
+
+def test_journal_replay_in_a_new_process(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    writer = JournalStore(str(path))
+    writer.append_bet({"user": "user1", "market_id": 1, "choice": "yes", "amount": 3, "ts": None})
+    writer.set_points("user1", 997)
+
+    reader = JournalStore(str(path))
+    data = reader.load()
+    assert data["users"]["user1"]["points"] == 997
+    assert len(data["bets"]) == 2
+
+
+def test_torn_journal_tail_is_dropped(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    store = JournalStore(str(path))
+    store.append_bet({"user": "user1", "market_id": 1, "choice": "yes", "amount": 3, "ts": None})
+    with open(store.journal_path, "ab") as f:
+        f.write(b'{"op": "bet", "bet": {"user"')
+
+    fresh = JournalStore(str(path))
+    fresh.set_points("user2", 1)
+    data = JournalStore(str(path)).load()
+    assert len(data["bets"]) == 2
+    assert data["users"]["user2"]["points"] == 1
+
+
+def test_compaction_round_trip(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    store = JournalStore(str(path), compact_bytes=1)
+    store.append_bet({"user": "user1", "market_id": 1, "choice": "yes", "amount": 3, "ts": None})
+    store.append_bet({"user": "user2", "market_id": 1, "choice": "no", "amount": 4, "ts": None})
+
+    snapshot = json.loads(path.read_text(encoding="utf-8"))
+    assert len(snapshot["bets"]) == 3
+    assert snapshot[GENERATION_KEY] == 2
+    data = JournalStore(str(path)).load()
+    assert GENERATION_KEY not in data
+    assert [bet["amount"] for bet in data["bets"]] == [5, 3, 4]
+
+
+def test_interrupted_compaction_does_not_replay_the_journal(tmp_path, monkeypatch):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    store = JournalStore(str(path))
+    store.append_bet({"user": "user1", "market_id": 1, "choice": "yes", "amount": 3, "ts": None})
+
+    # スナップショットを置き換えた直後、ジャーナルを空にする前に止まる
+    def crash(self, generation):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(JournalStore, "_reset_journal", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+    monkeypatch.undo()
+
+    data = JournalStore(str(path)).load()
+    assert [bet["amount"] for bet in data["bets"]] == [5, 3]
+    # 古いジャーナルは片付けられ、その後の書き込みも正しく読める
+    writer = JournalStore(str(path))
+    writer.append_bet({"user": "user2", "market_id": 1, "choice": "no", "amount": 4, "ts": None})
+    assert [bet["amount"] for bet in JournalStore(str(path)).load()["bets"]] == [5, 3, 4]
+
+
+def test_load_does_not_copy_each_bet_and_save_writes_only_new_ones(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(SAMPLE), encoding="utf-8")
+    store = JournalStore(str(path))
+    a = store.load()
+    b = store.load()
+    # リストは別物（append しても他のセッションに見えない）、ベットの dict は共有
+    assert a["bets"] is not b["bets"]
+    assert a["bets"][0] is b["bets"][0]
+    assert a.bets_seen == 1
+    assert "bets" not in a.base
+
+    a["bets"].append({"user": "user2", "market_id": 1, "choice": "no", "amount": 7, "ts": None})
+    assert store.save(a) == [{"op": "bet", "bet": a["bets"][-1]}]
+    assert store.save(a) == []
+    assert len(b["bets"]) == 1
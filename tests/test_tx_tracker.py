@@ -0,0 +1,29 @@
+from utils.tx_tracker import FAILED, TxHandle, TxTracker
+
+
+def test_failed_handle_is_registered_under_a_synthetic_key():
+    tracker = TxTracker(w3=None)
+    handle = tracker.add(TxHandle.failed("create_market: x", RuntimeError("boom")))
+
+    assert handle.tx_hash is None
+    assert handle.key.startswith("failed-")
+    assert tracker.get(handle.key) is handle
+    assert handle.status == FAILED and handle.error == "boom"
+
+
+def test_get_none_returns_none():
+    assert TxTracker(w3=None).get(None) is None
+
+
+def test_transaction_hash_of_a_failed_send_is_none():
+    handle = TxHandle.failed("place_bet: x", ValueError("insufficient funds"))
+
+    assert handle.transactionHash is None
+    assert handle.error == "insufficient funds"
+
+
+def test_transaction_hash_matches_the_receipt_bytes():
+    handle = TxHandle(b"\x12" * 32, "place_bet: x")
+
+    assert handle.tx_hash == "0x" + "12" * 32
+    assert handle.transactionHash == b"\x12" * 32
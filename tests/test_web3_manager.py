@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from utils.web3_manager import Web3Manager
+
+
+class _Fn:
+    def __init__(self, value):
+        self.value = value
+        self.blocks = []
+
+    def call(self, block_identifier="latest"):
+        self.blocks.append(block_identifier)
+        return self.value
+
+
+def _manager(batch_requests):
+    return SimpleNamespace(batch_size=2, w3=SimpleNamespace(batch_requests=batch_requests))
+
+
+def test_batch_call_falls_back_to_single_calls_and_says_so(capsys):
+    def unsupported():
+        raise ValueError("batch requests are not supported")
+
+    calls = [_Fn(i) for i in range(3)]
+    assert Web3Manager._batch_call(_manager(unsupported), calls, block_identifier=42) == [0, 1, 2]
+    assert all(fn.blocks == [42] for fn in calls)
+    out = capsys.readouterr().out
+    assert out.count("Batch Call Error: batch requests are not supported") == 2
+    assert "falling back to 2 single calls" in out and "falling back to 1 single calls" in out
+
+
+def test_batch_call_sends_chunks_of_batch_size(capsys):
+    sizes = []
+
+    class _Batch:
+        def __enter__(self):
+            self.added = []
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def add(self, value):
+            self.added.append(value)
+
+        def execute(self):
+            sizes.append(len(self.added))
+            return self.added
+
+    assert Web3Manager._batch_call(_manager(_Batch), [_Fn(i) for i in range(5)]) == [0, 1, 2, 3, 4]
+    assert sizes == [2, 2, 1]
+    assert capsys.readouterr().out == ""
@@ -1,19 +1,48 @@
-import json
 import os
+import threading
+
+from utils.market_registry import MarketRegistry
+from utils.storage import get_store
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), '../data/database.json')
 
+# json（data/database.json、既定）か sqlite（utils/local_db.py）
+DEFAULT_DB_BACKEND = os.getenv("LOCAL_DB_BACKEND", "json").lower()
+
+def _store():
+    if DEFAULT_DB_BACKEND == "sqlite":
+        from utils.local_db import get_local_db
+        return get_local_db()
+    return get_store(DATA_FILE)
+
 def load_data():
-    if not os.path.exists(DATA_FILE):
-        return {}
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
+    # json: スナップショットと、前回読んだ後に追記されたジャーナルだけを読む（utils/storage.py）
+    # sqlite: テーブルから database.json と同じ形の dict を作る（utils/local_db.py）
+    return _store().load()
 
 def save_data(data):
-    # ディレクトリがなければ作る
-    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    # 変わった分だけを書く（json はファイルロック付きのジャーナル、sqlite は 1 トランザクション）
+    ops = _store().save(data)
+    if _registry is not None:
+        # 書いた市場だけを store から読み直す（data の dict は索引に入れない）
+        _registry.apply_saved(ops)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_market_registry():
+    # 市場一覧の索引はプロセスで 1 つ（最初に呼ばれたときに保存先から読み込む）
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MarketRegistry(_store())
+        return _registry
+
+def create_market(title, description, end_datetime):
+    return get_market_registry().create(title, description, end_datetime)
+
+def resolve_market(market_id, result):
+    get_market_registry().resolve(market_id, result)
+
+def list_markets():
+    return get_market_registry().list()
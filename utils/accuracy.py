@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.settlement import rewards
+
+
+# 戦績をキャッシュしておくアドレスの数（古いものから忘れる）
+MAX_CACHED_ADDRESSES = int(os.getenv("ACCURACY_CACHE_SIZE", "1000"))
+
+# 予言者バッジ（SBT）の条件: 結果が出た参加がこの回数以上で、的中率がこの % 以上
+SBT_MIN_BETS = 5
+SBT_MIN_ACCURACY = 80.0
+
+
+class _Record:
+    """1 アドレス分のベット（列ごとの配列）と、結果が出た分の集計"""
+
+    __slots__ = ("market_ids", "amounts", "is_yes", "pending", "settled", "wins", "pnl",
+                 "version", "stale", "lock")
+
+    def __init__(self, bets):
+        self.market_ids = np.fromiter((int(b["market_id"]) for b in bets), dtype=np.int64, count=len(bets))
+        self.amounts = np.fromiter((int(b["amount"]) for b in bets), dtype=np.int64, count=len(bets))
+        self.is_yes = np.fromiter((bool(b["isYes"]) for b in bets), dtype=bool, count=len(bets))
+        # まだ結果が出ていないベットの位置（次の市場一覧で確定したかだけを調べる）
+        self.pending = np.arange(len(bets))
+        self.settled = 0
+        self.wins = 0
+        self.pnl = 0
+        self.version = None
+        self.stale = False
+        # 集計の更新と読み出しはこのロックの中で（同じアドレスを複数のスレッドが同時に読む）
+        self.lock = threading.Lock()
+
+
+class AccuracyService:
+    """
+    ユーザーごとの戦績（参加回数・的中回数・的中率・確定損益）
+
+    ユーザーのベットは初回だけ get_all_user_bets() で読み、市場 ID・金額・Yes/No の
+    配列にしておく。市場スナップショットとは MarketIndex.rows_of() で 1 回の配列演算で
+    突き合わせ、確定済みの市場の分を集計する。
+
+    - スナップショットが新しくなったときは、前回まだ結果が出ていなかった
+      ベットだけを調べ直して足していく
+    - トランザクションが採掘されたら clear() でベットを読み直す印を付ける
+      （TxTracker.watch_cache 用。自分の投票で参加が増えるため）
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """次に読むときにベットを読み直す印を付ける"""
+        with self._lock:
+            for record in self._records.values():
+                record.stale = True
+
+    def _record(self, address):
+        with self._lock:
+            record = self._records.get(address)
+            if record is not None and not record.stale:
+                self._records.move_to_end(address)
+                return record
+        record = _Record(self.manager.get_all_user_bets(address))
+        with self._lock:
+            self._records[address] = record
+            while len(self._records) > MAX_CACHED_ADDRESSES:
+                self._records.popitem(last=False)
+        return record
+
+    def get(self, address, snapshot):
+        """
+        address の戦績を snapshot（MarketSnapshot）時点の結果で返す
+
+        戻り値は {"bets": 参加回数, "settled": 結果が出た参加, "wins", "losses",
+                 "accuracy": 的中率（%）, "pnl": 確定損益, "sbt_eligible"}
+        """
+        record = self._record(address)
+        # 版の確認から集計の読み出しまでをまとめて行う（2 つのスレッドが同じベットを二重に足さないように）
+        with record.lock:
+            if record.version != snapshot.version:
+                self._settle(record, snapshot)
+            settled, wins, pnl = record.settled, record.wins, record.pnl
+
+        losses = settled - wins
+        accuracy = wins / settled * 100 if settled else 0.0
+        return {
+            "bets": len(record.market_ids),
+            "settled": settled,
+            "wins": wins,
+            "losses": losses,
+            "accuracy": accuracy,
+            "pnl": pnl,
+            "sbt_eligible": settled >= SBT_MIN_BETS and accuracy >= SBT_MIN_ACCURACY,
+        }
+
+    def _settle(self, record, snapshot):
+        """まだ結果が出ていなかったベットのうち、今回確定したものを集計に足す（record.lock の中で呼ぶ）"""
+        index = snapshot.index
+        table = index.table
+        pending = record.pending
+        rows = index.rows_of(record.market_ids[pending])
+        found = rows >= 0
+        resolved = np.zeros(len(pending), dtype=bool)
+        resolved[found] = table.resolved[rows[found]]
+
+        if resolved.any():
+            done = rows[resolved]
+            amounts = record.amounts[pending[resolved]]
+            outcome = table.outcome[done]
+            is_yes = record.is_yes[pending[resolved]]
+            won = is_yes == outcome
+            # 当たりは pari-mutuel の配当 - 賭け額、外れは -賭け額（utils/settlement.py）
+            pnl = rewards(amounts, is_yes, outcome, table.yes_bets[done], table.no_bets[done]) - amounts
+            record.settled += int(resolved.sum())
+            record.wins += int(won.sum())
+            record.pnl += int(pnl.sum())
+            record.pending = pending[~resolved]
+        record.version = snapshot.version
@@ -0,0 +1,177 @@
+import asyncio
+import inspect
+import os
+import threading
+
+
+# 同時に投げる RPC の上限（公開 RPC のレート制限に合わせて調整する）
+DEFAULT_CONCURRENCY = int(os.getenv("WEB3_ASYNC_CONCURRENCY", "16"))
+
+
+async def gather_limited(coros, limit=None):
+    """
+    同時実行数を limit 本に抑えた asyncio.gather
+
+    結果は渡した順番で返る。全体の待ち時間は「一番遅い呼び出し」に近づく。
+    """
+    semaphore = asyncio.Semaphore(max(1, int(limit or DEFAULT_CONCURRENCY)))
+
+    async def _run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(_run(c) for c in coros))
+
+
+class AsyncWeb3Manager:
+    """
+    Web3Manager と同じメソッドを持つ asyncio 版
+
+    中身は共有の Web3Manager（utils.registry.get_web3_manager()）への委譲で、
+    同期の呼び出しをスレッドで動かして await できるようにしたもの。そのため
+    WEB3_RPC_URLS のフェイルオーバー・keep-alive の接続プール（utils/rpc_transport.py）、
+    ブロック単位の読み出しキャッシュ、JSON-RPC バッチ（_batch_call）、nonce の連番管理を
+    同期版とそのまま共有する。get_all_markets / get_bet_matrix は市場の数だけ
+    eth_call を投げずに、バッチでまとめて読む。
+
+    独立した読み出しは gather_limited でまとめて並列に待てる。
+    Streamlit のスクリプトから使うときは SyncBridge 経由で呼ぶ。
+    """
+
+    def __init__(self, manager, concurrency=None):
+        self.manager = manager
+        self.w3 = manager.w3
+        self.account = manager.account
+        self.chain_id = manager.chain_id
+        self.contract = manager.contract
+        self.sbt_contract = getattr(manager, "sbt_contract", None)
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+
+    async def _gather(self, coros):
+        return await gather_limited(coros, self.concurrency)
+
+    async def _call(self, func, *args, **kwargs):
+        """同期版のメソッドをスレッドで動かして結果を待つ"""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def _send_transaction(self, send, *args):
+        """同期版で送り（nonce は共有の NonceManager から）、採掘を待ってレシートを返す"""
+        handle = await self._call(send, *args)
+        return await self._call(handle.wait)
+
+
+    # --- みんなが使う関数 ---
+
+
+    async def is_connected(self):
+        return await self._call(self.manager.is_connected)
+
+    async def get_balance(self, address: str = None):
+        """指定アドレス（なければ自身）の OCP 残高を確認する"""
+        return await self._call(self.manager.get_balance, address)
+
+    async def get_my_balance(self):
+        """自分のOCP残高を確認する（旧関数名）"""
+        return await self.get_balance()
+
+    async def get_balances(self, addresses):
+        """複数アドレスの OCP 残高をバッチでまとめて取得して {address: balance} で返す"""
+        return await self._call(self.manager.get_balances, list(addresses))
+
+    async def get_user_bet(self, address: str, market_id: int):
+        """特定ユーザーの特定マーケットへのベット情報を取得"""
+        return await self._call(self.manager.get_user_bet, address, market_id)
+
+    async def get_all_user_bets(self, address: str):
+        """指定ユーザーの全マーケットへのベット情報を取得"""
+        return await self._call(self.manager.get_all_user_bets, address)
+
+    async def get_bet_matrix(self, addresses, market_ids=None, resolved=None):
+        """(アドレス × マーケット) のベット情報を同じブロック時点でバッチ取得する（Web3Manager と同じ形）"""
+        return await self._call(self.manager.get_bet_matrix, list(addresses), market_ids, resolved)
+
+    async def get_all_markets(self):
+        """全市場データを同じブロック時点でバッチ取得して辞書のリストで返す"""
+        return await self._call(self.manager.get_all_markets)
+
+    async def has_sbt(self, user_address):
+        return await self._call(self.manager.has_sbt, user_address)
+
+    async def faucet(self):
+        """1000ポイントもらう"""
+        return await self._send_transaction(self.manager.faucet)
+
+    async def create_market(self, title, duration_sec=3600):
+        """市場を作る(Admin)"""
+        return await self._send_transaction(self.manager.create_market, title, duration_sec)
+
+    async def vote(self, market_id, is_yes, amount):
+        """投票する"""
+        return await self._send_transaction(self.manager.vote, market_id, is_yes, amount)
+
+    async def resolve_market(self, market_id, outcome):
+        """結果を確定する(Admin)"""
+        return await self._send_transaction(self.manager.resolve_market, market_id, outcome)
+
+    async def claim_reward(self, market_id):
+        """配当をもらう"""
+        return await self._send_transaction(self.manager.claim_reward, market_id)
+
+    async def mint_sbt(self, target_user_address):
+        return await self._send_transaction(self.manager.mint_sbt, target_user_address)
+
+
+# ─────────────────────────────
+# Streamlit（同期スクリプト）から使うためのブリッジ
+# ─────────────────────────────
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    """プロセスで 1 本だけ動かすイベントループ（SyncBridge から渡したコルーチンはここで動く）"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="web3-async-loop", daemon=True).start()
+    return _loop
+
+
+def run_sync(coro, timeout=None):
+    """コルーチンをバックグラウンドのループで実行し、結果を同期的に返す"""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
+
+
+class SyncBridge:
+    """
+    AsyncWeb3Manager を同期メソッドのように呼べるようにする薄いラッパー
+
+        bridge = SyncBridge(AsyncWeb3Manager(get_web3_manager()))
+        bridge.get_balance()                       # 1 件だけ
+        data = bridge.gather(                      # 並列にまとめて
+            balance=bridge.manager.get_balance(),
+            markets=bridge.manager.get_all_markets(),
+        )
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def __getattr__(self, name):
+        attr = getattr(self.manager, name)
+        if inspect.iscoroutinefunction(attr):
+            def _call(*args, **kwargs):
+                return run_sync(attr(*args, **kwargs))
+            return _call
+        return attr
+
+    def gather(self, timeout=None, **coros):
+        """名前付きのコルーチンを並列に実行し、{名前: 結果} で返す"""
+        names = list(coros)
+        results = run_sync(
+            gather_limited([coros[n] for n in names], self.manager.concurrency),
+            timeout,
+        )
+        return dict(zip(names, results))
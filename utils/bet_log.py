@@ -0,0 +1,335 @@
+"""
+ローカル版のベット履歴を列ごとの配列で持つログ
+
+database.json の bets は 1 件ごとの dict で、user / choice / ts の文字列を毎回持つ。
+BetLog は市場・ユーザーを番号に置き換え（名前の表は 1 つだけ持つ）、
+市場番号・ユーザー番号・Yes/No・金額・時刻をそれぞれ 1 本の配列にする。
+
+ファイル形式（リトルエンディアン）:
+
+    ヘッダ 64 バイト: b"OCBETLOG", 版（u32）, 予備（u32）, 件数（u64）,
+                      名前の表の位置（u64）, 名前の表の長さ（u64）
+    ts（i64、UNIX マイクロ秒）, amount（i64）, market（i32）, user（i32）, side（u8）
+    名前の表（{"users": [...], "markets": [...]} の JSON）
+
+open() はファイルを mmap して配列をそのまま読むので、行を dict にしない限り
+件数が増えても読み込みの時間はほとんど変わらない。
+
+database.json から作る（スナップショットとジャーナルを utils.storage で読む）:
+
+    python -m utils.bet_log
+    python -m utils.bet_log --json data/database.json --out data/bets.oclog
+
+ログは作った時点の写しで、append_bet() などで増えたベットは自動では入らない。
+ファイルは上のコマンドで作り直すこと。プロセスの中で持っているログは
+catch_up() に今の bets を渡せば、増えた分だけを足せる（bets は追記しかされない）。
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from utils.storage import JournalStore
+
+
+# ログファイルの置き場所
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "bets.oclog")
+
+MAGIC = b"OCBETLOG"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQ")
+HEADER_SIZE = 64
+
+# (列名, dtype)。8 バイトの列を先に並べて、どの列も境界に揃うようにする
+COLUMNS = (
+    ("ts", np.dtype("<i8")),
+    ("amount", np.dtype("<i8")),
+    ("market", np.dtype("<i4")),
+    ("user", np.dtype("<i4")),
+    ("side", np.dtype("u1")),
+)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _ts_to_us(ts):
+    """ISO 形式の時刻（タイムゾーン無しは UTC）を UNIX マイクロ秒に。読めなければ 0"""
+    if isinstance(ts, (int, float)):
+        return int(ts * 1_000_000)
+    try:
+        dt = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return 0
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _us_to_ts(us):
+    """_ts_to_us() の逆（0 は None）"""
+    if not us:
+        return None
+    return (_EPOCH + timedelta(microseconds=int(us))).isoformat()
+
+
+def _columns_size(n):
+    return sum(dtype.itemsize * n for _, dtype in COLUMNS)
+
+
+class BetLog:
+    """
+    ベット履歴の列ごとの配列と、ユーザー名・市場 ID の表
+
+    - users / markets: 番号 → 名前（市場 ID は元の値のまま。int でも文字列でもよい）
+    - 列は len(self) 件分だけが有効（append() 用に後ろに余りを持つことがある）
+    """
+
+    def __init__(self):
+        self.users = []
+        self.markets = []
+        self._user_ids = {}
+        self._market_ids = {}
+        self._cols = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS}
+        self._n = 0
+        self._mm = None
+
+    def __len__(self):
+        return self._n
+
+    def column(self, name):
+        """列（"ts" / "amount" / "market" / "user" / "side"）の配列。書き換えないこと"""
+        return self._cols[name][:self._n]
+
+    # --- 名前の表 ---
+
+    def _intern_user(self, user):
+        idx = self._user_ids.get(user)
+        if idx is None:
+            idx = self._user_ids[user] = len(self.users)
+            self.users.append(user)
+        return idx
+
+    def _intern_market(self, market_id):
+        key = str(market_id)
+        idx = self._market_ids.get(key)
+        if idx is None:
+            idx = self._market_ids[key] = len(self.markets)
+            self.markets.append(market_id)
+        return idx
+
+    def user_index(self, user):
+        """ユーザー名の番号（無ければ None）"""
+        return self._user_ids.get(user)
+
+    def market_index(self, market_id):
+        """市場 ID の番号（int と文字列は区別しない。無ければ None）"""
+        return self._market_ids.get(str(market_id))
+
+    # --- 追記 ---
+
+    def _reserve(self, extra):
+        """extra 件を足せるように列を広げる（mmap 中ならメモリにコピーして切り離す）"""
+        need = self._n + extra
+        if self._mm is None and need <= len(self._cols["ts"]):
+            return
+        capacity = max(need, 2 * len(self._cols["ts"]), 1024)
+        for name, dtype in COLUMNS:
+            grown = np.zeros(capacity, dtype=dtype)
+            grown[:self._n] = self._cols[name][:self._n]
+            self._cols[name] = grown
+        self._release_mmap()
+
+    def append(self, bet):
+        """database.json と同じ形のベット dict を 1 件足す"""
+        self.extend([bet])
+
+    def extend(self, bets):
+        bets = list(bets)
+        self._reserve(len(bets))
+        n = self._n
+        end = n + len(bets)
+        cols = self._cols
+        cols["ts"][n:end] = [_ts_to_us(b.get("ts")) for b in bets]
+        cols["amount"][n:end] = [int(b.get("amount", 0) or 0) for b in bets]
+        cols["market"][n:end] = [self._intern_market(b.get("market_id")) for b in bets]
+        cols["user"][n:end] = [self._intern_user(b.get("user")) for b in bets]
+        cols["side"][n:end] = [str(b.get("choice", "")).lower() == "yes" for b in bets]
+        self._n = end
+
+    def catch_up(self, bets):
+        """
+        今の bets（database.json と同じ形の全件のリスト）のうち、まだ入っていない後ろの分を足す
+
+        足した件数を返す。bets がログより短ければ作り直しが要るので ValueError。
+        """
+        if len(bets) < self._n:
+            raise ValueError(f"bets（{len(bets)} 件）がベットログ（{self._n} 件）より少ないので作り直してください")
+        new = bets[self._n:]
+        if new:
+            self.extend(new)
+        return len(new)
+
+    @classmethod
+    def from_dicts(cls, bets):
+        log = cls()
+        log.extend(bets)
+        return log
+
+    def to_dicts(self, rows=None):
+        """行（番号の配列。None なら全部）を database.json と同じ形の dict にする"""
+        rows = np.arange(self._n) if rows is None else np.asarray(rows, dtype=np.int64)
+        ts = self._cols["ts"][rows].tolist()
+        amount = self._cols["amount"][rows].tolist()
+        market = self._cols["market"][rows].tolist()
+        user = self._cols["user"][rows].tolist()
+        side = self._cols["side"][rows].tolist()
+        return [
+            {"user": self.users[u], "market_id": self.markets[m], "choice": "yes" if s else "no",
+             "amount": a, "ts": _us_to_ts(t)}
+            for t, a, m, u, s in zip(ts, amount, market, user, side)
+        ]
+
+    # --- 集計 ---
+
+    def market_totals(self):
+        """
+        市場ごとの合計（番号順。self.markets と同じ並び）
+
+        戻り値は {"market_ids": [...], "yes": 配列, "no": 配列, "bets": 配列}
+        """
+        market = self.column("market")
+        side = self.column("side").astype(bool)
+        amount = self.column("amount")
+        yes = np.zeros(len(self.markets), dtype=np.int64)
+        no = np.zeros(len(self.markets), dtype=np.int64)
+        np.add.at(yes, market[side], amount[side])
+        np.add.at(no, market[~side], amount[~side])
+        bets = np.bincount(market, minlength=len(self.markets))
+        return {"market_ids": list(self.markets), "yes": yes, "no": no, "bets": bets}
+
+    def totals_of_market(self, market_id):
+        """1 市場の {"yes_bets", "no_bets", "bets"}（無い市場は全部 0）"""
+        idx = self.market_index(market_id)
+        if idx is None:
+            return {"yes_bets": 0, "no_bets": 0, "bets": 0}
+        mask = self.column("market") == idx
+        side = self.column("side")[mask].astype(bool)
+        amount = self.column("amount")[mask]
+        return {"yes_bets": int(amount[side].sum()), "no_bets": int(amount[~side].sum()), "bets": int(mask.sum())}
+
+    def user_totals(self):
+        """ユーザーごとの {"users": [...], "staked": 配列, "bets": 配列}（self.users と同じ並び）"""
+        user = self.column("user")
+        staked = np.zeros(len(self.users), dtype=np.int64)
+        np.add.at(staked, user, self.column("amount"))
+        return {"users": list(self.users), "staked": staked, "bets": np.bincount(user, minlength=len(self.users))}
+
+    def rows_of_user(self, user):
+        """ユーザーのベットの行番号（古い順）"""
+        idx = self.user_index(user)
+        if idx is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.column("user") == idx)
+
+    def rows_of_market(self, market_id):
+        """市場のベットの行番号（古い順）"""
+        idx = self.market_index(market_id)
+        if idx is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.column("market") == idx)
+
+    # --- ファイル ---
+
+    def save(self, path=None):
+        """一時ファイルに書いてから rename する"""
+        path = path or DEFAULT_LOG_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tables = json.dumps({"users": self.users, "markets": self.markets}, ensure_ascii=False).encode("utf-8")
+        tables_offset = HEADER_SIZE + _columns_size(self._n)
+        tables_offset += -tables_offset % 8
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, self._n, tables_offset, len(tables)).ljust(HEADER_SIZE, b"\0"))
+            for name, dtype in COLUMNS:
+                f.write(np.ascontiguousarray(self._cols[name][:self._n], dtype=dtype).tobytes())
+            f.write(b"\0" * (tables_offset - f.tell()))
+            f.write(tables)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path=None):
+        """
+        ファイルを mmap して読む（列はファイルの上の読み取り専用の配列になる）
+
+        ファイルが無ければ空のログを返す。壊れていれば ValueError。
+        """
+        path = path or DEFAULT_LOG_PATH
+        log = cls()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return log
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mm) < HEADER_SIZE:
+            mm.close()
+            raise ValueError(f"{path} はベットログではありません")
+        magic, version, _, n, tables_offset, tables_length = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or tables_offset + tables_length > len(mm):
+            mm.close()
+            raise ValueError(f"{path} はベットログではないか、版が違います")
+
+        offset = HEADER_SIZE
+        for name, dtype in COLUMNS:
+            log._cols[name] = np.frombuffer(mm, dtype=dtype, count=n, offset=offset)
+            offset += dtype.itemsize * n
+        tables = json.loads(bytes(mm[tables_offset:tables_offset + tables_length]).decode("utf-8"))
+        log.users = tables["users"]
+        log.markets = tables["markets"]
+        log._user_ids = {user: i for i, user in enumerate(log.users)}
+        log._market_ids = {str(market_id): i for i, market_id in enumerate(log.markets)}
+        log._n = n
+        log._mm = mm
+        return log
+
+    def close(self):
+        """mmap を閉じる（閉じた後は使わないこと）"""
+        if self._mm is not None:
+            self._cols = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS}
+            self._n = 0
+            self._release_mmap()
+
+    def _release_mmap(self):
+        if self._mm is None:
+            return
+        try:
+            self._mm.close()
+        except BufferError:
+            # column() で渡した配列がまだ使われている。参照が消えれば閉じられる
+            pass
+        self._mm = None
+
+
+def main(argv=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="database.json の bets からベットログを作る")
+    parser.add_argument("--json", default=os.path.join(root, "data", "database.json"), help="database.json のパス")
+    parser.add_argument("--out", default=DEFAULT_LOG_PATH, help="書き出すベットログのパス")
+    args = parser.parse_args(argv)
+
+    # スナップショットだけを読むとジャーナルにあるベットが抜けるので、storage を通して読む
+    bets = JournalStore(args.json).load().get("bets", [])
+    log = BetLog.from_dicts(bets)
+    log.save(args.out)
+    print(f"ベットログを書き出しました: bets={len(log)} users={len(log.users)} markets={len(log.markets)} → {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
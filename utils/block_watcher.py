@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+
+# 新しいブロックを確認する間隔（秒）
+DEFAULT_WATCH_SEC = float(os.getenv("BLOCK_WATCH_SEC", "4"))
+
+# 残高を見張るアドレスの上限（多すぎると 1 ブロックごとのバッチが大きくなる）
+MAX_WATCHED_ADDRESSES = int(os.getenv("BLOCK_WATCH_MAX_ADDRESSES", "2000"))
+
+
+class BlockWatcher:
+    """
+    新しいブロックを見張って、市場一覧と残高をプロセスで 1 回だけ読み直す係
+
+    セッションはそれぞれチェーンに問い合わせる代わりに、ここが公開する
+    block / version / balances を読む。見ている人数が増えても RPC の量は
+    「1 ブロックにつき 1 回」のまま変わらない。
+
+    - 市場一覧: そのブロック範囲にコントラクトのイベントがあったときだけ
+      MarketSnapshotService を取り直す（範囲が 1000 ブロックを超えると
+      has_market_activity は調べずに True を返すので、長く止まっていた後は必ず取り直す）
+    - 残高: watch_address() で登録されたアドレスをまとめて 1 回で読む
+      （faucet はイベントを出さないので、ブロックが進むたびに読む）
+    """
+
+    def __init__(self, manager, snapshots, poll_sec=None):
+        self.manager = manager
+        self.snapshots = snapshots
+        self.poll_sec = DEFAULT_WATCH_SEC if poll_sec is None else float(poll_sec)
+        self.block = None
+        self.version = 0
+        self.updated_at = None
+        self.error = None
+        self._balances = {}
+        self._addresses = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch_address(self, address):
+        """このアドレスの残高もブロックごとに読み直す（古いものから忘れる）"""
+        if not address:
+            return
+        with self._lock:
+            self._addresses.pop(address, None)
+            self._addresses[address] = True
+            while len(self._addresses) > MAX_WATCHED_ADDRESSES:
+                self._addresses.pop(next(iter(self._addresses)))
+
+    def balance(self, address):
+        """最後に読んだ残高（まだ読んでいなければ None）"""
+        with self._lock:
+            return self._balances.get(address)
+
+    def poll_once(self):
+        """ブロックが進んでいれば読み直して公開する。進んでいたら True"""
+        block = self.manager.get_block_number()
+        if block == self.block:
+            return False
+
+        # 前回見たブロック（初回はスナップショットを読んだブロック）から後にイベントがあったか
+        snapshot = self.snapshots.current
+        since = self.block if self.block is not None else (snapshot.block if snapshot else None)
+        if snapshot is None or since is None:
+            changed = True
+        elif block <= since:
+            changed = False
+        else:
+            try:
+                changed = self.manager.has_market_activity(since + 1, block)
+            except Exception:
+                changed = True
+        if changed:
+            self.snapshots.refresh()
+
+        with self._lock:
+            addresses = list(self._addresses)
+        balances = self.manager.get_balances(addresses) if addresses else {}
+
+        with self._lock:
+            self._balances = balances
+            self.block = block
+            self.version += 1
+            self.updated_at = time.time()
+            self.error = None
+        return True
+
+    def start(self):
+        """見張りのスレッドを立てる（2 回目以降は何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="block-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+                failures = 0
+            except Exception as e:
+                print(f"Block Watcher Error: {e}")
+                self.error = str(e)
+                failures += 1
+            # 失敗が続くときは間隔を広げる（最大 8 倍）
+            self._stop.wait(self.poll_sec * min(2 ** failures, 8))
@@ -0,0 +1,107 @@
+"""
+管理者向けの一括操作（CSV から市場をまとめて作成・確定する）
+
+使い方（プロジェクトのルートで実行）:
+
+    python -m utils.bulk_admin create markets.csv
+    python -m utils.bulk_admin resolve results.csv
+
+create 用 CSV の列: title, deadline（例: 2025-12-24 18:00）または duration_sec
+resolve 用 CSV の列: market_id, outcome（yes / no / true / false / 1 / 0）
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime
+
+from utils.tx_tracker import wait_all
+
+
+TRUE_WORDS = {"yes", "y", "true", "1", "⭕", "o"}
+FALSE_WORDS = {"no", "n", "false", "0", "❌", "x"}
+
+
+def _open_csv(source):
+    """パス・ファイルオブジェクト・バイト列のどれでも csv.DictReader にする"""
+    if isinstance(source, (bytes, bytearray)):
+        return csv.DictReader(io.StringIO(source.decode("utf-8-sig")))
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8-sig", newline="") as f:
+            return csv.DictReader(io.StringIO(f.read()))
+    text = source.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8-sig")
+    return csv.DictReader(io.StringIO(text))
+
+
+def read_create_csv(source, now=None):
+    """create 用 CSV を [{"title", "duration_sec"}, ...] にする"""
+    now = now or datetime.now()
+    markets = []
+    for line_no, row in enumerate(_open_csv(source), start=2):
+        title = (row.get("title") or "").strip()
+        if not title:
+            raise ValueError(f"{line_no} 行目: title が空です")
+        if (row.get("duration_sec") or "").strip():
+            duration_sec = int(float(row["duration_sec"]))
+        elif (row.get("deadline") or "").strip():
+            deadline = datetime.fromisoformat(row["deadline"].strip())
+            duration_sec = int((deadline - now).total_seconds())
+        else:
+            raise ValueError(f"{line_no} 行目: deadline か duration_sec が必要です")
+        if duration_sec <= 0:
+            raise ValueError(f"{line_no} 行目: 締め切りが過去になっています")
+        markets.append({"title": title, "duration_sec": duration_sec})
+    return markets
+
+
+def read_resolve_csv(source):
+    """resolve 用 CSV を {market_id: outcome} にする"""
+    outcomes = {}
+    for line_no, row in enumerate(_open_csv(source), start=2):
+        try:
+            market_id = int(row["market_id"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{line_no} 行目: market_id が整数ではありません")
+        # ⭕️ は異体字セレクタ（U+FE0F）付きと無しの両方が入力されるので外して比べる
+        word = (row.get("outcome") or "").strip().lower().replace("\ufe0f", "")
+        if word in TRUE_WORDS:
+            outcomes[market_id] = True
+        elif word in FALSE_WORDS:
+            outcomes[market_id] = False
+        else:
+            raise ValueError(f"{line_no} 行目: outcome は yes / no で指定してください")
+    return outcomes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Oracle Campus の市場を CSV から一括で作成・確定する")
+    parser.add_argument("command", choices=["create", "resolve"])
+    parser.add_argument("csv_path")
+    parser.add_argument("--timeout", type=float, default=600, help="レシートを待つ最大秒数")
+    parser.add_argument("--no-wait", action="store_true", help="送信だけして終了する")
+    args = parser.parse_args(argv)
+
+    from utils.web3_manager import Web3Manager
+
+    manager = Web3Manager()
+    if args.command == "create":
+        handles = manager.create_markets(read_create_csv(args.csv_path))
+    else:
+        handles = manager.resolve_markets(read_resolve_csv(args.csv_path))
+    print(f"{len(handles)} 件送信しました")
+
+    if not args.no_wait:
+        if not wait_all(handles, args.timeout):
+            print("⚠️ タイムアウトしました（まだ採掘待ちのものがあります）")
+
+    failed = 0
+    for handle in handles:
+        failed += handle.status == "failed"
+        print(f"{handle.status:8} {handle.tx_hash or '-'} {handle.label} {handle.error or ''}".rstrip())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
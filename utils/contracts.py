@@ -0,0 +1,24 @@
+import functools
+import json
+import os
+
+
+# utils フォルダ（ABI ファイルの置き場所）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# SBT コントラクトのアドレス
+SBT_ADDRESS = "0x6AF471Be518c3C73A9aB83669f791D80e6B8Ea62"
+
+
+@functools.lru_cache(maxsize=None)
+def load_abi(filename):
+    """
+    utils/ 以下の ABI ファイルを読み込む（プロセスで 1 回だけパースする）
+
+    ファイルが無ければ None を返す。返したリストは共有されるので書き換えないこと。
+    """
+    path = os.path.join(BASE_DIR, filename)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
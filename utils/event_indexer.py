@@ -0,0 +1,415 @@
+import os
+import sqlite3
+import threading
+
+from web3 import Web3
+
+
+# インデックス DB の既定パス（data/ 以下に置く）
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "index.sqlite3"
+)
+
+# この深さより新しいブロックはまだ確定していないとみなし、インデックスしない
+DEFAULT_CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", "6"))
+
+# eth_getLogs 1 回で読むブロック数（公開 RPC は範囲に上限があることが多い）
+DEFAULT_LOG_CHUNK = int(os.getenv("INDEXER_LOG_CHUNK", "2000"))
+
+# コントラクトをデプロイしたブロック（ここから読み始める）。
+# 0 から読むと公開 RPC では何十万回も eth_getLogs を投げることになるので既定値は持たない。
+# 設定されていなければ None で、インデクサは作れない
+DEFAULT_START_BLOCK = int(os.environ["INDEXER_START_BLOCK"]) if os.getenv("INDEXER_START_BLOCK") else None
+
+# リオーグ検出用に残しておくチェックポイントの数
+CHECKPOINT_KEEP = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    block_number INTEGER PRIMARY KEY,
+    block_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS markets (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    end_time INTEGER NOT NULL,
+    block_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS votes (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    market_id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    is_yes INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS idx_votes_market ON votes (market_id);
+CREATE INDEX IF NOT EXISTS idx_votes_user ON votes (user, market_id);
+CREATE INDEX IF NOT EXISTS idx_votes_block ON votes (block_number);
+CREATE TABLE IF NOT EXISTS resolutions (
+    market_id INTEGER PRIMARY KEY,
+    outcome INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resolutions_block ON resolutions (block_number);
+CREATE TABLE IF NOT EXISTS claims (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    market_id INTEGER,
+    user TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS idx_claims_user ON claims (user, market_id);
+CREATE INDEX IF NOT EXISTS idx_claims_block ON claims (block_number);
+CREATE TABLE IF NOT EXISTS sbt_transfers (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    from_addr TEXT NOT NULL,
+    to_addr TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS idx_sbt_to ON sbt_transfers (to_addr);
+CREATE INDEX IF NOT EXISTS idx_sbt_block ON sbt_transfers (block_number);
+"""
+
+# ブロック番号で巻き戻せるテーブル
+EVENT_TABLES = ("markets", "votes", "resolutions", "claims", "sbt_transfers")
+
+
+class EventIndexer:
+    """
+    PredictionMarket / SBT コントラクトのイベントを eth_getLogs で追いかけて
+    ローカルの SQLite に書き込むインデクサ
+
+    - sync() を呼ぶたびに「前回処理したブロックの次」から差分だけ読む
+    - 先頭から confirmations ブロック以内は未確定として読まない
+    - 前回の到達点のブロックハッシュが変わっていたらリオーグとみなして巻き戻す
+    - 市場の合計額などはイベントから集計するので、ストレージの読み出しは
+      新しい市場の endTime を取るときだけ
+    """
+
+    def __init__(self, manager, db_path=None, confirmations=None,
+                 log_chunk=None, start_block=None):
+        self.manager = manager
+        self.w3 = manager.w3
+        self.db_path = db_path or DEFAULT_INDEX_PATH
+        self.confirmations = DEFAULT_CONFIRMATIONS if confirmations is None else int(confirmations)
+        self.log_chunk = max(1, int(log_chunk or DEFAULT_LOG_CHUNK))
+        start_block = DEFAULT_START_BLOCK if start_block is None else start_block
+        if start_block is None:
+            raise ValueError("INDEXER_START_BLOCK（コントラクトをデプロイしたブロック）が設定されていません")
+        self.start_block = int(start_block)
+        self._lock = threading.Lock()
+
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        # Streamlit の複数スレッドから使うので、ロックで守った 1 本の接続を共有する
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+        # topic0 → (コントラクト, イベント名) の対応表
+        self._contracts = [manager.contract]
+        if getattr(manager, "sbt_contract", None) is not None:
+            self._contracts.append(manager.sbt_contract)
+        self._topics = {}
+        for contract in self._contracts:
+            for event in contract.all_events():
+                self._topics[(contract.address.lower(), event.topic.lower())] = event
+
+    # --- 状態の読み書き ---
+
+    def _get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    @property
+    def last_block(self):
+        """インデックス済みの最後のブロック番号（まだ何もなければ start_block - 1）"""
+        return int(self._get_meta("last_block", self.start_block - 1))
+
+    @property
+    def rewinds(self):
+        """リオーグで巻き戻した回数（イベントから集計を作っている側が作り直すかの判断に使う）"""
+        return int(self._get_meta("rewinds", 0))
+
+    # --- 同期 ---
+
+    def sync(self):
+        """最新の確定ブロックまでイベントを取り込み、処理したログ数を返す"""
+        with self._lock:
+            self._handle_reorg()
+            head = self.w3.eth.block_number - self.confirmations
+            processed = 0
+            start = self.last_block + 1
+            while start <= head:
+                end = min(start + self.log_chunk - 1, head)
+                logs = self.w3.eth.get_logs({
+                    "fromBlock": start,
+                    "toBlock": end,
+                    "address": [c.address for c in self._contracts],
+                })
+                with self.conn:
+                    processed += self._ingest(logs)
+                    self._checkpoint(end)
+                start = end + 1
+            return processed
+
+    def _checkpoint(self, block_number):
+        block_hash = Web3.to_hex(self.w3.eth.get_block(block_number)["hash"])
+        self.conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (block_number, block_hash) VALUES (?, ?)",
+            (block_number, block_hash),
+        )
+        self.conn.execute(
+            "DELETE FROM checkpoints WHERE block_number NOT IN "
+            "(SELECT block_number FROM checkpoints ORDER BY block_number DESC LIMIT ?)",
+            (CHECKPOINT_KEEP,),
+        )
+        self._set_meta("last_block", block_number)
+
+    def _handle_reorg(self):
+        """保存済みチェックポイントのハッシュがチェーンと食い違っていたら巻き戻す"""
+        rows = self.conn.execute(
+            "SELECT block_number, block_hash FROM checkpoints ORDER BY block_number DESC"
+        ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            chain_hash = Web3.to_hex(self.w3.eth.get_block(row["block_number"])["hash"])
+            if chain_hash == row["block_hash"]:
+                if row["block_number"] != rows[0]["block_number"]:
+                    self._rewind(row["block_number"])
+                return
+        # どのチェックポイントも一致しない場合は最初から作り直す
+        self._rewind(self.start_block - 1)
+
+    def _rewind(self, block_number):
+        """block_number より後に取り込んだ行をすべて消す"""
+        with self.conn:
+            for table in EVENT_TABLES:
+                self.conn.execute(f"DELETE FROM {table} WHERE block_number > ?", (block_number,))
+            self.conn.execute("DELETE FROM checkpoints WHERE block_number > ?", (block_number,))
+            self._set_meta("last_block", block_number)
+            self._set_meta("rewinds", self.rewinds + 1)
+
+    def _ingest(self, logs):
+        new_market_ids = []
+        for log in logs:
+            key = (log["address"].lower(), Web3.to_hex(log["topics"][0]).lower())
+            event = self._topics.get(key)
+            if event is None:
+                continue
+            decoded = event.process_log(log)
+            args = decoded["args"]
+            tx_hash = Web3.to_hex(decoded["transactionHash"])
+            log_index = int(decoded["logIndex"])
+            block_number = int(decoded["blockNumber"])
+            name = decoded["event"]
+
+            if name == "MarketCreated":
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO markets (id, title, end_time, block_number) "
+                    "VALUES (?, ?, 0, ?)",
+                    (int(args["marketId"]), args["title"], block_number),
+                )
+                new_market_ids.append(int(args["marketId"]))
+            elif name == "Voted":
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO votes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (tx_hash, log_index, block_number, int(args["marketId"]),
+                     args["user"].lower(), int(bool(args["isYes"])), int(args["amount"])),
+                )
+            elif name == "MarketResolved":
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?)",
+                    (int(args["marketId"]), int(bool(args["outcome"])), tx_hash, block_number),
+                )
+            elif name == "RewardClaimed":
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO claims VALUES (?, ?, ?, ?, ?, ?)",
+                    (tx_hash, log_index, block_number, self._claim_market_id(tx_hash),
+                     args["user"].lower(), int(args["amount"])),
+                )
+            elif name == "Transfer":
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO sbt_transfers VALUES (?, ?, ?, ?, ?, ?)",
+                    (tx_hash, log_index, block_number, args["from"].lower(),
+                     args["to"].lower(), int(args["tokenId"])),
+                )
+
+        if new_market_ids:
+            # endTime はイベントに含まれないので、新しい市場の分だけストレージから読む
+            calls = [self.manager.contract.functions.markets(i) for i in new_market_ids]
+            for m in self.manager._batch_call(calls):
+                self.conn.execute(
+                    "UPDATE markets SET end_time = ? WHERE id = ?", (int(m[2]), int(m[0]))
+                )
+        return len(logs)
+
+    def _claim_market_id(self, tx_hash):
+        """RewardClaimed には marketId が無いので、トランザクションの入力から復元する"""
+        try:
+            tx = self.w3.eth.get_transaction(tx_hash)
+            _, params = self.manager.contract.decode_function_input(tx["input"])
+            return int(params["_marketId"])
+        except Exception:
+            return None
+
+    # --- 読み出し（Web3Manager と同じ形で返す） ---
+
+    def get_all_markets(self):
+        """インデックスから全市場を get_all_markets() と同じ形で返す"""
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT m.id, m.title, m.end_time,
+                       COALESCE(SUM(CASE WHEN v.is_yes = 1 THEN v.amount END), 0) AS total_yes,
+                       COALESCE(SUM(CASE WHEN v.is_yes = 0 THEN v.amount END), 0) AS total_no,
+                       r.outcome
+                FROM markets m
+                LEFT JOIN votes v ON v.market_id = m.id
+                LEFT JOIN resolutions r ON r.market_id = m.id
+                GROUP BY m.id
+                ORDER BY m.id
+                """
+            ).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "endTime": row["end_time"],
+                "totalYes": row["total_yes"],
+                "totalNo": row["total_no"],
+                "resolved": row["outcome"] is not None,
+                "outcome": bool(row["outcome"]) if row["outcome"] is not None else False,
+            }
+            for row in rows
+        ]
+
+    def get_all_user_bets(self, address):
+        """インデックスから指定ユーザーのベットを get_all_user_bets() と同じ形で返す"""
+        user = address.lower()
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT v.market_id, SUM(v.amount) AS amount,
+                       (SELECT is_yes FROM votes l
+                        WHERE l.user = v.user AND l.market_id = v.market_id
+                        ORDER BY l.block_number DESC, l.log_index DESC LIMIT 1) AS is_yes,
+                       EXISTS (SELECT 1 FROM claims c
+                               WHERE c.user = v.user AND c.market_id = v.market_id) AS claimed
+                FROM votes v
+                WHERE v.user = ?
+                GROUP BY v.market_id
+                ORDER BY v.market_id
+                """,
+                (user,),
+            ).fetchall()
+        return [
+            {
+                "market_id": row["market_id"],
+                "amount": row["amount"],
+                "isYes": bool(row["is_yes"]),
+                "claimed": bool(row["claimed"]),
+            }
+            for row in rows
+            if row["amount"] > 0
+        ]
+
+    def get_market_events(self, from_block, to_block):
+        """
+        インデックス済みの Voted / MarketResolved / RewardClaimed を古い順に返す（Leaderboard 用）
+
+        1 件は {"event", "block_number", "tx_hash", "log_index", "args"}。
+        MarketResolved はログの位置を持っていないので、同じブロックの中では最後に並べる
+        （確定した市場にはもう投票できないので、同じブロックの投票より前には来ない）。
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT 'Voted' AS event, block_number, 0 AS last, tx_hash, log_index, market_id,
+                       user, is_yes, amount, NULL AS outcome
+                FROM votes WHERE block_number BETWEEN ? AND ?
+                UNION ALL
+                SELECT 'RewardClaimed', block_number, 0, tx_hash, log_index, market_id,
+                       user, NULL, amount, NULL
+                FROM claims WHERE block_number BETWEEN ? AND ?
+                UNION ALL
+                SELECT 'MarketResolved', block_number, 1, tx_hash, NULL, market_id,
+                       NULL, NULL, NULL, outcome
+                FROM resolutions WHERE block_number BETWEEN ? AND ?
+                ORDER BY block_number, last, log_index
+                """,
+                (from_block, to_block) * 3,
+            ).fetchall()
+        events = []
+        for row in rows:
+            if row["event"] == "Voted":
+                args = {"user": row["user"], "marketId": row["market_id"],
+                        "isYes": bool(row["is_yes"]), "amount": row["amount"]}
+            elif row["event"] == "RewardClaimed":
+                args = {"user": row["user"], "amount": row["amount"]}
+            else:
+                args = {"marketId": row["market_id"], "outcome": bool(row["outcome"])}
+            events.append({
+                "event": row["event"],
+                "block_number": row["block_number"],
+                "tx_hash": row["tx_hash"],
+                "log_index": row["log_index"],
+                "args": args,
+            })
+        return events
+
+    def get_balance_history(self, address):
+        """
+        指定ユーザーの残高の増減履歴を古い順に返す
+
+        投票（マイナス）と配当受け取り（プラス）をイベントから並べたもの。
+        faucet はイベントを出さないので履歴には含まれない。
+        """
+        user = address.lower()
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT block_number, tx_hash, log_index, market_id, -amount AS delta, 'vote' AS kind
+                FROM votes WHERE user = ?
+                UNION ALL
+                SELECT block_number, tx_hash, log_index, market_id, amount AS delta, 'claim' AS kind
+                FROM claims WHERE user = ?
+                ORDER BY block_number, log_index
+                """,
+                (user, user),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_sbt_holders(self):
+        """SBT の Transfer イベントから現在の保有数を {address: count} で返す"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT from_addr, to_addr FROM sbt_transfers ORDER BY block_number, log_index"
+            ).fetchall()
+        holders = {}
+        for row in rows:
+            holders[row["to_addr"]] = holders.get(row["to_addr"], 0) + 1
+            if row["from_addr"] in holders:
+                holders[row["from_addr"]] -= 1
+        return {addr: n for addr, n in holders.items() if n > 0 and int(addr, 16) != 0}
@@ -0,0 +1,331 @@
+import bisect
+import os
+import threading
+
+from utils.settlement import rewards
+
+
+# ランキングの 1 ページの件数（上位 100 人）
+DEFAULT_TOP_K = int(os.getenv("LEADERBOARD_TOP_K", "100"))
+
+# 並べ替えに使える指標
+ORDER_KEYS = ("balance", "pnl")
+
+# 一度にこれより多く更新するときは、1 件ずつ並べ直さずに最後にまとめてソートする
+BULK_THRESHOLD = 64
+
+
+class Participant:
+    """ランキングに載る 1 ウォレットの集計値"""
+
+    __slots__ = ("address", "balance", "staked", "bets", "wins", "losses", "pnl", "claimed")
+
+    def __init__(self, address):
+        self.address = address
+        self.balance = 0
+        self.staked = 0
+        self.bets = 0
+        self.wins = 0
+        self.losses = 0
+        self.pnl = 0
+        self.claimed = 0
+
+    def to_dict(self):
+        return {
+            "address": self.address,
+            "balance": self.balance,
+            "total_staked": self.staked,
+            "bets": self.bets,
+            "wins": self.wins,
+            "losses": self.losses,
+            "pnl": self.pnl,
+            "claimed": self.claimed,
+        }
+
+
+def _rank_key(p, order):
+    """並び順のキー（小さいほど上位）。同点はアドレス順"""
+    if order == "balance":
+        return (-p.balance, -p.staked, p.address)
+    return (-p.pnl, -p.balance, p.address)
+
+
+class Leaderboard:
+    """
+    全参加者のランキング（Voted / MarketResolved / RewardClaimed から差分で更新する）
+
+    イベントは manager.get_indexer()（utils/event_indexer.py の EventIndexer）から読む。
+    インデクサは確定済みのブロックだけを取り込み、リオーグでは巻き戻すので、
+    巻き戻しがあったら集計を捨てて最初から取り込み直す。
+
+    インデクサが使えない（INDEXER_START_BLOCK が未設定の）ときは、知っているアドレス
+    （接続中のアドレスと sync() に渡されたアドレス）だけのランキングを bet matrix と
+    残高から毎回作り直す（indexed が False になる。配当の受け取り額は数えない）。
+
+    参加者ごとに残高・累計ベット額・ベット件数・勝敗・確定損益を持ち、
+    並び順ごとのソート済みリストを bisect で保つ。上位 K 人やページの取り出しは
+    リストを切り出すだけなので、参加者が数千人いてもすぐ返る。
+
+    - 確定損益は市場が確定した時点で計上する（当たりは pari-mutuel の配当 - 賭け額、
+      外れは -賭け額）。配当を受け取った（claim）ときは残高だけが増える
+    - 残高は初めて見たアドレスだけ get_balances() でまとめて（取り込んだブロック時点で）
+      読み、以降はイベントで増減させる。faucet はイベントを出さないので、初めて見た後の
+      faucet は refresh_balances() を呼ぶまで反映されない
+    """
+
+    def __init__(self, manager=None):
+        self.manager = manager
+        self._lock = threading.RLock()
+        # インデクサが使えないときにランキングに載せるアドレス
+        self._known = {}
+        account = getattr(manager, "account", None)
+        if account is not None:
+            self._known[account.address.lower()] = account.address
+        # 最後の sync() をインデクサのイベントから作ったか
+        self.indexed = True
+        self._reset()
+
+    def _reset(self):
+        # ここまでのブロックのイベントを取り込んだ（まだなら None）
+        self.block = None
+        # 取り込んだときのインデクサの巻き戻し回数
+        self._rewinds = None
+        self._participants = {}
+        self._positions = {}
+        self._pools = {}
+        self._outcomes = {}
+        self._ranks = {order: [] for order in ORDER_KEYS}
+        # True の間はソート済みリストを触らない（apply_events の最後に作り直す）
+        self._bulk = False
+
+    def __len__(self):
+        return len(self._participants)
+
+    # --- 差分の反映 ---
+
+    def _participant(self, address):
+        key = address.lower()
+        p = self._participants.get(key)
+        if p is None:
+            p = self._participants[key] = Participant(address)
+            self._attach(p)
+        return p
+
+    def _detach(self, p):
+        if self._bulk:
+            return
+        for order, keys in self._ranks.items():
+            del keys[bisect.bisect_left(keys, _rank_key(p, order))]
+
+    def _attach(self, p):
+        if self._bulk:
+            return
+        for order, keys in self._ranks.items():
+            bisect.insort(keys, _rank_key(p, order))
+
+    def _update(self, p, **deltas):
+        """p の値を増減させ、ソート済みリストの位置を付け直す"""
+        self._detach(p)
+        for name, delta in deltas.items():
+            setattr(p, name, getattr(p, name) + delta)
+        self._attach(p)
+
+    def apply_vote(self, user, market_id, is_yes, amount):
+        with self._lock:
+            p = self._participant(user)
+            positions = self._positions.setdefault(market_id, {})
+            position = positions.get(p.address.lower())
+            if position is None:
+                positions[p.address.lower()] = [amount, bool(is_yes)]
+                self._update(p, staked=amount, balance=-amount, bets=1)
+            else:
+                position[0] += amount
+                self._update(p, staked=amount, balance=-amount)
+            pool = self._pools.setdefault(market_id, [0, 0])
+            pool[0 if is_yes else 1] += amount
+
+    def apply_resolution(self, market_id, outcome):
+        """市場の確定。賭けていた全員の勝敗と確定損益を計上する"""
+        with self._lock:
+            if market_id in self._outcomes:
+                return
+            self._outcomes[market_id] = bool(outcome)
+            yes, no = self._pools.get(market_id, (0, 0))
+            positions = self._positions.get(market_id, {})
+            if not positions:
+                return
+            amounts = [amount for amount, _ in positions.values()]
+            is_yes = [side for _, side in positions.values()]
+            # 当たりは pari-mutuel の配当 - 賭け額、外れは -賭け額（utils/settlement.py）
+            paid = rewards(amounts, is_yes, bool(outcome), yes, no).tolist()
+            for user, amount, side, reward in zip(positions, amounts, is_yes, paid):
+                p = self._participants[user]
+                if side == bool(outcome):
+                    self._update(p, wins=1, pnl=reward - amount)
+                else:
+                    self._update(p, losses=1, pnl=-amount)
+
+    def apply_claim(self, user, amount):
+        with self._lock:
+            self._update(self._participant(user), balance=amount, claimed=amount)
+
+    def set_balance(self, user, balance):
+        with self._lock:
+            p = self._participant(user)
+            self._update(p, balance=int(balance) - p.balance)
+
+    def set_balances(self, balances):
+        """{address: balance} をまとめて反映する（件数が多ければ最後に 1 回だけ並べ直す）"""
+        with self._lock:
+            self._bulk = len(balances) > BULK_THRESHOLD
+            try:
+                for address, balance in balances.items():
+                    self.set_balance(address, balance)
+            finally:
+                if self._bulk:
+                    self._bulk = False
+                    self._rebuild()
+
+    def apply_events(self, events):
+        """
+        イベント（get_market_events() の形）を古い順に反映し、初めて見たアドレスを返す
+
+        件数が多いとき（初回の取り込みなど）は、1 件ずつ並べ直さずに
+        最後にまとめてソートし直す。
+        """
+        with self._lock:
+            known = set(self._participants)
+            self._bulk = len(events) > max(BULK_THRESHOLD, len(self._participants))
+            try:
+                for event in events:
+                    args = event["args"]
+                    name = event["event"]
+                    if name == "Voted":
+                        self.apply_vote(args["user"], int(args["marketId"]), args["isYes"], int(args["amount"]))
+                    elif name == "MarketResolved":
+                        self.apply_resolution(int(args["marketId"]), args["outcome"])
+                    elif name == "RewardClaimed":
+                        self.apply_claim(args["user"], int(args["amount"]))
+            finally:
+                if self._bulk:
+                    self._bulk = False
+                    self._rebuild()
+            return [p.address for key, p in self._participants.items() if key not in known]
+
+    def _rebuild(self):
+        for order in ORDER_KEYS:
+            self._ranks[order] = sorted(_rank_key(p, order) for p in self._participants.values())
+
+    # --- チェーンとの同期 ---
+
+    def sync(self, addresses=()):
+        """
+        インデクサを進め、前回の続きから確定済みのブロックまでのイベントを取り込む
+
+        初めて見たアドレスの残高は最後に 1 回のバッチで読む。取り込んだイベント数を返す。
+        インデクサが使えない（INDEXER_START_BLOCK が未設定の）ときは、addresses も含めた
+        知っているアドレスだけで作り直し（_sync_known）、0 を返す。
+        """
+        with self._lock:
+            for address in addresses:
+                self._known.setdefault(address.lower(), address)
+            indexer = self.manager.get_indexer()
+            if indexer is None:
+                self._sync_known()
+                return 0
+            if not self.indexed:
+                self._reset()
+                self.indexed = True
+            if self._rewinds is not None and indexer.rewinds != self._rewinds:
+                # リオーグで取り込み済みのイベントが消えたかもしれないので最初から
+                self._reset()
+            self._rewinds = indexer.rewinds
+            head = indexer.last_block
+            start = 0 if self.block is None else self.block + 1
+            if head < start:
+                return 0
+            events = indexer.get_market_events(start, head)
+            new_addresses = self.apply_events(events)
+            if new_addresses:
+                # イベントと同じブロック時点の残高にする（未確定のブロックの分を二重に数えない）
+                self.set_balances(self.manager.get_balances(new_addresses, block_identifier=head))
+            self.block = head
+            return len(events)
+
+    def _sync_known(self):
+        """知っているアドレスのベット（bet matrix）と残高、市場の結果からランキングを作り直す"""
+        self._reset()
+        self.indexed = False
+        addresses = list(self._known.values())
+        markets = self.manager.get_all_markets()
+        matrix = self.manager.get_bet_matrix(addresses, market_ids=[int(m["id"]) for m in markets])
+        self._bulk = True
+        try:
+            for row, address in enumerate(matrix["addresses"]):
+                self._participant(address)
+                for col, market_id in enumerate(matrix["market_ids"]):
+                    amount = int(matrix["amount"][row][col])
+                    if amount:
+                        self.apply_vote(address, int(market_id), matrix["isYes"][row][col], amount)
+            for m in markets:
+                # 配当はこのアドレスたちの分だけでなく、市場全体のプールで決まる
+                self._pools[int(m["id"])] = [int(m["totalYes"]), int(m["totalNo"])]
+                if m["resolved"]:
+                    self.apply_resolution(int(m["id"]), m["outcome"])
+        finally:
+            self._bulk = False
+            self._rebuild()
+        self.set_balances(self.manager.get_balances(addresses))
+
+    def refresh_balances(self, addresses=None):
+        """残高をチェーンから読み直す（省略時は全員。faucet の分を合わせたいとき用）"""
+        with self._lock:
+            if addresses is None:
+                addresses = [p.address for p in self._participants.values()]
+            self.set_balances(self.manager.get_balances(addresses))
+
+    # --- 読み出し ---
+
+    def page(self, order="balance", offset=0, limit=None):
+        """order の順で offset 番目から limit 人（省略時は DEFAULT_TOP_K 人）を返す（rank は 1 始まり）"""
+        limit = DEFAULT_TOP_K if limit is None else int(limit)
+        with self._lock:
+            keys = self._ranks[order][offset:offset + limit]
+            rows = []
+            for i, key in enumerate(keys):
+                row = self._participants[key[-1].lower()].to_dict()
+                row["rank"] = offset + i + 1
+                rows.append(row)
+            return rows
+
+    def top(self, k=None, order="balance"):
+        return self.page(order, 0, k)
+
+    def rank_of(self, address, order="balance"):
+        """address の順位（1 始まり。ランキングに載っていなければ None）"""
+        with self._lock:
+            p = self._participants.get(address.lower())
+            if p is None:
+                return None
+            return bisect.bisect_left(self._ranks[order], _rank_key(p, order)) + 1
+
+    def get(self, address):
+        """address の集計値の dict（載っていなければ None）"""
+        with self._lock:
+            p = self._participants.get(address.lower())
+            return None if p is None else p.to_dict()
+
+    def positions(self, market_id):
+        """
+        市場に賭けている全員の {"addresses", "amounts", "is_yes"}（同じ並びのリスト）
+
+        確定のプレビュー（utils.settlement.settle）に渡す用。
+        """
+        with self._lock:
+            positions = self._positions.get(int(market_id), {})
+            return {
+                "addresses": [self._participants[user].address for user in positions],
+                "amounts": [amount for amount, _ in positions.values()],
+                "is_yes": [is_yes for _, is_yes in positions.values()],
+            }
+
@@ -0,0 +1,49 @@
+import os
+
+import streamlit as st
+
+
+# 表示を自動更新する間隔（秒）。この間隔で共有の状態を読み直すだけで RPC は増えない
+LIVE_REFRESH_SEC = float(os.getenv("LIVE_REFRESH_SEC", "5"))
+
+
+def live_fragment(func):
+    """
+    func を一定間隔で自動更新される fragment にする
+
+    fragment の中では BlockWatcher / MarketSnapshotService が公開している
+    共有の状態だけを読むこと（セッションごとに RPC を呼ばない）。
+    """
+    if hasattr(st, "fragment"):
+        return st.fragment(run_every=LIVE_REFRESH_SEC)(func)
+    return func
+
+
+def get_live_watcher(address=None):
+    """
+    プロセス共通の BlockWatcher を返す（作れなければ None）
+
+    address を渡すとその残高もブロックごとに読み直してもらう。
+    """
+    try:
+        from utils.registry import get_block_watcher
+
+        watcher = get_block_watcher()
+    except Exception:
+        return None
+    watcher.watch_address(address)
+    return watcher
+
+
+def live_balance(watcher, manager, address):
+    """BlockWatcher が読んだ残高を返す。まだ無ければ 1 回だけ自分で読む"""
+    balance = watcher.balance(address) if watcher else None
+    if balance is None:
+        balance = manager.get_balance(address)
+    return balance
+
+
+def render_block_caption(watcher):
+    """「ブロック #N 時点」の小さな表示"""
+    if watcher is not None and watcher.block is not None:
+        st.caption(f"⛓️ ブロック #{watcher.block} 時点（{int(LIVE_REFRESH_SEC)} 秒ごとに自動更新）")
@@ -0,0 +1,381 @@
+"""
+ローカル版（擬似ブロックチェーン）のデータを SQLite に置くストア
+
+users / markets / bets をインデックス付きのテーブルに分けて持つので、
+1 人のベットや 1 市場の合計を読むのに全体を読み込まなくてよい。
+LOCAL_DB_BACKEND=sqlite にすると load_data() / save_data() もこちらを使う。
+
+今の JSON からの移行（1 回だけ実行する）:
+
+    python -m utils.local_db
+    python -m utils.local_db --json data/database.json --markets markets.json --db data/local.sqlite3
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from utils.storage import JournalStore, StoredData, diff_ops, next_market_id, remember_base
+
+
+# SQLite のファイル（data/ 以下に置く）
+DEFAULT_DB_PATH = os.getenv("LOCAL_DB_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "local.sqlite3"
+)
+
+# 他のプロセスが書き込み中のときに待つ秒数
+BUSY_TIMEOUT_SEC = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    points INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS markets (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'open',
+    end_time INTEGER NOT NULL DEFAULT 0,
+    yes_bets INTEGER NOT NULL DEFAULT 0,
+    no_bets INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_markets_open ON markets (status, end_time);
+CREATE TABLE IF NOT EXISTS bets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    choice TEXT NOT NULL DEFAULT '',
+    amount INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bets_user ON bets (user, seq);
+CREATE INDEX IF NOT EXISTS idx_bets_market ON bets (market_id, choice);
+"""
+
+# テーブルに分けて持つキー（それ以外のキーは meta に JSON のまま入れる）
+TABLE_KEYS = ("users", "markets", "bets")
+
+
+def _int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _end_time(market):
+    """end_time（UNIX 秒）。無ければ markets.json の end_datetime（ISO 形式）から作る"""
+    if market.get("end_time") is not None:
+        return _int(market.get("end_time"))
+    try:
+        return int(datetime.fromisoformat(market["end_datetime"]).timestamp())
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+class LocalDB:
+    """
+    users / markets / bets の SQLite ストア（WAL モード）
+
+    各行は検索に使う列と、元の dict をそのまま入れた data 列（JSON）を持つ。
+    load() / save() は utils.storage.JournalStore と同じ使い方で、
+    save() は読み込んだ時点からの変更だけを 1 回のトランザクションで書く。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_DB_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Streamlit の複数スレッドから使うので、ロックで守った 1 本の接続を共有する
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=BUSY_TIMEOUT_SEC,
+                                    isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+    # --- 検索 ---
+
+    def user_bets(self, user):
+        """ユーザーのベットを古い順に返す"""
+        with self._lock:
+            rows = self.conn.execute("SELECT data FROM bets WHERE user = ? ORDER BY seq", (user,)).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def market_totals(self, market_id):
+        """市場の Yes / No の合計とベット件数（市場が無ければ None）"""
+        with self._lock:
+            market = self.conn.execute(
+                "SELECT yes_bets, no_bets FROM markets WHERE id = ?", (str(market_id),)
+            ).fetchone()
+            if market is None:
+                return None
+            count = self.conn.execute(
+                "SELECT COUNT(*) FROM bets WHERE market_id = ?", (str(market_id),)
+            ).fetchone()[0]
+        return {"yes_bets": market["yes_bets"], "no_bets": market["no_bets"], "bets": count}
+
+    def open_markets(self, now=None):
+        """募集中の市場を締め切りが近い順に（締め切り 0 は無期限で先頭）"""
+        now = int(time.time()) if now is None else now
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT data FROM markets WHERE status = 'open' AND (end_time = 0 OR end_time > ?) "
+                "ORDER BY end_time, rowid",
+                (now,),
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def get_user(self, name):
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM users WHERE name = ?", (name,)).fetchone()
+        return None if row is None else json.loads(row["data"])
+
+    # --- 書き込み（1 件ずつ） ---
+
+    def _put_user(self, name, info):
+        self.conn.execute(
+            "INSERT INTO users (name, points, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET points = excluded.points, data = excluded.data",
+            (name, _int(info.get("points")), json.dumps(info, ensure_ascii=False)),
+        )
+
+    def _put_market(self, market):
+        self.conn.execute(
+            "INSERT INTO markets (id, title, status, end_time, yes_bets, no_bets, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title = excluded.title, status = excluded.status, "
+            "end_time = excluded.end_time, yes_bets = excluded.yes_bets, no_bets = excluded.no_bets, "
+            "data = excluded.data",
+            (str(market.get("id")), market.get("title") or "", market.get("status") or "open",
+             _end_time(market), _int(market.get("yes_bets")), _int(market.get("no_bets")),
+             json.dumps(market, ensure_ascii=False)),
+        )
+
+    def _add_bet(self, bet):
+        self.conn.execute(
+            "INSERT INTO bets (user, market_id, choice, amount, data) VALUES (?, ?, ?, ?, ?)",
+            (bet.get("user") or "", str(bet.get("market_id")), bet.get("choice") or "",
+             _int(bet.get("amount")), json.dumps(bet, ensure_ascii=False)),
+        )
+
+    def _set_points(self, name, points):
+        info = self.conn.execute("SELECT data FROM users WHERE name = ?", (name,)).fetchone()
+        info = json.loads(info["data"]) if info else {}
+        info["points"] = points
+        self._put_user(name, info)
+
+    def _put(self, key, value):
+        """キーごと置き換える"""
+        if key == "users":
+            self.conn.execute("DELETE FROM users")
+            for name, info in (value or {}).items():
+                self._put_user(name, info)
+        elif key == "markets":
+            self.conn.execute("DELETE FROM markets")
+            for market in value or []:
+                self._put_market(market)
+        elif key == "bets":
+            self.conn.execute("DELETE FROM bets")
+            for bet in value or []:
+                self._add_bet(bet)
+        else:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value, ensure_ascii=False)),
+            )
+
+    def _apply(self, op):
+        """utils.storage のジャーナルと同じ形の操作を 1 件反映する"""
+        kind = op.get("op")
+        if kind == "bet":
+            self._add_bet(op["bet"])
+        elif kind == "points":
+            self._set_points(op["user"], op["points"])
+        elif kind == "user":
+            self._put_user(op["user"], op["value"])
+        elif kind == "market":
+            self._put_market(op["value"])
+        elif kind == "market_fields":
+            row = self.conn.execute("SELECT data FROM markets WHERE id = ?", (str(op["id"]),)).fetchone()
+            if row is not None:
+                market = {**json.loads(row["data"]), **op["fields"]}
+                for field in op.get("unset", ()):
+                    market.pop(field, None)
+                self._put_market(market)
+        elif kind == "put":
+            self._put(op["key"], op["value"])
+
+    def append(self, ops):
+        """操作（utils.storage.JournalStore.append と同じ形）を 1 回のトランザクションで反映する"""
+        with self._lock, self._transaction():
+            for op in ops:
+                self._apply(op)
+
+    def allocate_market(self, fields):
+        """新しい市場を書いて返す（ID はトランザクションの中で今の市場から払い出す）"""
+        with self._lock, self._transaction():
+            markets = [json.loads(row["data"]) for row in self.conn.execute("SELECT data FROM markets")]
+            market = {"id": next_market_id(markets), **fields}
+            self._put_market(market)
+        return market
+
+    def add_bet(self, bet):
+        with self._lock, self._transaction():
+            self._add_bet(bet)
+
+    def set_points(self, user, points):
+        with self._lock, self._transaction():
+            self._set_points(user, points)
+
+    # --- load_data / save_data 互換 ---
+
+    def _read_all(self):
+        data = {}
+        for row in self.conn.execute("SELECT key, value FROM meta"):
+            data[row["key"]] = json.loads(row["value"])
+        # 空のテーブルは、元の JSON に無かったキーとして扱う
+        if self.conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() or "users" in data:
+            data["users"] = {row["name"]: json.loads(row["data"])
+                             for row in self.conn.execute("SELECT name, data FROM users ORDER BY rowid")}
+        if self.conn.execute("SELECT 1 FROM markets LIMIT 1").fetchone():
+            data["markets"] = [json.loads(row["data"])
+                               for row in self.conn.execute("SELECT data FROM markets ORDER BY rowid")]
+        if self.conn.execute("SELECT 1 FROM bets LIMIT 1").fetchone():
+            data["bets"] = [json.loads(row["data"])
+                            for row in self.conn.execute("SELECT data FROM bets ORDER BY seq")]
+        return data
+
+    def load(self):
+        """全データを database.json と同じ形の dict で返す（StoredData）"""
+        with self._lock:
+            data = self._read_all()
+        return remember_base(StoredData(data))
+
+    def save(self, data):
+        """
+        load() で読んだ dict を保存する（変わった分だけを書く。utils.storage.diff_ops を参照）
+
+        書いた操作のリストを返す。
+        """
+        base = getattr(data, "base", None)
+        with self._lock, self._transaction():
+            if base is None:
+                ops = diff_ops(self._read_all(), data)
+            else:
+                ops = diff_ops(base, data, data.bets_seen)
+            for op in ops:
+                self._apply(op)
+        if base is not None:
+            remember_base(data)
+        return ops
+
+    def get_market(self, market_id):
+        """市場 1 件の最新の値（無ければ None）"""
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM markets WHERE id = ?", (str(market_id),)).fetchone()
+        return None if row is None else json.loads(row["data"])
+
+    def is_empty(self):
+        with self._lock:
+            return not any(
+                self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+                for table in ("meta",) + TABLE_KEYS
+            )
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT（例外なら ROLLBACK）"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_dbs = {}
+_dbs_lock = threading.Lock()
+
+
+def get_local_db(path=None):
+    """パスごとにプロセスで 1 つの LocalDB を返す"""
+    path = os.path.abspath(path or DEFAULT_DB_PATH)
+    with _dbs_lock:
+        db = _dbs.get(path)
+        if db is None:
+            db = _dbs[path] = LocalDB(path)
+        return db
+
+
+# --- JSON からの移行 ---
+
+
+def migrate(db, json_path=None, markets_path=None, replace=False):
+    """
+    database.json と markets.json の中身を db に入れて、入れた件数を返す
+
+    database.json は JournalStore で読む（スナップショットにまだ入っていない
+    ジャーナルの分も入れる）。markets.json の市場は database.json に同じ ID が
+    無いものだけを足す。replace なら meta に残っている古いキーも消してから入れる。
+    """
+    data = {}
+    if json_path and os.path.exists(json_path):
+        data = dict(JournalStore(json_path).load())
+    markets = list(data.get("markets", []))
+    if markets_path and os.path.exists(markets_path):
+        with open(markets_path, "r", encoding="utf-8") as f:
+            known = {str(m.get("id")) for m in markets}
+            markets.extend(m for m in json.load(f) if str(m.get("id")) not in known)
+
+    with db._lock, db._transaction():
+        if replace:
+            db.conn.execute("DELETE FROM meta")
+        for key, value in data.items():
+            if key not in TABLE_KEYS:
+                db._put(key, value)
+        db._put("users", data.get("users", {}))
+        db._put("markets", markets)
+        db._put("bets", data.get("bets", []))
+    return {"users": len(data.get("users", {})), "markets": len(markets), "bets": len(data.get("bets", []))}
+
+
+def main(argv=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="database.json / markets.json を SQLite に移す")
+    parser.add_argument("--json", default=os.path.join(root, "data", "database.json"), help="database.json のパス")
+    parser.add_argument("--markets", default=os.path.join(root, "markets.json"), help="markets.json のパス")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="書き込む SQLite のパス")
+    parser.add_argument("--replace", action="store_true", help="すでにデータがあっても上書きする")
+    args = parser.parse_args(argv)
+
+    db = LocalDB(args.db)
+    if not db.is_empty() and not args.replace:
+        print(f"{args.db} にはすでにデータがあります（上書きするなら --replace）")
+        return 1
+    counts = migrate(db, args.json, args.markets, replace=args.replace)
+    print(f"移行しました: users={counts['users']} markets={counts['markets']} bets={counts['bets']} → {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+
+
+class MarketIndex:
+    """
+    市場一覧の索引（スナップショットごとに 1 回だけ作る）
+
+    - 市場 ID → 行番号のハッシュ表（同じ ID が複数あれば後のものを使う）
+    - 未確定の市場を締め切り順に並べた配列
+
+    「募集中」と「締め切りを過ぎたが未確定」は時刻で変わるので、締め切り順の配列を
+    now で二分探索して切り分ける。どちらの一覧も O(log n) + 件数 で取り出せる。
+    """
+
+    def __init__(self, table, markets=None):
+        self.table = table
+        self.markets = markets
+
+        # 重複した ID は後ろの行だけを残す
+        ids = table.ids
+        _, last = np.unique(ids[::-1], return_index=True)
+        rows = np.sort(len(ids) - 1 - last)
+        self._positions = dict(zip(ids[rows].tolist(), rows.tolist()))
+        # rows_of() 用: ID の昇順に並べた (ID, 行番号)
+        order = np.argsort(ids[rows], kind="stable")
+        self._sorted_ids = ids[rows][order]
+        self._sorted_rows = rows[order]
+
+        unresolved = rows[~table.resolved[rows]]
+        end_time = table.end_time[unresolved]
+        # 締め切り 0 は無期限（いつまでも募集中）
+        self._no_deadline = unresolved[end_time == 0]
+        dated = unresolved[end_time != 0]
+        self._by_deadline = dated[np.argsort(table.end_time[dated], kind="stable")]
+        self._deadlines = table.end_time[self._by_deadline]
+        self._resolved = rows[table.resolved[rows]]
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, market_id):
+        return self.position(market_id) is not None
+
+    def position(self, market_id):
+        """市場 ID（int でも文字列でもよい）から行番号を引く（無ければ None）"""
+        try:
+            return self._positions.get(int(market_id))
+        except (TypeError, ValueError):
+            return None
+
+    def rows_of(self, market_ids):
+        """市場 ID の配列を行番号の配列にまとめて変換する（無い ID は -1）"""
+        market_ids = np.asarray(market_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.full(len(market_ids), -1, dtype=np.int64)
+        at = np.minimum(np.searchsorted(self._sorted_ids, market_ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[at] == market_ids, self._sorted_rows[at], -1)
+
+    def raw(self, market_id):
+        """市場 ID からコントラクトの市場 dict を返す（無ければ None）"""
+        row = self.position(market_id)
+        if row is None or self.markets is None:
+            return None
+        return self.markets[row]
+
+    def market(self, market_id):
+        """市場 ID から Market を返す（無ければ None）"""
+        row = self.position(market_id)
+        return None if row is None else self.table.market(row)
+
+    # --- 時刻で切り分けるビュー ---
+
+    def _split(self, now):
+        now = int(time.time()) if now is None else now
+        return int(np.searchsorted(self._deadlines, now, side="right"))
+
+    def open_by_deadline(self, now=None):
+        """募集中の行番号を締め切りが近い順に（締め切り 0 は先頭）"""
+        return np.concatenate([self._no_deadline, self._by_deadline[self._split(now):]])
+
+    def awaiting_resolution(self, now=None):
+        """締め切りを過ぎたがまだ確定していない行番号を締め切りが古い順に"""
+        return self._by_deadline[:self._split(now)]
+
+    def unresolved(self, now=None):
+        """未確定の行番号（締め切りを過ぎたものが先、その後に募集中のもの）"""
+        return np.concatenate([self.awaiting_resolution(now), self.open_by_deadline(now)])
+
+    def closed(self, now=None):
+        """終了した行番号（確定済み + 締め切りを過ぎたもの）"""
+        return np.concatenate([self._resolved, self.awaiting_resolution(now)])
+
+    def choices(self, rows):
+        """行番号を selectbox に渡す市場 ID（int）のリストにする"""
+        return self.table.ids[rows].tolist()
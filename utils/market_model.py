@@ -0,0 +1,270 @@
+import time
+
+import numpy as np
+
+
+OPEN = "open"
+CLOSED = "closed"
+
+# MarketTable.window() で使える並び順
+SORT_KEYS = ("deadline", "pool", "yes_ratio")
+
+DEFAULT_TITLE = "タイトル未設定"
+
+
+def _int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Market:
+    """
+    1 つの市場（get_all_markets() の dict をアプリで使う形にしたもの）
+
+    __slots__ で属性を固定しているので、dict より小さく属性アクセスも速い。
+    画面に渡すときは to_dict() で従来の dict 形式にする。
+    """
+
+    __slots__ = ("id", "title", "description", "end_time", "yes_bets", "no_bets",
+                 "resolved", "outcome", "source")
+
+    def __init__(self, id, title, description="", end_time=0, yes_bets=0, no_bets=0,
+                 resolved=False, outcome=False, source="onchain"):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.end_time = end_time
+        self.yes_bets = yes_bets
+        self.no_bets = no_bets
+        self.resolved = resolved
+        self.outcome = outcome
+        self.source = source
+
+    @classmethod
+    def from_raw(cls, raw, source="onchain"):
+        """コントラクトの市場 dict（id, title, endTime, totalYes, ...）から作る"""
+        return cls(
+            id=_int(raw.get("id")),
+            title=raw.get("title") or DEFAULT_TITLE,
+            description=raw.get("description", "") or "",
+            end_time=_int(raw.get("endTime")),
+            yes_bets=_int(raw.get("totalYes")),
+            no_bets=_int(raw.get("totalNo")),
+            resolved=bool(raw.get("resolved")),
+            outcome=bool(raw.get("outcome")),
+            source=source,
+        )
+
+    def is_open(self, now=None):
+        """確定しておらず、締め切り前（締め切り 0 は無期限）なら True"""
+        now = int(time.time()) if now is None else now
+        return not self.resolved and (self.end_time == 0 or self.end_time > now)
+
+    def status(self, now=None):
+        return OPEN if self.is_open(now) else CLOSED
+
+    @property
+    def pool(self):
+        return self.yes_bets + self.no_bets
+
+    @property
+    def yes_ratio(self):
+        """Yes に賭けられた割合（まだ誰も賭けていなければ None）"""
+        return self.yes_bets / self.pool if self.pool else None
+
+    @property
+    def result(self):
+        return self.outcome if self.resolved else None
+
+    def to_dict(self, now=None):
+        """ページで使ってきた dict 形式（id は文字列）"""
+        return {
+            "id": str(self.id),
+            "title": self.title,
+            "description": self.description,
+            "end_time": self.end_time,
+            "yes_bets": self.yes_bets,
+            "no_bets": self.no_bets,
+            "status": self.status(now),
+            "result": self.result,
+            "source": self.source,
+        }
+
+
+def normalize_market(raw, now=None, source="onchain"):
+    """コントラクトの市場 dict 1 件をページ用の dict にする"""
+    return Market.from_raw(raw, source).to_dict(now)
+
+
+class MarketTable:
+    """
+    多数の市場を列ごとの numpy 配列で持つコレクション
+
+    状態（募集中か）、プール、Yes 率、締め切り順の並べ替えは配列演算 1 回で出す。
+    文字列（title / description）だけは Python のリストで持つ。
+    行 i の値は各配列の i 番目。
+    """
+
+    def __init__(self, ids, titles, descriptions, end_time, yes_bets, no_bets, resolved, outcome,
+                 source="onchain"):
+        self.ids = ids
+        self.titles = titles
+        self.descriptions = descriptions
+        self.end_time = end_time
+        self.yes_bets = yes_bets
+        self.no_bets = no_bets
+        self.resolved = resolved
+        self.outcome = outcome
+        self.source = source
+        self._positions = None
+
+    @classmethod
+    def from_raw(cls, markets, source="onchain"):
+        """get_all_markets() の dict のリストから作る"""
+        n = len(markets)
+        ids = np.fromiter((_int(m.get("id")) for m in markets), dtype=np.int64, count=n)
+        end_time = np.fromiter((_int(m.get("endTime")) for m in markets), dtype=np.int64, count=n)
+        yes_bets = np.fromiter((_int(m.get("totalYes")) for m in markets), dtype=np.int64, count=n)
+        no_bets = np.fromiter((_int(m.get("totalNo")) for m in markets), dtype=np.int64, count=n)
+        resolved = np.fromiter((bool(m.get("resolved")) for m in markets), dtype=bool, count=n)
+        outcome = np.fromiter((bool(m.get("outcome")) for m in markets), dtype=bool, count=n)
+        titles = [m.get("title") or DEFAULT_TITLE for m in markets]
+        descriptions = [m.get("description", "") or "" for m in markets]
+        return cls(ids, titles, descriptions, end_time, yes_bets, no_bets, resolved, outcome, source)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- 列ごとの計算（全件を 1 回で） ---
+
+    def open_mask(self, now=None):
+        """募集中の行が True の配列"""
+        now = int(time.time()) if now is None else now
+        return ~self.resolved & ((self.end_time == 0) | (self.end_time > now))
+
+    @property
+    def pool(self):
+        return self.yes_bets + self.no_bets
+
+    @property
+    def yes_ratio(self):
+        """Yes 率の配列（プールが 0 の行は NaN）"""
+        pool = self.pool
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(pool > 0, self.yes_bets / np.maximum(pool, 1), np.nan)
+
+    def open_by_deadline(self, now=None):
+        """募集中の行番号を締め切りが近い順に（締め切り 0 は先頭）"""
+        rows = np.flatnonzero(self.open_mask(now))
+        return rows[np.argsort(self.end_time[rows], kind="stable")]
+
+    def closed_by_deadline(self, now=None):
+        """終了した行番号を締め切りが新しい順に"""
+        rows = np.flatnonzero(~self.open_mask(now))
+        return rows[np.argsort(-self.end_time[rows], kind="stable")]
+
+    def by_pool(self, rows=None):
+        """行番号をプールの大きい順に"""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        return rows[np.argsort(-self.pool[rows], kind="stable")]
+
+    def sort_key(self, sort):
+        """並び順 sort（SORT_KEYS のどれか）のキーの配列"""
+        if sort == "deadline":
+            return self.end_time
+        if sort == "pool":
+            return self.pool
+        if sort == "yes_ratio":
+            # まだ誰も賭けていない市場は一番低い扱いにする
+            return np.nan_to_num(self.yes_ratio, nan=-1.0)
+        raise ValueError(f"unknown sort key: {sort}")
+
+    def window(self, rows, sort="deadline", descending=False, page_size=20, cursor=None):
+        """
+        rows を sort で並べ、cursor の次から page_size 件だけを返す（キーセット方式のページング）
+
+        cursor は前のページの最後の行の (キーの値, 市場 ID)。
+        締め切り順なら (タイムスタンプ, -1) を渡すと「その時刻以降の締め切り」から始められる。
+        同じキーの行は市場 ID の小さい順。並べ替えは配列演算で行い、dict は作らない。
+
+        戻り値は {"rows": 表示する行番号, "next": 次のページの cursor（最後なら None）,
+                 "start": 表示する先頭が何件目か（0 始まり）, "total": 全件数}
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        sign = -1 if descending else 1
+        key = self.sort_key(sort)[rows] * sign
+        ids = self.ids[rows]
+        order = np.lexsort((ids, key))
+        key, ids, rows = key[order], ids[order], rows[order]
+
+        start = 0
+        if cursor is not None:
+            cursor_key, cursor_id = cursor[0] * sign, cursor[1]
+            after = (key > cursor_key) | ((key == cursor_key) & (ids > cursor_id))
+            start = int(np.argmax(after)) if after.any() else len(rows)
+
+        page = rows[start:start + page_size]
+        next_cursor = None
+        if start + page_size < len(rows):
+            last = start + page_size - 1
+            next_cursor = (key[last].item() * sign, int(ids[last]))
+        return {"rows": page, "next": next_cursor, "start": start, "total": len(rows)}
+
+    # --- 行の取り出し ---
+
+    def position(self, market_id):
+        """市場 ID から行番号を引く（無ければ None）"""
+        if self._positions is None:
+            self._positions = {int(market_id): i for i, market_id in enumerate(self.ids.tolist())}
+        try:
+            return self._positions.get(int(market_id))
+        except (TypeError, ValueError):
+            return None
+
+    def market(self, row):
+        return Market(
+            id=int(self.ids[row]),
+            title=self.titles[row],
+            description=self.descriptions[row],
+            end_time=int(self.end_time[row]),
+            yes_bets=int(self.yes_bets[row]),
+            no_bets=int(self.no_bets[row]),
+            resolved=bool(self.resolved[row]),
+            outcome=bool(self.outcome[row]),
+            source=self.source,
+        )
+
+    def get(self, market_id):
+        """市場 ID から Market を返す（無ければ None）"""
+        row = self.position(market_id)
+        return None if row is None else self.market(row)
+
+    def to_dicts(self, rows=None, now=None):
+        """行番号（省略時は全件）をページ用の dict のリストにする"""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return []
+        is_open = self.open_mask(now)[rows].tolist()
+        resolved = self.resolved[rows].tolist()
+        outcome = self.outcome[rows].tolist()
+        ids = self.ids[rows].tolist()
+        end_time = self.end_time[rows].tolist()
+        yes_bets = self.yes_bets[rows].tolist()
+        no_bets = self.no_bets[rows].tolist()
+        rows = rows.tolist()
+        return [
+            {
+                "id": str(ids[k]),
+                "title": self.titles[row],
+                "description": self.descriptions[row],
+                "end_time": end_time[k],
+                "yes_bets": yes_bets[k],
+                "no_bets": no_bets[k],
+                "status": OPEN if is_open[k] else CLOSED,
+                "result": outcome[k] if resolved[k] else None,
+                "source": self.source,
+            }
+            for k, row in enumerate(rows)
+        ]
@@ -0,0 +1,199 @@
+import bisect
+import threading
+import time
+from datetime import datetime
+
+
+# 締め切りが無い（読めない）市場の並び順のキー。いつまでも締め切られない
+NO_DEADLINE = float("inf")
+
+OPEN = "open"
+CLOSED = "closed"
+
+
+def _deadline(market):
+    """締め切り（UNIX 秒）。end_time か end_datetime（ISO 形式）から読み、無ければ NO_DEADLINE"""
+    end_time = market.get("end_time")
+    if end_time:
+        try:
+            return float(end_time)
+        except (TypeError, ValueError):
+            pass
+    try:
+        return datetime.fromisoformat(market["end_datetime"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return NO_DEADLINE
+
+
+class MarketRegistry:
+    """
+    ローカル版の市場一覧（create_market / resolve_market / list_markets の中身）
+
+    - ID の払い出しは store のロックの中で行うので、Streamlit の複数スレッドや
+      別のプロセスから同時に作っても ID は重ならない
+    - 市場 ID（文字列にして比べる）→ 市場 dict のハッシュ表
+    - 状態ごとの ID の集合と、募集中の市場を (締め切り, 作成順) で並べたリスト（bisect で保つ）
+
+    変更は 1 件ずつ store（utils.storage.JournalStore か utils.local_db.LocalDB）に
+    追記する（作成は market、確定は変えた項目だけの market_fields 操作）。
+    作るときに store の markets を読み込む。save_data() で書かれた市場は
+    apply_saved() で、その ID の分だけを store から読み直す。
+
+    索引には自分で持つコピーだけを入れ、読み出しもコピーを返す
+    （呼び出し側の dict を書き換えても索引はずれない）。
+    """
+
+    def __init__(self, store=None, markets=None):
+        self.store = store
+        self._lock = threading.RLock()
+        self._markets = {}
+        self._order = {}
+        self._by_status = {}
+        self._indexed = {}
+        self._open = []
+        self._next_id = 1
+        if markets is None and store is not None:
+            markets = store.load().get("markets", [])
+        for market in markets or []:
+            self._add(market)
+
+    def __len__(self):
+        return len(self._markets)
+
+    def __contains__(self, market_id):
+        return str(market_id) in self._markets
+
+    # --- 索引 ---
+
+    def _add(self, market):
+        key = str(market.get("id"))
+        if key in self._markets:
+            self._remove(key)
+        market = self._markets[key] = dict(market)
+        self._order.setdefault(key, len(self._order))
+        status = market.get("status", OPEN)
+        self._by_status.setdefault(status, set()).add(key)
+        entry = None
+        if status == OPEN:
+            entry = (_deadline(market), self._order[key], key)
+            bisect.insort(self._open, entry)
+        # 市場 dict は外で書き換えられることがあるので、索引に入れたときの値を覚えておく
+        self._indexed[key] = (status, entry)
+        # 数字の ID だけを数える（markets.json の 16 進の ID は払い出しに関係しない）
+        if isinstance(market.get("id"), int):
+            self._next_id = max(self._next_id, market["id"] + 1)
+
+    def _remove(self, key):
+        status, entry = self._indexed.pop(key)
+        self._by_status[status].discard(key)
+        if entry is not None:
+            del self._open[bisect.bisect_left(self._open, entry)]
+
+    def _reload(self, key):
+        """store から市場 1 件を読み直して索引に入れ直す（store から消えていれば索引からも外す）"""
+        market = self.store.get_market(key)
+        if market is not None:
+            self._add(market)
+        elif key in self._markets:
+            self._remove(key)
+            del self._markets[key]
+
+    def _persist(self, op):
+        if self.store is not None:
+            self.store.append([op])
+
+    # --- 変更 ---
+
+    def create(self, title, description, end_datetime, **fields):
+        """
+        市場を作って返す（ID は 1, 2, 3, ... の続き）
+
+        store があれば ID は store が排他ロックの中で払い出す（同じファイルを使う
+        別のプロセスの MarketRegistry と重ならない）。
+        """
+        fields = {
+            "title": title,
+            "description": description,
+            "end_datetime": end_datetime,
+            "status": OPEN,
+            **fields,
+        }
+        with self._lock:
+            if self.store is not None:
+                market = self.store.allocate_market(fields)
+            else:
+                market = {"id": self._next_id, **fields}
+            self._add(market)
+            return dict(market)
+
+    def resolve(self, market_id, result):
+        """市場の結果を確定して返す（無い市場なら None）"""
+        with self._lock:
+            key = str(market_id)
+            market = self._markets.get(key)
+            if market is None:
+                return None
+            fields = {"result": result, "status": CLOSED}
+            # 合計額などは save_data() 側で変わっていることがあるので、変えた項目だけを書く
+            self._persist({"op": "market_fields", "id": market["id"], "fields": fields})
+            if self.store is not None:
+                self._reload(key)
+            else:
+                self._add({**market, **fields})
+            return dict(self._markets[key])
+
+    def refresh(self, market_ids):
+        """market_ids の市場を store から読み直して索引に反映する"""
+        if self.store is None:
+            return
+        with self._lock:
+            for market_id in market_ids:
+                self._reload(str(market_id))
+
+    def apply_saved(self, ops):
+        """
+        save_data() が書いた操作（store.save() の戻り値）のうち、市場の分を索引に反映する
+
+        書かれた ID だけを読み直す。markets ごと置き換えられていたら全部読み直す。
+        """
+        ops = ops or []
+        if any(op.get("op") == "put" and op.get("key") == "markets" for op in ops):
+            with self._lock:
+                for key in list(self._markets):
+                    self._remove(key)
+                    del self._markets[key]
+                for market in self.store.load().get("markets", []):
+                    self._add(market)
+            return
+        self.refresh({str(op["id"]) for op in ops if op.get("op") in ("market", "market_fields")})
+
+    # --- 読み出し ---
+
+    def get(self, market_id):
+        """市場 ID（int でも文字列でもよい）の市場 dict のコピー（無ければ None）"""
+        with self._lock:
+            market = self._markets.get(str(market_id))
+            return None if market is None else dict(market)
+
+    def list(self, status=None):
+        """市場を作った順に（status を渡すとその状態の市場だけ）。dict はコピー"""
+        with self._lock:
+            if status is None:
+                keys = sorted(self._markets, key=self._order.__getitem__)
+            else:
+                keys = sorted(self._by_status.get(status, ()), key=self._order.__getitem__)
+            return [dict(self._markets[key]) for key in keys]
+
+    def open_by_deadline(self, now=None):
+        """募集中（締め切り前）の市場を締め切りが近い順に（締め切りの無い市場は最後）"""
+        now = time.time() if now is None else now
+        with self._lock:
+            start = bisect.bisect_right(self._open, (now, float("inf")))
+            return [dict(self._markets[entry[-1]]) for entry in self._open[start:]]
+
+    def due(self, now=None):
+        """締め切りを過ぎたのにまだ確定していない市場を締め切りが古い順に"""
+        now = time.time() if now is None else now
+        with self._lock:
+            end = bisect.bisect_right(self._open, (now, float("inf")))
+            return [dict(self._markets[entry[-1]]) for entry in self._open[:end]]
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+from utils.market_index import MarketIndex
+from utils.market_model import MarketTable
+
+
+# スナップショットをそのまま使ってよい秒数（0 なら古さでは取り直さない）
+DEFAULT_MAX_AGE = float(os.getenv("MARKET_SNAPSHOT_MAX_AGE", "0"))
+
+
+class MarketSnapshot:
+    """ある時点の市場一覧と、それを読んだブロック番号"""
+
+    __slots__ = ("markets", "block", "fetched_at", "version", "_table", "_index")
+
+    def __init__(self, markets, block, version):
+        self.markets = markets
+        self.block = block
+        self.fetched_at = time.time()
+        self.version = version
+        self._table = None
+        self._index = None
+
+    @property
+    def table(self):
+        """markets を列形式にした MarketTable（スナップショットごとに 1 回だけ作る）"""
+        if self._table is None:
+            self._table = MarketTable.from_raw(self.markets or [])
+        return self._table
+
+    @property
+    def index(self):
+        """市場 ID と締め切りの MarketIndex（スナップショットごとに 1 回だけ作る）"""
+        if self._index is None:
+            self._index = MarketIndex(self.table, self.markets or [])
+        return self._index
+
+    @property
+    def age(self):
+        """読んでから何秒たったか"""
+        return time.time() - self.fetched_at
+
+
+class MarketSnapshotService:
+    """
+    全ページ・全セッションで共有する市場一覧のスナップショット
+
+    ページはここから市場一覧を読むので、ページを移動しても取り直さない。
+    取り直すのは次のときだけ:
+
+    - get(force=True) / refresh() が呼ばれたとき
+    - get(max_age=N) で、今のスナップショットが N 秒より古いとき
+    - clear() で古い印が付いたとき（TxTracker が採掘を検知したときに呼ぶ）
+
+    同時に何セッションから呼ばれても、取りに行くのは 1 回だけ。
+    返した markets は全員で共有するので書き換えないこと。
+    """
+
+    def __init__(self, manager, max_age=None):
+        self.manager = manager
+        self.max_age = DEFAULT_MAX_AGE if max_age is None else float(max_age)
+        self._snapshot = None
+        self._stale = False
+        self._version = 0
+        # clear() のたびに 1 つ進める。取りに行っている間に進んだら、取ってきた分は古い
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stale_lock = threading.Lock()
+
+    @property
+    def current(self):
+        """今持っているスナップショット（まだ無ければ None）。取りには行かない"""
+        return self._snapshot
+
+    def _fresh_enough(self, snapshot, max_age):
+        if snapshot is None or self._stale:
+            return False
+        return max_age <= 0 or snapshot.age <= max_age
+
+    def get(self, max_age=None, force=False):
+        """
+        スナップショットを返す
+
+        force=True なら必ず取り直す。max_age を渡すとその秒数より古ければ取り直す
+        （省略時はサービスの max_age）。
+        """
+        max_age = self.max_age if max_age is None else float(max_age)
+        snapshot = self._snapshot
+        if not force and self._fresh_enough(snapshot, max_age):
+            return snapshot
+
+        with self._lock:
+            # 待っている間に他のセッションが取り直していればそれを使う
+            if self._snapshot is not snapshot and self._fresh_enough(self._snapshot, max_age):
+                return self._snapshot
+            generation = self._generation
+            block, markets = self.manager.get_market_snapshot()
+            self._version += 1
+            self._snapshot = MarketSnapshot(markets, block, self._version)
+            with self._stale_lock:
+                # 取りに行っている間に clear() されていたら古い印を残す（次の get() で取り直す）
+                if self._generation == generation:
+                    self._stale = False
+            return self._snapshot
+
+    def refresh(self):
+        """今すぐ取り直す"""
+        return self.get(force=True)
+
+    def clear(self):
+        """次の get() で取り直すように古い印を付ける（TxTracker.watch_cache 用）"""
+        with self._stale_lock:
+            self._generation += 1
+            self._stale = True
@@ -0,0 +1,53 @@
+import itertools
+
+import pandas as pd
+import streamlit as st
+
+from utils.rpc_metrics import DEFAULT_CALL_BUDGET, begin_run, shared_metrics
+
+
+# セッションごとの再実行番号を入れておくキー
+SESSION_KEY = "_metrics_session"
+
+_session_ids = itertools.count(1)
+
+
+def track_page(page):
+    """
+    このページの再実行で発生する RPC を page の分として数え始める
+
+    各ページのスクリプトの先頭で 1 回呼ぶ。
+    """
+    session = st.session_state.setdefault(SESSION_KEY, {"id": next(_session_ids), "reruns": 0})
+    session["reruns"] += 1
+    begin_run(page, f"s{session['id']}-r{session['reruns']}-{page}")
+
+
+def render_metrics_panel():
+    """サイドバーに RPC メトリクス（ページごとの呼び出し予算と関数別の内訳）を表示する"""
+    metrics = shared_metrics()
+    with st.sidebar.expander("📈 RPC メトリクス", expanded=False):
+        budget = st.number_input("1 再実行あたりの往復回数の目安", min_value=1,
+                                 value=DEFAULT_CALL_BUDGET, key="_metrics_budget")
+        pages = metrics.page_budget(budget)
+        if pages:
+            st.caption("ページごとの 1 再実行あたりの RPC")
+            st.dataframe(pd.DataFrame(pages), hide_index=True)
+        else:
+            st.caption("まだ RPC の記録がありません。")
+
+        functions = metrics.rows("contract")
+        if functions:
+            st.caption("コントラクト関数別（時間の合計順）")
+            st.dataframe(pd.DataFrame(functions).drop(columns=["kind"]).head(20), hide_index=True)
+
+        methods = metrics.rows("rpc")
+        if methods:
+            st.caption("RPC メソッド別")
+            st.dataframe(pd.DataFrame(methods).drop(columns=["kind"]).head(20), hide_index=True)
+
+        st.download_button("Prometheus 形式でダウンロード", metrics.to_prometheus(),
+                           file_name="oracle_rpc_metrics.prom", mime="text/plain")
+        if st.button("リセット", key="_metrics_reset"):
+            metrics.reset()
+            st.rerun()
@@ -0,0 +1,87 @@
+import threading
+
+
+# ノードが返す「nonce がおかしい」系のエラーメッセージ
+NONCE_ERROR_WORDS = ("nonce too low", "nonce too high", "replacement transaction underpriced",
+                     "already known", "invalid nonce")
+
+
+def is_nonce_error(exc):
+    """送信エラーが nonce の食い違いによるものかどうか"""
+    message = str(exc).lower()
+    return any(word in message for word in NONCE_ERROR_WORDS)
+
+
+class NonceManager:
+    """
+    共有署名アカウント用の nonce 払い出し係（スレッドセーフ）
+
+    全セッションが同じ PRIVATE_KEY で書き込むので、毎回ノードに
+    get_transaction_count を聞くと同時投票で同じ nonce が出てしまう。
+    最初に pending の件数を 1 回だけ聞き、あとは手元で連番を払い出す。
+    払い出した nonce は送信し終えたら（成功でも失敗でも）release() で予約を外す。
+    送信に失敗したら resync() で pending の件数から数え直す（欠番も埋まる）。
+    """
+
+    def __init__(self, fetch_pending_count):
+        self._fetch = fetch_pending_count
+        self._lock = threading.Lock()
+        self._next = None
+        # 払い出したがまだ送り終えていない nonce
+        self._outstanding = set()
+        # 数え直しが必要だが、予約が残っていて待っている
+        self._stale = False
+
+    def _take(self, count):
+        with self._lock:
+            if self._next is None or (self._stale and not self._outstanding):
+                self._next = int(self._fetch())
+                self._stale = False
+            start = self._next
+            self._next += count
+            self._outstanding.update(range(start, start + count))
+            return start
+
+    def allocate(self):
+        """次に使う nonce を 1 つ払い出す"""
+        return self._take(1)
+
+    def allocate_many(self, count):
+        """連続した nonce を count 個まとめて払い出す（一括送信用）"""
+        start = self._take(count)
+        return list(range(start, start + count))
+
+    def release(self, *nonces):
+        """送信し終えた（成功でも失敗でも）nonce の予約を外す"""
+        with self._lock:
+            self._outstanding.difference_update(nonces)
+
+    def resync(self):
+        """
+        ノードの pending 件数から数え直す（送信失敗や欠番のあとに呼ぶ）
+
+        まだ送っていない予約が残っているうちに数え直すと、その nonce をノードは
+        知らないのでもう一度払い出してしまう。予約が無ければすぐ数え直し、
+        残っていれば印だけ付けて、予約がすべて外れたあとの払い出しで数え直す。
+        """
+        with self._lock:
+            self._stale = True
+            if not self._outstanding:
+                self._next = int(self._fetch())
+                self._stale = False
+            return self._next
+
+
+# アカウントごとにプロセスで 1 つだけ持つ
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def shared_nonce_manager(w3, address):
+    """アドレスごとのプロセス共通 NonceManager を返す"""
+    with _managers_lock:
+        if address not in _managers:
+            _managers[address] = NonceManager(
+                lambda: w3.eth.get_transaction_count(address, "pending")
+            )
+        return _managers[address]
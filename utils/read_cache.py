@@ -0,0 +1,120 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# キャッシュの最大件数（0 にするとキャッシュを無効化）
+DEFAULT_CACHE_SIZE = int(os.getenv("WEB3_CACHE_SIZE", "1024"))
+
+# 1 件あたりの有効期限（秒）。0 ならブロックが進むまで無期限
+DEFAULT_CACHE_TTL = float(os.getenv("WEB3_CACHE_TTL", "0"))
+
+# 最新ブロック番号を問い合わせる間隔（秒）。この間は RPC に一切行かない
+DEFAULT_BLOCK_POLL_SEC = float(os.getenv("WEB3_BLOCK_POLL_SEC", "2"))
+
+
+def _freeze(value):
+    """リストや辞書をキャッシュのキーに使えるようにタプルへ変換する"""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        return tuple(_freeze(v) for v in items)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class BlockCache:
+    """
+    (関数名, 引数, 最新ブロック番号) をキーにした読み出しキャッシュ
+
+    - ブロック番号が進むまでは同じ結果を返す（ブロックが進むと自然に無効になる）
+    - 最新ブロック番号自体も block_poll_sec 秒だけ覚えておく
+    - max_size を超えたら古いものから捨てる（LRU）
+    - ttl > 0 なら、ブロックが進んでいなくても ttl 秒で捨てる
+
+    Web3Manager は st.cache_resource で共有されるので、このキャッシュも
+    全セッションで共有される。返した値は書き換えずに使うこと。
+    """
+
+    def __init__(self, max_size=None, ttl=None, block_poll_sec=None):
+        self.max_size = DEFAULT_CACHE_SIZE if max_size is None else int(max_size)
+        self.ttl = DEFAULT_CACHE_TTL if ttl is None else float(ttl)
+        self.block_poll_sec = DEFAULT_BLOCK_POLL_SEC if block_poll_sec is None else float(block_poll_sec)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._block = None
+        self._block_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def block_number(self, fetch):
+        """最新ブロック番号を返す。block_poll_sec 以内なら覚えている値を使う"""
+        with self._lock:
+            now = time.monotonic()
+            if self._block is None or now - self._block_checked_at >= self.block_poll_sec:
+                block = int(fetch())
+                if self._block is not None and block != self._block:
+                    # ブロックが進んだら古いブロックのエントリはもう使わない
+                    self._entries.clear()
+                self._block = block
+                self._block_checked_at = now
+            return self._block
+
+    def get_or_load(self, name, args, kwargs, block, loader):
+        key = (name, _freeze(args), _freeze(kwargs), block)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl <= 0 or now - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        value = loader()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """全エントリと覚えているブロック番号を捨てる（自分で書き込んだ後など）"""
+        with self._lock:
+            self._entries.clear()
+            self._block = None
+
+
+def cached_read(method):
+    """
+    Web3Manager の読み出しメソッドにつけるデコレータ
+
+    self.cache が有効なら (メソッド名, 引数, 最新ブロック) で結果を使い回す。
+    メソッドが block_identifier を受け取る場合、呼び出し側が省略（か "latest"）していれば
+    キーにしたブロック番号を渡すので、キャッシュした値は必ずそのブロック時点のものになる。
+    """
+    takes_block = "block_identifier" in inspect.signature(method).parameters
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = getattr(self, "cache", None)
+        if cache is None or not cache.enabled:
+            return method(self, *args, **kwargs)
+        block = self._latest_block()
+        key_kwargs = call_kwargs = kwargs
+        if takes_block and kwargs.get("block_identifier", "latest") in ("latest", block):
+            # 省略・"latest"・今のブロック番号の指定は同じエントリにする
+            key_kwargs = {k: v for k, v in kwargs.items() if k != "block_identifier"}
+            call_kwargs = dict(kwargs, block_identifier=block)
+        return cache.get_or_load(
+            method.__name__, args, key_kwargs, block,
+            lambda: method(self, *args, **call_kwargs),
+        )
+    return wrapper
@@ -0,0 +1,161 @@
+import os
+import threading
+
+
+# プロセスで 1 つだけ持つ Web3Manager / SyncBridge / 市場スナップショット
+_lock = threading.Lock()
+_manager = None
+_bridge = None
+_snapshots = None
+_watcher = None
+_leaderboard = None
+_accuracy = None
+
+
+def use_simulator():
+    """ORACLE_BACKEND=sim のときはチェーンの代わりにメモリ上のシミュレータを使う"""
+    return os.getenv("ORACLE_BACKEND", "").lower() == "sim"
+
+
+def get_web3_manager():
+    """
+    プロセス共通の Web3Manager を返す（初めて呼ばれたときに作る）
+
+    全ページ・全セッションで同じインスタンスを使うので、ABI の読み込みや
+    コントラクトの準備はプロセスで 1 回だけ。作るときにネットワークには触らない。
+    作れなかった場合は例外をそのまま投げる（次の呼び出しでもう一度試す）。
+    ORACLE_BACKEND=sim なら SimulatedWeb3Manager を返す。
+    """
+    global _manager
+    with _lock:
+        if _manager is None:
+            if use_simulator():
+                from utils.sim_backend import SimulatedWeb3Manager
+
+                _manager = SimulatedWeb3Manager.from_env()
+            else:
+                from utils.web3_manager import Web3Manager
+
+                _manager = Web3Manager()
+        return _manager
+
+
+def get_web3_manager_safe():
+    """get_web3_manager() の例外を握りつぶして (manager, error) を返す版"""
+    try:
+        return get_web3_manager(), None
+    except Exception as e:
+        return None, str(e)
+
+
+def reset_web3_manager():
+    """共有している Web3Manager を捨てる（次の get_web3_manager() で作り直す）"""
+    global _manager, _snapshots, _watcher, _leaderboard, _accuracy
+    if use_simulator():
+        # シミュレータはチェーンの状態そのものを持っているので捨てない
+        return
+    with _lock:
+        _manager = None
+        _snapshots = None
+        _leaderboard = None
+        _accuracy = None
+        if _watcher is not None:
+            _watcher.stop()
+            _watcher = None
+
+
+def get_market_snapshots():
+    """
+    プロセス共通の MarketSnapshotService を返す（全ページが市場一覧をここから読む）
+
+    トランザクションが採掘されたら TxTracker が古い印を付けるので、
+    次に読んだときに取り直される。
+    """
+    global _snapshots
+    manager = get_web3_manager()
+    with _lock:
+        if _snapshots is None or _snapshots.manager is not manager:
+            from utils.market_snapshot import MarketSnapshotService
+
+            _snapshots = MarketSnapshotService(manager)
+            tracker = getattr(manager, "tx_tracker", None)
+            if tracker is not None:
+                tracker.watch_cache(_snapshots)
+        return _snapshots
+
+
+def get_async_bridge():
+    """
+    プロセス共通の SyncBridge(AsyncWeb3Manager) を返す。作れなければ None
+
+    シミュレータはもともとネットワーク待ちがないので None を返し、
+    各ページは同期版（get_web3_manager()）で読む。
+    """
+    global _bridge
+    if use_simulator():
+        return None
+    # 読み出しの接続・キャッシュ・バッチは共有の Web3Manager のものを使う
+    manager, _ = get_web3_manager_safe()
+    if manager is None:
+        return None
+    with _lock:
+        if _bridge is None or _bridge.manager.manager is not manager:
+            from utils.async_web3_manager import AsyncWeb3Manager, SyncBridge
+
+            _bridge = SyncBridge(AsyncWeb3Manager(manager))
+        return _bridge
+
+
+def get_block_watcher():
+    """
+    プロセス共通の BlockWatcher を返す（初めて呼ばれたときに見張りを始める）
+
+    新しいブロックごとに市場スナップショットと残高を 1 回だけ読み直し、
+    各セッションはその結果を読むだけにする。
+    """
+    global _watcher
+    snapshots = get_market_snapshots()
+    with _lock:
+        if _watcher is None or _watcher.snapshots is not snapshots:
+            from utils.block_watcher import BlockWatcher
+
+            if _watcher is not None:
+                _watcher.stop()
+            _watcher = BlockWatcher(snapshots.manager, snapshots).start()
+        return _watcher
+
+
+def get_leaderboard():
+    """
+    プロセス共通の Leaderboard を返す（まだイベントは読まない）
+
+    読む側が sync() を呼ぶと、前回の続きのブロックからのイベントだけを取り込む。
+    """
+    global _leaderboard
+    manager = get_web3_manager()
+    with _lock:
+        if _leaderboard is None or _leaderboard.manager is not manager:
+            from utils.leaderboard import Leaderboard
+
+            _leaderboard = Leaderboard(manager)
+        return _leaderboard
+
+
+def get_accuracy_service():
+    """
+    プロセス共通の AccuracyService を返す（アドレスごとの戦績をキャッシュする）
+
+    トランザクションが採掘されたら TxTracker が印を付けるので、
+    次に読んだときにそのアドレスのベットを読み直す。
+    """
+    global _accuracy
+    manager = get_web3_manager()
+    with _lock:
+        if _accuracy is None or _accuracy.manager is not manager:
+            from utils.accuracy import AccuracyService
+
+            _accuracy = AccuracyService(manager)
+            tracker = getattr(manager, "tx_tracker", None)
+            if tracker is not None:
+                tracker.watch_cache(_accuracy)
+        return _accuracy
@@ -0,0 +1,434 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_utils import function_signature_to_4byte_selector
+from web3.middleware import Web3Middleware
+
+from utils.contracts import load_abi
+
+
+# レイテンシのヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 再実行ごとの集計を覚えておく件数
+KEEP_RUNS = int(os.getenv("RPC_METRICS_KEEP_RUNS", "500"))
+
+# 1 回の再実行で使ってよい RPC 往復回数の目安（管理画面で超えたページを目立たせる）
+DEFAULT_CALL_BUDGET = int(os.getenv("RPC_CALL_BUDGET", "20"))
+
+# Prometheus テキストを書き出すファイルと間隔（node_exporter の textfile collector 用）
+METRICS_FILE = os.getenv("RPC_METRICS_FILE", "")
+METRICS_FILE_SEC = float(os.getenv("RPC_METRICS_FILE_SEC", "15"))
+
+# これを設定すると http://<host>:<port>/metrics で Prometheus がスクレイプできる
+METRICS_PORT = int(os.getenv("RPC_METRICS_PORT", "0"))
+# 待ち受けるアドレス。既定はこのマシンからだけ。外から取らせるなら 0.0.0.0 にする
+METRICS_HOST = os.getenv("RPC_METRICS_HOST", "127.0.0.1")
+
+# RPC を呼んだページと再実行 ID（スクリプトスレッドから非同期ループにも引き継がれる）
+_current_run = contextvars.ContextVar("rpc_metrics_run", default=None)
+
+BACKGROUND = "(background)"
+
+
+def begin_run(page, run_id=None):
+    """これ以降の RPC をページ page の再実行 run_id の分として数える"""
+    _current_run.set((page, run_id))
+    if run_id is not None:
+        shared_metrics().start_run(page, run_id)
+
+
+def current_run():
+    return _current_run.get() or (BACKGROUND, None)
+
+
+class _Series:
+    """1 つのラベルの組み合わせ（種類・名前・ページ）ぶんの集計"""
+
+    __slots__ = ("count", "errors", "seconds", "request_bytes", "response_bytes", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+class RPCMetrics:
+    """
+    RPC の呼び出し回数・レイテンシ・エラー・バイト数の集計（スレッドセーフ）
+
+    kind="rpc" は eth_call などの生の JSON-RPC メソッド、
+    kind="contract" は eth_call の中身を ABI で引いたコントラクト関数。
+    どちらもそのとき動いていたページ（begin_run で設定）ごとに分ける。
+    JSON-RPC バッチは往復 1 回として数え、時間は中の呼び出しで等分する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._runs = OrderedDict()
+        self.started_at = time.time()
+
+    def start_run(self, page, run_id):
+        with self._lock:
+            self._runs[run_id] = {
+                "page": page,
+                "run_id": run_id,
+                "started_at": time.time(),
+                "round_trips": 0,
+                "calls": 0,
+                "errors": 0,
+                "seconds": 0.0,
+                "bytes": 0,
+            }
+            while len(self._runs) > KEEP_RUNS:
+                self._runs.popitem(last=False)
+
+    def record(self, kind, name, seconds, error=False, request_bytes=0, response_bytes=0):
+        page, _ = current_run()
+        with self._lock:
+            series = self._series.get((kind, name, page))
+            if series is None:
+                series = self._series[(kind, name, page)] = _Series()
+            series.count += 1
+            series.errors += bool(error)
+            series.seconds += seconds
+            series.request_bytes += request_bytes
+            series.response_bytes += response_bytes
+            series.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def record_round_trip(self, calls, seconds, errors, nbytes):
+        """再実行ごとの集計に往復 1 回ぶんを足す"""
+        _, run_id = current_run()
+        if run_id is None:
+            return
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            run["round_trips"] += 1
+            run["calls"] += calls
+            run["errors"] += errors
+            run["seconds"] += seconds
+            run["bytes"] += nbytes
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._runs.clear()
+            self.started_at = time.time()
+
+    def rows(self, kind=None):
+        """ラベルごとの集計を dict のリストで返す（表示用）"""
+        with self._lock:
+            items = list(self._series.items())
+        rows = []
+        for (k, name, page), s in items:
+            if kind is not None and k != kind:
+                continue
+            rows.append({
+                "kind": k,
+                "name": name,
+                "page": page,
+                "count": s.count,
+                "errors": s.errors,
+                "avg_ms": round(s.seconds / s.count * 1000, 2) if s.count else 0.0,
+                "total_sec": round(s.seconds, 3),
+                "request_bytes": s.request_bytes,
+                "response_bytes": s.response_bytes,
+            })
+        rows.sort(key=lambda r: r["total_sec"], reverse=True)
+        return rows
+
+    def runs(self):
+        with self._lock:
+            return [dict(run) for run in self._runs.values()]
+
+    def page_budget(self, budget=None):
+        """ページごとの 1 再実行あたりの RPC 使用量（平均・最大）と目安超えの回数"""
+        budget = DEFAULT_CALL_BUDGET if budget is None else budget
+        pages = {}
+        for run in self.runs():
+            p = pages.setdefault(run["page"], {
+                "page": run["page"], "reruns": 0, "round_trips": 0, "max_round_trips": 0,
+                "calls": 0, "seconds": 0.0, "max_sec": 0.0, "errors": 0, "over_budget": 0,
+            })
+            p["reruns"] += 1
+            p["round_trips"] += run["round_trips"]
+            p["max_round_trips"] = max(p["max_round_trips"], run["round_trips"])
+            p["calls"] += run["calls"]
+            p["seconds"] += run["seconds"]
+            p["max_sec"] = max(p["max_sec"], run["seconds"])
+            p["errors"] += run["errors"]
+            p["over_budget"] += run["round_trips"] > budget
+        rows = []
+        for p in pages.values():
+            n = p.pop("reruns")
+            rows.append({
+                "page": p["page"],
+                "reruns": n,
+                "avg_round_trips": round(p["round_trips"] / n, 1),
+                "max_round_trips": p["max_round_trips"],
+                "avg_calls": round(p["calls"] / n, 1),
+                "avg_rpc_sec": round(p["seconds"] / n, 3),
+                "max_rpc_sec": round(p["max_sec"], 3),
+                "errors": p["errors"],
+                "over_budget": p["over_budget"],
+            })
+        rows.sort(key=lambda r: r["avg_rpc_sec"], reverse=True)
+        return rows
+
+    def to_prometheus(self):
+        """Prometheus のテキスト形式（exposition format）にする"""
+        with self._lock:
+            items = sorted(self._series.items())
+            series = [(labels, s.count, s.errors, s.seconds, s.request_bytes, s.response_bytes, list(s.buckets))
+                      for labels, s in items]
+
+        def fmt(kind, name, page):
+            return f'kind="{kind}",name="{_escape(name)}",page="{_escape(page)}"'
+
+        lines = [
+            "# HELP oracle_rpc_requests_total RPC calls by method / contract function and page.",
+            "# TYPE oracle_rpc_requests_total counter",
+        ]
+        lines += [f"oracle_rpc_requests_total{{{fmt(*labels)}}} {count}" for labels, count, *_ in series]
+        lines += [
+            "# HELP oracle_rpc_errors_total RPC calls that raised or returned an error.",
+            "# TYPE oracle_rpc_errors_total counter",
+        ]
+        lines += [f"oracle_rpc_errors_total{{{fmt(*labels)}}} {errors}" for labels, _, errors, *_ in series]
+        lines += [
+            "# HELP oracle_rpc_request_bytes_total JSON-RPC request payload bytes.",
+            "# TYPE oracle_rpc_request_bytes_total counter",
+        ]
+        lines += [f"oracle_rpc_request_bytes_total{{{fmt(*s[0])}}} {s[4]}" for s in series]
+        lines += [
+            "# HELP oracle_rpc_response_bytes_total JSON-RPC response payload bytes.",
+            "# TYPE oracle_rpc_response_bytes_total counter",
+        ]
+        lines += [f"oracle_rpc_response_bytes_total{{{fmt(*s[0])}}} {s[5]}" for s in series]
+        lines += [
+            "# HELP oracle_rpc_latency_seconds RPC latency (batched calls share the round trip).",
+            "# TYPE oracle_rpc_latency_seconds histogram",
+        ]
+        for labels, count, _, seconds, _, _, buckets in series:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'oracle_rpc_latency_seconds_bucket{{{fmt(*labels)},le="{le}"}} {cumulative}')
+            lines.append(f"oracle_rpc_latency_seconds_sum{{{fmt(*labels)}}} {seconds}")
+            lines.append(f"oracle_rpc_latency_seconds_count{{{fmt(*labels)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Prometheus テキストをファイルに書き出す（途中の状態が読まれないように置き換える）"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# --- eth_call の中身からコントラクト関数名を引く ---
+
+
+_selectors = None
+
+
+def _selector_table():
+    global _selectors
+    if _selectors is None:
+        table = {}
+        for prefix, filename in (("", "abi.json"), ("SBT.", "sbt_abi.json")):
+            for entry in load_abi(filename) or []:
+                if entry.get("type") == "function":
+                    types = ",".join(i["type"] for i in entry["inputs"])
+                    selector = function_signature_to_4byte_selector(f"{entry['name']}({types})")
+                    table["0x" + selector.hex()] = prefix + entry["name"]
+        _selectors = table
+    return _selectors
+
+
+def contract_function(method, params):
+    """eth_call なら呼んでいるコントラクト関数の名前を返す（それ以外は None）"""
+    if method != "eth_call" or not params:
+        return None
+    data = params[0].get("data") or params[0].get("input") or ""
+    if not isinstance(data, str):
+        data = "0x" + bytes(data).hex()
+    return _selector_table().get(data[:10].lower(), "unknown")
+
+
+def _size(value):
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _is_error(response):
+    return isinstance(response, dict) and response.get("error") is not None
+
+
+class RPCMetricsMiddleware(Web3Middleware):
+    """
+    すべての RPC を計測する web3 ミドルウェア（一番内側＝プロバイダの直前に入れる）
+
+    同期・非同期の両方の Web3 で使える。バイト数は JSON にしたときの長さで数える。
+    """
+
+    def _record(self, requests_, responses, seconds, raised):
+        metrics = shared_metrics()
+        share = seconds / max(1, len(requests_))
+        if not isinstance(responses, list):
+            responses = [responses] * len(requests_)
+        errors = 0
+        total_bytes = 0
+        for (method, params), response in zip(requests_, responses):
+            error = raised or _is_error(response)
+            errors += error
+            request_bytes = _size({"method": method, "params": params})
+            response_bytes = 0 if raised else _size(response)
+            total_bytes += request_bytes + response_bytes
+            metrics.record("rpc", method, share, error, request_bytes, response_bytes)
+            function = contract_function(method, params)
+            if function is not None:
+                metrics.record("contract", function, share, error, request_bytes, response_bytes)
+        metrics.record_round_trip(len(requests_), seconds, errors, total_bytes)
+
+    def _measure(self, requests_, send):
+        started = time.perf_counter()
+        try:
+            response = send()
+        except Exception:
+            self._record(requests_, None, time.perf_counter() - started, True)
+            raise
+        self._record(requests_, response, time.perf_counter() - started, False)
+        return response
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            return self._measure([(method, params)], lambda: make_request(method, params))
+
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            return self._measure(list(requests_info), lambda: make_batch_request(requests_info))
+
+        return middleware
+
+    async def async_wrap_make_request(self, make_request):
+        async def middleware(method, params):
+            started = time.perf_counter()
+            try:
+                response = await make_request(method, params)
+            except Exception:
+                self._record([(method, params)], None, time.perf_counter() - started, True)
+                raise
+            self._record([(method, params)], response, time.perf_counter() - started, False)
+            return response
+
+        return middleware
+
+    async def async_wrap_make_batch_request(self, make_batch_request):
+        async def middleware(requests_info):
+            requests_ = list(requests_info)
+            started = time.perf_counter()
+            try:
+                response = await make_batch_request(requests_info)
+            except Exception:
+                self._record(requests_, None, time.perf_counter() - started, True)
+                raise
+            self._record(requests_, response, time.perf_counter() - started, False)
+            return response
+
+        return middleware
+
+
+def instrument(w3):
+    """Web3 / AsyncWeb3 に計測ミドルウェアを入れる（2 回目以降は何もしない）"""
+    if "rpc_metrics" not in w3.middleware_onion:
+        w3.middleware_onion.inject(RPCMetricsMiddleware, name="rpc_metrics", layer=0)
+    _start_exporters()
+    return w3
+
+
+# --- プロセス共通のインスタンスと書き出し ---
+
+
+_shared = None
+_shared_lock = threading.Lock()
+_exporters_started = False
+
+
+def shared_metrics():
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RPCMetrics()
+        return _shared
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = shared_metrics().to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _dump_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            shared_metrics().dump(path)
+        except OSError as e:
+            print(f"Metrics Dump Error: {e}")
+
+
+def _start_exporters():
+    """RPC_METRICS_FILE / RPC_METRICS_PORT（と RPC_METRICS_HOST）が設定されていれば書き出し用のスレッドを立てる"""
+    global _exporters_started
+    with _shared_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if METRICS_FILE:
+        threading.Thread(target=_dump_loop, args=(METRICS_FILE, METRICS_FILE_SEC),
+                         name="rpc-metrics-dump", daemon=True).start()
+    if METRICS_PORT:
+        serve_metrics(METRICS_HOST, METRICS_PORT)
+
+
+def serve_metrics(host, port):
+    """host:port で /metrics を返す HTTP サーバーを立てる（立てられなければ None）"""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics Server Error: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="rpc-metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,235 @@
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3.providers.base import JSONBaseProvider
+
+
+# 1 リクエストあたりのタイムアウト（秒）
+DEFAULT_TIMEOUT = float(os.getenv("WEB3_RPC_TIMEOUT", "10"))
+
+# 読み出しの再試行回数（エンドポイントをまたいだ合計）
+DEFAULT_RETRIES = int(os.getenv("WEB3_RPC_RETRIES", "3"))
+
+# 再試行までの待ち時間の基準（秒）。実際は 2 倍ずつ増やし、ランダムにずらす
+DEFAULT_BACKOFF = float(os.getenv("WEB3_RPC_BACKOFF", "0.25"))
+
+# 失敗したエンドポイントを休ませる時間（秒）
+DEFAULT_COOLDOWN = float(os.getenv("WEB3_RPC_COOLDOWN", "30"))
+
+# keep-alive で使い回す HTTP 接続の数
+DEFAULT_POOL_SIZE = int(os.getenv("WEB3_RPC_POOL_SIZE", "20"))
+
+# 書き込み（と nonce の問い合わせ）は 1 つのエンドポイントに固定する
+PINNED_METHODS = {
+    "eth_sendRawTransaction",
+    "eth_sendTransaction",
+    "eth_getTransactionCount",
+}
+
+# レスポンスが返ってきても「ノード側の一時的な不調」とみなす HTTP ステータス
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 指定したブロックをまだ（もう）持っていないノードが返すエラー。別のエンドポイントで読み直す
+BEHIND_ERRORS = ("header not found", "unknown block", "block not found", "missing trie node")
+
+# RPC URL が何も設定されていないときの接続先（web3 の HTTPProvider の既定と同じ）
+DEFAULT_RPC_URL = os.getenv("WEB3_HTTP_PROVIDER_URI", "http://localhost:8545")
+
+
+def rpc_urls_from_env():
+    """
+    WEB3_RPC_URLS（カンマ区切り）か WEB3_RPC_URL から RPC URL のリストを作る
+
+    どちらも無ければ以前の Web3.HTTPProvider と同じく DEFAULT_RPC_URL につなぐ
+    （つながらなければ、作るときではなく最初の RPC で接続エラーになる）。
+    """
+    raw = os.getenv("WEB3_RPC_URLS") or os.getenv("WEB3_RPC_URL") or ""
+    return [u.strip() for u in raw.split(",") if u.strip()] or [DEFAULT_RPC_URL]
+
+
+class _Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.latency = None       # 応答時間の移動平均（秒）
+        self.down_until = 0.0     # この時刻までは不調として後回しにする
+        self.failures = 0
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def record_success(self, elapsed):
+        self.latency = elapsed if self.latency is None else self.latency * 0.8 + elapsed * 0.2
+        self.failures = 0
+        self.down_until = 0.0
+
+    def record_failure(self, cooldown):
+        self.failures += 1
+        # 続けて失敗するほど長めに休ませる
+        self.down_until = time.monotonic() + cooldown * min(self.failures, 4)
+
+
+class FailoverHTTPProvider(JSONBaseProvider):
+    """
+    複数の RPC エンドポイントを束ねる HTTP プロバイダ
+
+    - requests.Session の接続プールで keep-alive する
+    - 1 リクエストごとにタイムアウトを付ける
+    - 読み出しは応答の速い健康なエンドポイントに送り、失敗したら
+      ジッター付きで待って次のエンドポイントに再試行する
+    - ブロック番号を指定した読み出しで、遅れているノードが「そのブロックは無い」
+      （BEHIND_ERRORS）と返したら、待たずに次のエンドポイントで読み直す
+    - 書き込みと nonce の問い合わせ（PINNED_METHODS）は、並び順で最初の健康な
+      エンドポイントに固定する。送信済みかどうか分からないので同じリクエストは
+      再試行しないが、失敗は記録するので、不調のあいだ次の書き込みは次のエンドポイントに行く
+    """
+
+    def __init__(self, endpoint_uris, timeout=None, retries=None, backoff=None,
+                 cooldown=None, pool_size=None, **kwargs):
+        super().__init__(**kwargs)
+        if isinstance(endpoint_uris, str):
+            endpoint_uris = [endpoint_uris]
+        if not endpoint_uris:
+            raise ValueError("RPC URL が設定されていません（WEB3_RPC_URLS / WEB3_RPC_URL）")
+        self.endpoints = [_Endpoint(url) for url in endpoint_uris]
+        self.timeout = DEFAULT_TIMEOUT if timeout is None else float(timeout)
+        self.retries = DEFAULT_RETRIES if retries is None else int(retries)
+        self.backoff = DEFAULT_BACKOFF if backoff is None else float(backoff)
+        self.cooldown = DEFAULT_COOLDOWN if cooldown is None else float(cooldown)
+        self._lock = threading.Lock()
+
+        pool_size = DEFAULT_POOL_SIZE if pool_size is None else int(pool_size)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def __str__(self):
+        return f"FailoverHTTPProvider({', '.join(e.url for e in self.endpoints)})"
+
+    @property
+    def endpoint_uri(self):
+        """書き込み先（固定エンドポイント）の URL"""
+        return self._pinned_endpoint().url
+
+    def _pinned_endpoint(self):
+        """書き込み先: 並び順で最初の健康なもの（全部不調なら先頭）"""
+        with self._lock:
+            return next((e for e in self.endpoints if e.healthy), self.endpoints[0])
+
+    def _read_order(self):
+        """健康なものを応答の速い順に（未計測のものは計測のため先頭に）、不調なものはその後ろに並べる"""
+        with self._lock:
+            healthy = [e for e in self.endpoints if e.healthy]
+            down = [e for e in self.endpoints if not e.healthy]
+        healthy.sort(key=lambda e: 0.0 if e.latency is None else e.latency)
+        down.sort(key=lambda e: e.down_until)
+        return healthy + down
+
+    def _post(self, endpoint, body):
+        started = time.monotonic()
+        response = self.session.post(endpoint.url, data=body, timeout=self.timeout)
+        if response.status_code in RETRY_STATUS:
+            raise requests.HTTPError(f"{response.status_code} from {endpoint.url}", response=response)
+        response.raise_for_status()
+        with self._lock:
+            endpoint.record_success(time.monotonic() - started)
+        return response.content
+
+    @staticmethod
+    def _behind(raw):
+        """指定したブロックをまだ持っていないノードの応答か（バッチならどれか 1 つでも）"""
+        if b'"error"' not in raw:
+            return False
+        try:
+            decoded = json.loads(raw)
+        except ValueError:
+            return False
+        for item in decoded if isinstance(decoded, list) else [decoded]:
+            error = item.get("error") if isinstance(item, dict) else None
+            message = str(error.get("message", "")).lower() if isinstance(error, dict) else ""
+            if any(text in message for text in BEHIND_ERRORS):
+                return True
+        return False
+
+    def _send(self, body, pinned):
+        if pinned:
+            endpoint = self._pinned_endpoint()
+            try:
+                return self._post(endpoint, body)
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError):
+                with self._lock:
+                    endpoint.record_failure(self.cooldown)
+                raise
+
+        order = self._read_order()
+        last_error = None
+        behind = None
+        for attempt in range(max(1, self.retries)):
+            endpoint = order[attempt % len(order)]
+            try:
+                raw = self._post(endpoint, body)
+                if not self._behind(raw):
+                    return raw
+                # 遅れているだけなので休ませない。どこも持っていなければこの応答を返す
+                behind = raw
+                if attempt + 1 >= len(order):
+                    break
+                continue
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                last_error = e
+                with self._lock:
+                    endpoint.record_failure(self.cooldown)
+                if attempt + 1 < self.retries:
+                    # 同時に再試行が集中しないようにランダムにずらして待つ
+                    time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+        if behind is not None:
+            return behind
+        raise last_error
+
+    def make_request(self, method, params):
+        body = self.encode_rpc_request(method, params)
+        raw = self._send(body, pinned=method in PINNED_METHODS)
+        return self.decode_rpc_response(raw)
+
+    def make_batch_request(self, requests_):
+        body = self.encode_batch_rpc_request(requests_)
+        pinned = any(method in PINNED_METHODS for method, _ in requests_)
+        response = self.decode_rpc_response(self._send(body, pinned=pinned))
+        if isinstance(response, list):
+            # JSON-RPC の仕様上バッチの応答順は保証されないので id で並べ直す
+            response = sorted(response, key=lambda r: r.get("id", 0))
+        return response
+
+    def is_connected(self, show_traceback=False):
+        try:
+            response = self.make_request("web3_clientVersion", [])
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+        return "result" in response
+
+    def status(self):
+        """各エンドポイントの状態（管理画面やデバッグ用）"""
+        with self._lock:
+            return [
+                {
+                    "url": e.url,
+                    "healthy": e.healthy,
+                    "latency_ms": None if e.latency is None else round(e.latency * 1000, 1),
+                    "failures": e.failures,
+                }
+                for e in self.endpoints
+            ]
+
+
+def make_provider():
+    """環境変数の RPC URL リストから FailoverHTTPProvider を作る"""
+    return FailoverHTTPProvider(rpc_urls_from_env())
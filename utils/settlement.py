@@ -0,0 +1,122 @@
+import numpy as np
+
+
+# int64 で計算すると溢れる恐れがあるときは Python の int（object 配列）で計算する
+_INT64_LIMIT = 2 ** 63 - 1
+
+
+def _as_int(x):
+    """int64 の配列にする（int64 に入らない値が来たときは object 配列のまま）"""
+    x = np.asarray(x)
+    if x.dtype == object or x.dtype == np.uint64:
+        return x.astype(object)
+    return x.astype(np.int64, copy=False)
+
+
+def _max_abs(x):
+    return int(np.abs(x).max()) if x.size else 0
+
+
+def _add(a, b):
+    """a + b を配列ごとに（溢れそうなら任意精度で）計算する"""
+    a, b = _as_int(a), _as_int(b)
+    if a.dtype == object or b.dtype == object or _max_abs(a) + _max_abs(b) > _INT64_LIMIT:
+        return a.astype(object) + b.astype(object)
+    return a + b
+
+
+def _mul_div(a, b, c):
+    """a * b // c を配列ごとに（溢れそうなら任意精度で）計算する"""
+    a, b, c = np.broadcast_arrays(_as_int(a), _as_int(b), _as_int(c))
+    if object not in (a.dtype, b.dtype, c.dtype) and _max_abs(a) * _max_abs(b) <= _INT64_LIMIT:
+        return a * b // c
+    result = a.astype(object) * b.astype(object) // c.astype(object)
+    # 結果も int64 に入らなければ object 配列のまま返す
+    return result.astype(np.int64) if _max_abs(result) <= _INT64_LIMIT else result
+
+
+def rewards(amounts, is_yes, outcome, yes, no):
+    """
+    確定した市場でのベットごとの受け取り額（コントラクトの claimReward と同じ計算）
+
+    当たりは amount * (yes + no) // 勝った側のプール（切り捨て）、外れは 0。
+    引数はすべて配列でよく、ブロードキャストされる（ベットごとに別の市場でもよい）。
+    """
+    amounts = _as_int(amounts)
+    outcome = np.asarray(outcome, dtype=bool)
+    yes = _as_int(yes)
+    no = _as_int(no)
+    won = np.asarray(is_yes, dtype=bool) == outcome
+    # 勝った側のプールが 0 なら当たりの人はいない（0 除算を避けるだけ）
+    winning_pool = np.maximum(np.where(outcome, yes, no), 1)
+    # yes + no は両方のプールが大きいと int64 を超えるので _add で足す
+    return np.where(won, _mul_div(amounts, _add(yes, no), winning_pool), 0)
+
+
+def implied_odds(yes, no):
+    """
+    今のプールから見た Yes の確率と、Yes / No それぞれの配当倍率（配列でよい）
+
+    倍率は「当たったら 1 OCP あたりいくら戻るか」= プール合計 / その側のプール。
+    その側にまだ誰も賭けていなければ nan。
+    """
+    yes = np.asarray(yes, dtype=np.float64)
+    no = np.asarray(no, dtype=np.float64)
+    pool = yes + no
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "yes_prob": np.where(pool > 0, yes / pool, np.nan),
+            "yes_odds": np.where(yes > 0, pool / yes, np.nan),
+            "no_odds": np.where(no > 0, pool / no, np.nan),
+        }
+
+
+def quote(yes, no, is_yes, stake):
+    """
+    今 stake を賭けて当たった場合の受け取り額（自分の分もプールに入れて計算する）
+
+    このあと他の人が賭ければ変わるので、あくまで今の時点の見込み。
+    stake を配列にすると金額ごとの見込みをまとめて計算できる。
+    """
+    stake = _as_int(stake)
+    yes = _add(yes, np.where(is_yes, stake, 0))
+    no = _add(no, np.where(is_yes, 0, stake))
+    return rewards(stake, is_yes, is_yes, yes, no)
+
+
+def settle(amounts, is_yes, outcome, yes=None, no=None):
+    """
+    1 つの市場を outcome で確定したときの、参加者全員の精算をまとめて計算する
+
+    yes / no はコントラクトのプール合計（省略時は amounts から集計する）。
+    戻り値は {"reward", "pnl", "won"}（ベットごとの配列）と、
+    {"winners", "losers", "paid", "pool", "dust"}（dust は切り捨てで誰にも払われない分）
+    """
+    amounts = _as_int(amounts)
+    is_yes = np.asarray(is_yes, dtype=bool)
+    # プール合計は int64 を超えうるので Python の int で足す
+    if yes is None:
+        yes = int(amounts[is_yes].astype(object).sum())
+    if no is None:
+        no = int(amounts[~is_yes].astype(object).sum())
+    reward = rewards(amounts, is_yes, outcome, yes, no)
+    won = is_yes == bool(outcome)
+    paid = int(reward.astype(object).sum())
+    pool = int(yes) + int(no)
+    return {
+        "reward": reward,
+        "pnl": reward - amounts,
+        "won": won,
+        "winners": int(won.sum()),
+        "losers": int((~won).sum()),
+        "paid": paid,
+        "pool": pool,
+        # 勝った人がいなければプールは丸ごと残る
+        "dust": pool - paid,
+    }
+
+
+def format_odds(odds):
+    """配当倍率の表示（x1.85。まだ賭けがなければ「—」）"""
+    odds = float(odds)
+    return "—" if np.isnan(odds) else f"x{odds:.2f}"
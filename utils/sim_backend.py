@@ -0,0 +1,469 @@
+import hashlib
+import itertools
+import os
+import random
+import threading
+import time
+import weakref
+from types import SimpleNamespace
+
+from utils.tx_tracker import FAILED, MINED, TxHandle
+
+
+# 1 ブロックの長さ（秒）。0 にすると送信した瞬間に採掘される
+DEFAULT_BLOCK_TIME = float(os.getenv("SIM_BLOCK_TIME", "12"))
+
+# 読み出し 1 回あたりの疑似 RPC 遅延（ミリ秒）
+DEFAULT_RPC_LATENCY_MS = float(os.getenv("SIM_RPC_LATENCY_MS", "0"))
+
+# 起動時に自動で作るデータ量（0 なら空のチェーン）
+DEFAULT_SEED_MARKETS = int(os.getenv("SIM_MARKETS", "0"))
+DEFAULT_SEED_USERS = int(os.getenv("SIM_USERS", "0"))
+
+# faucet でもらえるポイント
+FAUCET_AMOUNT = 1000
+
+DEFAULT_ADDRESS = "0x5a5A5a5a5A5a5A5a5a5A5a5a5a5A5A5a5a5A5A5a"
+
+
+class Revert(Exception):
+    """コントラクトの require に引っかかったときの例外"""
+
+
+class SimChain:
+    """
+    PredictionMarket / SBT コントラクトをメモリ上で再現したもの
+
+    状態の形はコントラクトと同じ:
+    markets[id] = [id, title, endTime, totalYes, totalNo, resolved, outcome]
+    bets[(user, id)] = [amount, isYes, claimed]
+    配当は pari-mutuel（当たった側で全体のプールを賭け額に比例して分ける）。
+
+    送ったトランザクションは次のブロックで反映される。ブロックは
+    block_time 秒ごとに進み、状態を読むたびに追いつく（スレッドは使わない）。
+    """
+
+    def __init__(self, admin, block_time=None, rpc_latency_ms=None):
+        self.admin = admin.lower()
+        self.block_time = DEFAULT_BLOCK_TIME if block_time is None else float(block_time)
+        self.rpc_latency = (DEFAULT_RPC_LATENCY_MS if rpc_latency_ms is None else float(rpc_latency_ms)) / 1000
+        self.genesis = time.time()
+        self.markets = []
+        self.bets = {}
+        self.balances = {}
+        self.faucet_claimed = set()
+        self.sbt_balances = {}
+        self.sbt_counter = 0
+        self.logs = []
+        self._queue = []
+        self._handles = {}
+        # 送ったトランザクションの入力（関数名と引数）。get_transaction の代わり
+        self._inputs = {}
+        self._tx_counter = itertools.count()
+        self._current_tx = None
+        self._instant_blocks = 0
+        self._caches = weakref.WeakSet()
+        self._lock = threading.RLock()
+
+    # --- ブロックとトランザクション ---
+
+    @property
+    def block_number(self):
+        if self.block_time <= 0:
+            # 即時採掘モードでは 1 トランザクション = 1 ブロック
+            return self._instant_blocks
+        return int((time.time() - self.genesis) / self.block_time)
+
+    def rpc(self):
+        """読み出し 1 回ぶんの疑似遅延を入れる"""
+        if self.rpc_latency > 0:
+            time.sleep(self.rpc_latency)
+
+    def submit(self, sender, name, args, label=""):
+        """トランザクションを積んで TxHandle をすぐ返す（採掘は次のブロック）"""
+        with self._lock:
+            digest = hashlib.sha256(f"{next(self._tx_counter)}:{sender}:{name}:{args}".encode()).digest()
+            handle = TxHandle(digest, label)
+            self._handles[handle.tx_hash] = handle
+            self._inputs[handle.tx_hash] = (name, args)
+            self._queue.append((self.block_number, sender.lower(), name, args, handle))
+            if self.block_time <= 0:
+                self.advance(force=True)
+            return handle
+
+    def watch_cache(self, cache):
+        """トランザクションが採掘されたときに clear() するキャッシュを登録する（TxTracker と同じ）"""
+        self._caches.add(cache)
+
+    def advance(self, force=False):
+        """現在のブロックまでに採掘されるべきトランザクションを反映する"""
+        with self._lock:
+            if not self._queue:
+                return
+            current = self.block_number
+            remaining = []
+            for queued in self._queue:
+                submitted_block, sender, name, args, handle = queued
+                if not force and submitted_block >= current:
+                    remaining.append(queued)
+                    continue
+                self._current_tx = handle.tx_hash
+                if self.block_time <= 0:
+                    self._instant_blocks += 1
+                try:
+                    getattr(self, "_tx_" + name)(sender, *args)
+                    handle._finish(MINED, receipt={
+                        "transactionHash": handle.tx_hash,
+                        "blockNumber": max(current, submitted_block + 1),
+                        "status": 1,
+                    })
+                except Revert as e:
+                    handle._finish(FAILED, receipt={"transactionHash": handle.tx_hash, "status": 0}, error=str(e))
+            mined = len(self._queue) != len(remaining)
+            self._queue = remaining
+        if mined:
+            for cache in list(self._caches):
+                cache.clear()
+
+    def get_tx(self, tx_hash):
+        self.advance()
+        return self._handles.get(tx_hash)
+
+    def claim_market_id(self, tx_hash):
+        """RewardClaimed には marketId が無いので、トランザクションの入力から復元する（EventIndexer と同じ）"""
+        name, args = self._inputs.get(tx_hash, (None, ()))
+        return int(args[0]) if name == "claimReward" else None
+
+    def _log(self, event, **args):
+        self.logs.append({
+            "event": event,
+            "block_number": self.block_number,
+            "tx_hash": self._current_tx,
+            "log_index": len(self.logs),
+            "args": args,
+        })
+
+    # --- コントラクトの関数（require はコントラクトに合わせる） ---
+
+    def _tx_faucet(self, sender):
+        if sender in self.faucet_claimed:
+            raise Revert("Already claimed")
+        self.faucet_claimed.add(sender)
+        self.balances[sender] = self.balances.get(sender, 0) + FAUCET_AMOUNT
+
+    def _tx_createMarket(self, sender, title, duration_sec):
+        if sender != self.admin:
+            raise Revert("Only admin")
+        market_id = len(self.markets)
+        self.markets.append([market_id, title, int(time.time()) + int(duration_sec), 0, 0, False, False])
+        self._log("MarketCreated", marketId=market_id, title=title)
+
+    def _tx_vote(self, sender, market_id, is_yes, amount):
+        if not 0 <= market_id < len(self.markets):
+            raise Revert("Market does not exist")
+        m = self.markets[market_id]
+        if m[5]:
+            raise Revert("Market resolved")
+        if int(time.time()) >= m[2]:
+            raise Revert("Market closed")
+        if amount <= 0:
+            raise Revert("Amount must be > 0")
+        if self.balances.get(sender, 0) < amount:
+            raise Revert("Insufficient balance")
+        bet = self.bets.get((sender, market_id))
+        if bet and bet[0] > 0 and bet[1] != bool(is_yes):
+            raise Revert("Cannot bet on both sides")
+        self.balances[sender] -= amount
+        if bet:
+            bet[0] += amount
+        else:
+            self.bets[(sender, market_id)] = [amount, bool(is_yes), False]
+        m[3 if is_yes else 4] += amount
+        self._log("Voted", marketId=market_id, user=sender, isYes=bool(is_yes), amount=amount)
+
+    def _tx_resolveMarket(self, sender, market_id, outcome):
+        if sender != self.admin:
+            raise Revert("Only admin")
+        if not 0 <= market_id < len(self.markets):
+            raise Revert("Market does not exist")
+        m = self.markets[market_id]
+        if m[5]:
+            raise Revert("Already resolved")
+        m[5] = True
+        m[6] = bool(outcome)
+        self._log("MarketResolved", marketId=market_id, outcome=bool(outcome))
+
+    def _tx_claimReward(self, sender, market_id):
+        if not 0 <= market_id < len(self.markets):
+            raise Revert("Market does not exist")
+        m = self.markets[market_id]
+        if not m[5]:
+            raise Revert("Not resolved")
+        bet = self.bets.get((sender, market_id))
+        if not bet or bet[0] == 0:
+            raise Revert("No bet")
+        if bet[2]:
+            raise Revert("Already claimed")
+        if bet[1] != m[6]:
+            raise Revert("You lost")
+        winning_pool = m[3] if m[6] else m[4]
+        reward = bet[0] * (m[3] + m[4]) // winning_pool
+        bet[2] = True
+        self.balances[sender] = self.balances.get(sender, 0) + reward
+        # コントラクトの RewardClaimed(user, amount) と同じ形（marketId は持たない）
+        self._log("RewardClaimed", user=sender, amount=reward)
+
+    def _tx_safeMint(self, sender, to):
+        if sender != self.admin:
+            raise Revert("Only owner")
+        self.sbt_counter += 1
+        self.sbt_balances[to.lower()] = self.sbt_balances.get(to.lower(), 0) + 1
+        self._log("Transfer", **{"from": "0x" + "0" * 40, "to": to.lower(), "tokenId": self.sbt_counter})
+
+    # --- 負荷試験用のデータ生成 ---
+
+    def seed(self, n_markets, n_users, bets_per_user=20, resolved_ratio=0.5, seed=0):
+        """
+        n_markets 個の市場と n_users 人のユーザーを直接作る（トランザクションを経由しない）
+
+        約 resolved_ratio の市場は締め切り済み・確定済みにする。
+        イベントログ（MarketCreated / Voted / MarketResolved）は普通に送ったときと同じく残す。
+        作ったユーザーのアドレスのリストを返す。
+        """
+        rng = random.Random(seed)
+        now = int(time.time())
+        with self._lock:
+            start = len(self.markets)
+            for i in range(start, start + n_markets):
+                closed = rng.random() < resolved_ratio
+                end_time = now - rng.randint(60, 86400 * 30) if closed else now + rng.randint(600, 86400 * 30)
+                self.markets.append([i, f"テスト市場 #{i}", end_time, 0, 0, False, False])
+                self._log("MarketCreated", marketId=i, title=f"テスト市場 #{i}")
+            users = [
+                "0x" + hashlib.sha256(f"sim-user-{seed}-{u}".encode()).hexdigest()[:40]
+                for u in range(n_users)
+            ]
+            ids = range(start, start + n_markets)
+            for user in users:
+                self.balances[user] = FAUCET_AMOUNT * 10
+                self.faucet_claimed.add(user)
+                if not n_markets:
+                    continue
+                for market_id in rng.sample(ids, min(bets_per_user, n_markets)):
+                    amount = rng.randint(1, 50)
+                    is_yes = rng.random() < 0.5
+                    self.bets[(user, market_id)] = [amount, is_yes, False]
+                    self.balances[user] -= amount
+                    self.markets[market_id][3 if is_yes else 4] += amount
+                    self._log("Voted", marketId=market_id, user=user, isYes=is_yes, amount=amount)
+            for market_id in ids:
+                m = self.markets[market_id]
+                if m[2] <= now:
+                    m[5] = True
+                    m[6] = rng.random() < 0.5
+                    self._log("MarketResolved", marketId=market_id, outcome=m[6])
+        return users
+
+
+class SimulatedWeb3Manager:
+    """
+    Web3Manager と同じメソッドを持つ、チェーン無しのローカル版
+
+    ORACLE_BACKEND=sim で utils.registry がこちらを使う。
+    状態は SimChain に入っていて、as_user() で別ユーザーとしても操作できる。
+    """
+
+    def __init__(self, chain=None, address=None):
+        address = address or DEFAULT_ADDRESS
+        self.chain = chain or SimChain(admin=address)
+        self.account = SimpleNamespace(address=address)
+        self.chain_id = 11155111
+        # 採掘の通知は SimChain が TxTracker の代わりに出す
+        self.tx_tracker = self.chain
+
+    @classmethod
+    def from_env(cls):
+        """環境変数（SIM_*・PRIVATE_KEY）から作る。SIM_MARKETS / SIM_USERS があれば種データも入れる"""
+        address = DEFAULT_ADDRESS
+        if os.getenv("PRIVATE_KEY"):
+            from eth_account import Account
+
+            address = Account.from_key(os.getenv("PRIVATE_KEY")).address
+        manager = cls(address=address)
+        if DEFAULT_SEED_MARKETS or DEFAULT_SEED_USERS:
+            manager.chain.seed(DEFAULT_SEED_MARKETS, DEFAULT_SEED_USERS)
+        return manager
+
+    def as_user(self, address):
+        """同じチェーンを別のアドレスとして操作するマネージャを返す"""
+        return SimulatedWeb3Manager(chain=self.chain, address=address)
+
+    def _read(self):
+        self.chain.rpc()
+        self.chain.advance()
+        return self.chain
+
+    def _send(self, name, args, label):
+        self.chain.rpc()
+        return self.chain.submit(self.account.address, name, args, label)
+
+    def is_connected(self):
+        return True
+
+    def get_tx(self, tx_hash):
+        return self.chain.get_tx(tx_hash)
+
+    def get_gas_price(self):
+        return 0
+
+    def get_block_number(self):
+        return self._read().block_number
+
+    def has_market_activity(self, from_block, to_block):
+        return any(from_block <= log["block_number"] <= to_block
+                   for log in reversed(self._read().logs) if log["event"] != "Transfer")
+
+    def get_market_events(self, from_block, to_block):
+        return [log for log in self._read().logs
+                if from_block <= log["block_number"] <= to_block and log["event"] != "Transfer"]
+
+    # シミュレータには未確定のブロックもリオーグも無いので、自分がイベントインデクサの代わりになる
+    # （EventIndexer の last_block / rewinds / get_market_events と同じ形）
+    rewinds = 0
+
+    @property
+    def last_block(self):
+        return self.get_block_number()
+
+    def get_indexer(self):
+        return self
+
+
+    # --- 読み出し ---
+
+
+    def get_balance(self, address: str = None):
+        target = (address or self.account.address).lower()
+        return self._read().balances.get(target, 0)
+
+    def get_my_balance(self):
+        return self.get_balance()
+
+    def get_balances(self, addresses, batch_size=None, block_identifier="latest"):
+        chain = self._read()
+        return {addr: chain.balances.get(addr.lower(), 0) for addr in addresses}
+
+    def get_user_bet(self, address: str, market_id: int):
+        bet = self._read().bets.get((address.lower(), int(market_id)))
+        if not bet:
+            return {"amount": 0, "isYes": False, "claimed": False}
+        return {"amount": bet[0], "isYes": bet[1], "claimed": bet[2]}
+
+    def get_all_user_bets(self, address: str):
+        chain = self._read()
+        user = address.lower()
+        bets = []
+        for market_id in range(len(chain.markets)):
+            bet = chain.bets.get((user, market_id))
+            if bet and bet[0] > 0:
+                bets.append({"market_id": market_id, "amount": bet[0], "isYes": bet[1], "claimed": bet[2]})
+        return bets
+
+    def get_bet_matrix(self, addresses, market_ids=None, resolved=None, batch_size=None):
+        chain = self._read()
+        addresses = list(addresses)
+        if market_ids is None:
+            market_ids = range(len(chain.markets))
+        market_ids = [int(i) for i in market_ids]
+        if resolved is not None:
+            market_ids = [i for i in market_ids if chain.markets[i][5] == resolved]
+        empty = (0, False, False)
+        amount, is_yes, claimed = [], [], []
+        for addr in addresses:
+            user = addr.lower()
+            cells = [chain.bets.get((user, i), empty) for i in market_ids]
+            amount.append([b[0] for b in cells])
+            is_yes.append([b[1] for b in cells])
+            claimed.append([b[2] for b in cells])
+        return {
+            "addresses": addresses,
+            "market_ids": market_ids,
+            "amount": amount,
+            "isYes": is_yes,
+            "claimed": claimed,
+        }
+
+    def get_all_markets(self, batched=True, batch_size=None):
+        return [
+            {
+                "id": m[0],
+                "title": m[1],
+                "endTime": m[2],
+                "totalYes": m[3],
+                "totalNo": m[4],
+                "resolved": m[5],
+                "outcome": m[6]
+            }
+            for m in self._read().markets
+        ]
+
+    def get_market_snapshot(self, batch_size=None):
+        chain = self._read()
+        return chain.block_number, self.get_all_markets()
+
+    def get_balance_history(self, address: str = None):
+        user = (address or self.account.address).lower()
+        chain = self._read()
+        history = []
+        for log in chain.logs:
+            args = log["args"]
+            if log["event"] == "Voted" and args["user"] == user:
+                delta, kind, market_id = -args["amount"], "vote", args["marketId"]
+            elif log["event"] == "RewardClaimed" and args["user"] == user:
+                delta, kind, market_id = args["amount"], "claim", chain.claim_market_id(log["tx_hash"])
+            else:
+                continue
+            history.append({
+                "block_number": log["block_number"],
+                "tx_hash": log["tx_hash"],
+                "log_index": log["log_index"],
+                "market_id": market_id,
+                "delta": delta,
+                "kind": kind,
+            })
+        return history
+
+    def has_sbt(self, user_address):
+        return self._read().sbt_balances.get(user_address.lower(), 0) > 0
+
+
+    # --- 書き込み（TxHandle をすぐ返す） ---
+
+
+    def faucet(self):
+        return self._send("faucet", (), "faucet")
+
+    def create_market(self, title, duration_sec=3600):
+        return self._send("createMarket", (title, int(duration_sec)), f"create_market: {title}")
+
+    def create_markets(self, markets):
+        handles = []
+        for m in markets:
+            title, duration_sec = (m["title"], m.get("duration_sec", 3600)) if isinstance(m, dict) else m
+            handles.append(self.create_market(title, duration_sec))
+        return handles
+
+    def vote(self, market_id, is_yes, amount):
+        return self._send("vote", (int(market_id), bool(is_yes), int(amount)), f"vote #{market_id}")
+
+    def resolve_market(self, market_id, outcome):
+        return self._send("resolveMarket", (int(market_id), bool(outcome)), f"resolve_market #{market_id}")
+
+    def resolve_markets(self, outcomes):
+        return [self.resolve_market(market_id, outcome) for market_id, outcome in outcomes.items()]
+
+    def claim_reward(self, market_id):
+        return self._send("claimReward", (int(market_id),), f"claim_reward #{market_id}")
+
+    def mint_sbt(self, target_user_address):
+        return self._send("safeMint", (target_user_address,), "mint_sbt")
@@ -0,0 +1,437 @@
+import copy
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# data/database.json のパス
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "database.json")
+
+# ジャーナルがこのバイト数を超えたらスナップショットにまとめ直す
+DEFAULT_COMPACT_BYTES = int(os.getenv("DB_JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+
+# スナップショットに書く、まとめ直しの世代番号のキー（ジャーナルの先頭行と突き合わせる）
+GENERATION_KEY = "_journal_generation"
+
+
+class _FileLock:
+    """複数プロセス用のファイルロック（with lock.shared() / with lock.exclusive()）"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _acquire(self, exclusive):
+        f = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            # msvcrt には共有ロックが無いので常に排他で取る
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        return f
+
+    def _release(self, f):
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+
+    def shared(self):
+        return _Held(self, exclusive=False)
+
+    def exclusive(self):
+        return _Held(self, exclusive=True)
+
+
+class _Held:
+    def __init__(self, lock, exclusive):
+        self.lock = lock
+        self.exclusive = exclusive
+        self.f = None
+
+    def __enter__(self):
+        self.f = self.lock._acquire(self.exclusive)
+        return self
+
+    def __exit__(self, *exc):
+        self.lock._release(self.f)
+
+
+def apply_op(data, op):
+    """ジャーナルの 1 件を data に反映する"""
+    kind = op.get("op")
+    if kind == "bet":
+        data.setdefault("bets", []).append(op["bet"])
+    elif kind == "points":
+        data.setdefault("users", {}).setdefault(op["user"], {})["points"] = op["points"]
+    elif kind == "user":
+        data.setdefault("users", {})[op["user"]] = op["value"]
+    elif kind == "market":
+        markets = data.setdefault("markets", [])
+        for m in markets:
+            if str(m.get("id")) == str(op["id"]):
+                m.clear()
+                m.update(op["value"])
+                break
+        else:
+            markets.append(op["value"])
+    elif kind == "market_fields":
+        # 市場の一部の項目だけを書き換える（他の項目は他の書き込みの値のまま）
+        for m in data.setdefault("markets", []):
+            if str(m.get("id")) == str(op["id"]):
+                m.update(op["fields"])
+                for field in op.get("unset", ()):
+                    m.pop(field, None)
+                break
+    elif kind == "put":
+        data[op["key"]] = op["value"]
+
+
+def next_market_id(markets):
+    """数字の市場 ID の最大 + 1（markets.json の 16 進の ID は数えない。無ければ 1）"""
+    return max((m["id"] for m in markets if isinstance(m.get("id"), int)), default=0) + 1
+
+
+class StoredData(dict):
+    """
+    load() が返す dict。読み込んだ時点の状態を覚えていて、save() はそこからの変更だけを書く
+
+    - base: 読み込んだ時点の bets 以外の値
+    - bets_seen: 読み込んだ時点の bets の件数（bets は追記のみなので件数だけでよい）
+    """
+
+    __slots__ = ("base", "bets_seen")
+
+
+def remember_base(stored):
+    """stored の今の状態を base / bets_seen に覚える（bets は件数だけ）"""
+    stored.base = {key: copy.deepcopy(value) for key, value in stored.items() if key != "bets"}
+    bets = stored.get("bets")
+    stored.bets_seen = len(bets) if isinstance(bets, list) else 0
+    return stored
+
+
+def stored_copy(data):
+    """
+    data から呼び出し側に渡す StoredData を作る
+
+    bets は追記しかされないので、リストだけを新しくしてベットの dict は共有する
+    （件数が増えても deepcopy しない。ベットの dict は書き換えないこと）。
+    """
+    stored = StoredData()
+    for key, value in data.items():
+        stored[key] = list(value) if key == "bets" and isinstance(value, list) else copy.deepcopy(value)
+    return remember_base(stored)
+
+
+def diff_ops(current, new, bets_seen=None):
+    """
+    読み込んだ時点の状態 current から、呼び出し側が書き換えた new への変更をジャーナルの操作にする
+
+    変わったところだけを要素ごとに書くので、他のセッションが間に書き込んだ分は消さない。
+
+    - bets は追記のみとして扱い、bets_seen 件目（省略時は current の件数）より後ろを足す。
+      前の方は比べない（書き込みの手間がベットの総数に比例しないように）
+    - users はユーザーごとに、変わったものだけを書く（new に無いユーザーは消さない）
+    - markets は ID ごとに、既にある市場は変わった項目だけを書く（market_fields）。
+      他のセッションが同じ市場の別の項目（確定の結果など）を書いていても消さない。
+      新しい ID の市場だけを丸ごと書く（market）。new に無い市場は消さない
+    - それ以外の変更はキーごと置き換える（put）
+    """
+    ops = []
+    for key, value in new.items():
+        before = current.get(key)
+        if key == "bets" and isinstance(value, list) and (bets_seen is not None or isinstance(before, list)):
+            seen = len(before) if bets_seen is None else bets_seen
+            ops.extend({"op": "bet", "bet": bet} for bet in value[seen:])
+            continue
+        if before == value:
+            continue
+        if key == "users" and isinstance(before, dict) and isinstance(value, dict):
+            for user, info in value.items():
+                prev = before.get(user)
+                if prev == info:
+                    continue
+                if isinstance(prev, dict) and isinstance(info, dict) and prev.keys() == info.keys() == {"points"}:
+                    ops.append({"op": "points", "user": user, "points": info["points"]})
+                else:
+                    ops.append({"op": "user", "user": user, "value": info})
+        elif key == "markets" and isinstance(before, list) and isinstance(value, list):
+            by_id = {str(m.get("id")): m for m in before if isinstance(m, dict)}
+            for market in value:
+                prev = by_id.get(str(market.get("id")))
+                if prev == market:
+                    continue
+                if not isinstance(prev, dict):
+                    ops.append({"op": "market", "id": market.get("id"), "value": market})
+                    continue
+                op = {
+                    "op": "market_fields",
+                    "id": market.get("id"),
+                    "fields": {k: v for k, v in market.items() if k not in prev or prev[k] != v},
+                }
+                unset = [k for k in prev if k not in market]
+                if unset:
+                    op["unset"] = unset
+                ops.append(op)
+        else:
+            ops.append({"op": "put", "key": key, "value": value})
+    return ops
+
+
+class JournalStore:
+    """
+    database.json を「スナップショット + 追記専用のジャーナル」で保存する
+
+    - 書き込みは変更分だけをジャーナル（database.json.journal、1 行 1 操作の JSON）に
+      追記するので、データが大きくなっても 1 回の書き込みの量は変わらない
+    - ジャーナルが compact_bytes を超えたら、一時ファイルに書いてから rename して
+      スナップショット（database.json）を置き換え、ジャーナルを空にする
+    - 複数プロセスから使えるように、読むときは共有ロック、書くときは排他ロックを取る
+    - 読み込みは前回読んだ位置から後のジャーナルだけを再生する
+      （スナップショットが置き換わっていたら最初から読み直す）
+
+    まとめ直すたびに世代番号を 1 つ進め、スナップショット（GENERATION_KEY）と
+    ジャーナルの先頭行（{"generation": N}）の両方に書く。スナップショットを置き換えた
+    直後、ジャーナルを空にする前に止まっても、ジャーナルの世代が古ければ
+    スナップショットに入っている分として読み飛ばす（bet を二重に足さない）。
+
+    スナップショットの形式は今までの database.json と同じ（世代番号のキーが 1 つ増えるだけ。
+    load() が返す dict には入らない）。
+    """
+
+    def __init__(self, path=None, compact_bytes=None):
+        self.path = path or DEFAULT_DATA_PATH
+        self.journal_path = self.path + ".journal"
+        self.compact_bytes = DEFAULT_COMPACT_BYTES if compact_bytes is None else int(compact_bytes)
+        self._file_lock = _FileLock(self.path + ".lock")
+        self._lock = threading.RLock()
+        self._data = None
+        self._generation = 0
+        self._snapshot_id = None
+        self._offset = 0
+
+    # --- 読み込み ---
+
+    def _snapshot_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read_snapshot(self):
+        """スナップショットを読んで self._generation も合わせる"""
+        self._generation = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            print(f"Storage Error: {self.path} が壊れているため空のデータから始めます")
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        self._generation = int(data.pop(GENERATION_KEY, 0) or 0)
+        return data
+
+    def _catch_up(self, writable=False):
+        """
+        ロックを持った状態で、スナップショットの入れ替えとジャーナルの続きを反映する
+
+        ジャーナルがスナップショットより古い世代なら何も反映しない。writable なら
+        その場でジャーナルを空にし、そうでなければ True を返す（排他ロックで呼び直す）。
+        """
+        snapshot_id = self._snapshot_stat()
+        if self._data is None or snapshot_id != self._snapshot_id:
+            self._data = self._read_snapshot()
+            self._snapshot_id = snapshot_id
+            self._offset = 0
+
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._offset:
+            # 他のプロセスがまとめ直した直後など。最初から読み直す
+            self._data = self._read_snapshot()
+            self._offset = 0
+        if size == self._offset:
+            return False
+
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1
+        entries = [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+        if self._offset == 0 and entries:
+            # 先頭行の世代（ヘッダの無い古いジャーナルは 0 世代）
+            generation = entries[0].get("generation", 0) if "op" not in entries[0] else 0
+            if generation < self._generation:
+                if not writable:
+                    return True
+                self._reset_journal(self._generation)
+                return False
+        for entry in entries:
+            if "op" in entry:
+                apply_op(self._data, entry)
+        self._offset += end
+        if end < len(chunk) and writable:
+            # 途中で止まった書き込み（改行で終わっていない行）は捨てる
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(self._offset)
+        return False
+
+    def load(self):
+        """
+        今のデータを返す（呼び出し側が書き換えてもよいコピー。StoredData）
+
+        bets はリストだけのコピーで、各ベットの dict はキャッシュと共有する（stored_copy を参照）。
+        """
+        with self._lock:
+            with self._file_lock.shared():
+                stale = self._catch_up()
+            if stale:
+                # まとめ直しの途中で止まった跡がある。排他ロックで古いジャーナルを片付ける
+                with self._file_lock.exclusive():
+                    self._catch_up(writable=True)
+            return stored_copy(self._data)
+
+    # --- 書き込み ---
+
+    def _header(self, generation):
+        return (json.dumps({"generation": generation}) + "\n").encode("utf-8")
+
+    def _write(self, make_ops):
+        """排他ロックの中で最新の状態に追いついてから、make_ops(状態) の操作を追記する"""
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._file_lock.exclusive():
+                self._catch_up(writable=True)
+                ops = make_ops(self._data)
+                if not ops:
+                    return ops
+                payload = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops).encode("utf-8")
+                if self._offset == 0:
+                    # 空のジャーナルには先に世代番号を書く
+                    payload = self._header(self._generation) + payload
+                with open(self.journal_path, "ab") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                for op in ops:
+                    apply_op(self._data, op)
+                self._offset += len(payload)
+                if self._offset > self.compact_bytes:
+                    self._compact()
+                return ops
+
+    def append(self, ops):
+        """操作をジャーナルに追記して反映する"""
+        self._write(lambda data: list(ops))
+
+    def save(self, data):
+        """
+        data 全体を保存する（変わった分だけをジャーナルに書く。diff_ops を参照）
+
+        load() が返した StoredData なら読み込んだ時点からの変更を、
+        ただの dict なら今の状態との違いを書く。書いた操作のリストを返す。
+        """
+        base = getattr(data, "base", None)
+        if base is None:
+            ops = self._write(lambda current: diff_ops(current, data))
+        else:
+            ops = self._write(lambda current: diff_ops(base, data, data.bets_seen))
+            # 同じ dict をもう一度 save() したときに同じ変更を二重に書かないように
+            remember_base(data)
+        return ops
+
+    def allocate_market(self, fields):
+        """
+        新しい市場を書いて返す（ID は排他ロックの中で今の市場から払い出す）
+
+        他のプロセスが同じファイルに市場を作っていても ID は重ならない。
+        """
+        def make_ops(data):
+            market = {"id": next_market_id(data.get("markets", [])), **fields}
+            return [{"op": "market", "id": market["id"], "value": market}]
+
+        return copy.deepcopy(self._write(make_ops)[0]["value"])
+
+    def append_bet(self, bet):
+        self.append([{"op": "bet", "bet": bet}])
+
+    def set_points(self, user, points):
+        self.append([{"op": "points", "user": user, "points": points}])
+
+    def get_market(self, market_id):
+        """市場 1 件の最新の値（コピー。無ければ None）"""
+        with self._lock:
+            with self._file_lock.shared():
+                stale = self._catch_up()
+            if stale:
+                with self._file_lock.exclusive():
+                    self._catch_up(writable=True)
+            for market in self._data.get("markets", []):
+                if str(market.get("id")) == str(market_id):
+                    return copy.deepcopy(market)
+            return None
+
+    def compact(self):
+        """今すぐジャーナルをスナップショットにまとめる"""
+        with self._lock:
+            with self._file_lock.exclusive():
+                self._catch_up(writable=True)
+                self._compact()
+
+    def _compact(self):
+        """
+        排他ロックを持った状態で呼ぶ。一時ファイルに書いてから rename する
+
+        新しいスナップショットには次の世代番号を書く。rename の後、ジャーナルを
+        空にする前に止まっても、次に読むときに古い世代のジャーナルとして読み飛ばされる。
+        """
+        generation = self._generation + 1
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**self._data, GENERATION_KEY: generation}, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._generation = generation
+        self._snapshot_id = self._snapshot_stat()
+        self._reset_journal(generation)
+
+    def _reset_journal(self, generation):
+        """ジャーナルを世代番号のヘッダだけにする（排他ロックを持った状態で呼ぶ）"""
+        header = self._header(generation)
+        with open(self.journal_path, "wb") as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        self._offset = len(header)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=None):
+    """パスごとにプロセスで 1 つの JournalStore を返す"""
+    path = os.path.abspath(path or DEFAULT_DATA_PATH)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = JournalStore(path)
+        return store
@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+
+# レシートを問い合わせる間隔（秒）
+DEFAULT_POLL_SEC = float(os.getenv("TX_POLL_SEC", "2"))
+
+# これ以上待っても採掘されなければ failed 扱いにする（秒）
+DEFAULT_TX_TIMEOUT = float(os.getenv("TX_TIMEOUT_SEC", "600"))
+
+# 終わったトランザクションを覚えておく件数
+KEEP_FINISHED = 500
+
+PENDING = "pending"
+MINED = "mined"
+FAILED = "failed"
+
+
+class TxHandle:
+    """
+    送信済みトランザクションの引換券
+
+    送信した時点ですぐ返ってくる。status は pending → mined / failed と変わる。
+    レシートが必要なら wait() で待つ。
+    """
+
+    def __init__(self, tx_hash, label=""):
+        self.tx_hash = Web3.to_hex(tx_hash) if tx_hash is not None else None
+        # 送れなかったもの（ハッシュなし）はトラッカーに仮のキーで覚えておく
+        self.key = self.tx_hash or f"failed-{uuid.uuid4().hex}"
+        self.label = label
+        self.status = PENDING
+        self.receipt = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @classmethod
+    def failed(cls, label, error):
+        """送信そのものに失敗したときの TxHandle（ハッシュなし・最初から failed）"""
+        handle = cls(None, label)
+        handle._finish(FAILED, error=str(error))
+        return handle
+
+    @property
+    def transactionHash(self):
+        """
+        レシートと同じ名前でハッシュを取れるようにしておく（旧コード互換）
+
+        送信そのものに失敗してハッシュが無いときは None（理由は error を見る）。
+        """
+        if self.tx_hash is None:
+            return None
+        return Web3.to_bytes(hexstr=self.tx_hash)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """採掘されるまで待ってレシートを返す（failed なら例外）"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"transaction {self.tx_hash} is still pending")
+        if self.status == FAILED:
+            raise RuntimeError(self.error or f"transaction {self.tx_hash} failed")
+        return self.receipt
+
+    def _finish(self, status, receipt=None, error=None):
+        self.status = status
+        self.receipt = receipt
+        self.error = error
+        self.finished_at = time.time()
+        self._done.set()
+
+    def to_dict(self):
+        return {
+            "tx_hash": self.tx_hash,
+            "label": self.label,
+            "status": self.status,
+            "block": self.receipt["blockNumber"] if self.receipt else None,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+        }
+
+
+class TxTracker:
+    """
+    送信したトランザクションのレシートをバックグラウンドで待つ係
+
+    Streamlit のスクリプトスレッドを wait_for_transaction_receipt で
+    止めないように、1 本のワーカースレッドがまとめてレシートを問い合わせる。
+    採掘されたら watch_cache() で登録された読み出しキャッシュを捨てる。
+    """
+
+    def __init__(self, w3, poll_sec=None, timeout=None):
+        self.w3 = w3
+        self.poll_sec = DEFAULT_POLL_SEC if poll_sec is None else float(poll_sec)
+        self.timeout = DEFAULT_TX_TIMEOUT if timeout is None else float(timeout)
+        self._caches = weakref.WeakSet()
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def watch_cache(self, cache):
+        """採掘されたときに clear() するキャッシュを登録する"""
+        self._caches.add(cache)
+
+    def track(self, tx_hash, label=""):
+        """送信済みハッシュを登録して TxHandle を返す"""
+        handle = TxHandle(tx_hash, label)
+        with self._lock:
+            self._handles[handle.tx_hash] = handle
+            self._forget_old()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="tx-tracker", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return handle
+
+    def add(self, handle):
+        """送信に失敗した TxHandle（TxHandle.failed）を状態表示用に登録して返す"""
+        with self._lock:
+            self._handles[handle.key] = handle
+            self._forget_old()
+        return handle
+
+    def get(self, tx_hash):
+        """ハッシュ（または TxHandle.key）から TxHandle を引く（知らないものや None なら None）"""
+        if tx_hash is None:
+            return None
+        with self._lock:
+            return self._handles.get(Web3.to_hex(tx_hash) if not isinstance(tx_hash, str) else tx_hash)
+
+    def pending(self):
+        with self._lock:
+            return [h for h in self._handles.values() if not h.done]
+
+    def _forget_old(self):
+        finished = [k for k, h in self._handles.items() if h.done]
+        for key in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._handles[key]
+
+    def _run(self):
+        while True:
+            pending = self.pending()
+            if not pending:
+                # 新しいトランザクションが来るまで眠る
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            for handle in pending:
+                self._poll(handle)
+            self._wakeup.wait(self.poll_sec)
+            self._wakeup.clear()
+
+    def _poll(self, handle):
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(handle.tx_hash)
+        except TransactionNotFound:
+            receipt = None
+        except Exception as e:
+            print(f"Receipt Check Error: {e}")
+            receipt = None
+
+        if receipt is None:
+            if time.time() - handle.submitted_at > self.timeout:
+                handle._finish(FAILED, error="timed out waiting for receipt")
+            return
+
+        if receipt.get("status", 1) == 1:
+            handle._finish(MINED, receipt=receipt)
+        else:
+            handle._finish(FAILED, receipt=receipt, error="transaction reverted")
+        for cache in list(self._caches):
+            cache.clear()
+
+
+def wait_all(handles, timeout=None):
+    """
+    複数の TxHandle がすべて終わるまで待つ
+
+    レシートはトラッカーが並行して問い合わせているので、
+    待ち時間はおおむね一番遅いトランザクション 1 本分になる。
+    まだ終わっていないものが残ったまま timeout を過ぎたら False を返す。
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    for handle in handles:
+        remaining = None if deadline is None else max(0.0, deadline - time.time())
+        if not handle._done.wait(remaining):
+            return False
+    return True
+
+
+# 全員が同じ署名アカウントを使うので、トラッカーはプロセスに 1 つだけ持つ
+_shared_tracker = None
+_shared_lock = threading.Lock()
+
+
+def shared_tracker(w3):
+    """プロセス共通の TxTracker を返す（ページごとに Web3Manager を作り直しても状態が残る）"""
+    global _shared_tracker
+    with _shared_lock:
+        if _shared_tracker is None:
+            _shared_tracker = TxTracker(w3)
+        return _shared_tracker
@@ -0,0 +1,66 @@
+import streamlit as st
+
+
+# このセッションで送ったトランザクションのキー（ハッシュ。送れなかったものは TxHandle.key）を入れておくキー
+SESSION_KEY = "_submitted_txs"
+
+# 状態パネルを自動更新する間隔（秒）
+REFRESH_SEC = 3
+
+STATUS_LABELS = {
+    "pending": "⏳ 採掘待ち",
+    "mined": "✅ 記録済み",
+    "failed": "❌ 失敗",
+}
+
+
+def remember_tx(handle):
+    """送信した TxHandle をセッションに覚えておく（状態パネルに表示される）"""
+    key = getattr(handle, "key", None) or getattr(handle, "tx_hash", None)
+    if key is None:
+        return
+    st.session_state.setdefault(SESSION_KEY, []).append(key)
+
+
+def _render(manager):
+    hashes = st.session_state.get(SESSION_KEY, [])
+    if not hashes:
+        return
+    st.markdown("#### 🧾 送信したトランザクション")
+    finished_now = False
+    for key in reversed(hashes[-10:]):
+        if key is None:
+            continue
+        handle = manager.get_tx(key)
+        if handle is None:
+            continue
+        status = STATUS_LABELS.get(handle.status, handle.status)
+        if handle.tx_hash:
+            etherscan_url = f"https://sepolia.etherscan.io/tx/{handle.tx_hash}"
+            st.markdown(f"- {status} `{handle.label}` [{handle.tx_hash[:10]}…]({etherscan_url})")
+        else:
+            # 送信そのものに失敗した（ハッシュが無い）
+            st.markdown(f"- {status} `{handle.label}`（送信できませんでした）")
+        if handle.error:
+            st.caption(f"  {handle.error}")
+        seen_key = f"_tx_seen_{key}"
+        if handle.done and not st.session_state.get(seen_key):
+            st.session_state[seen_key] = True
+            finished_now = True
+    if finished_now:
+        # 採掘されたら残高などを読み直すためにページ全体を再実行する
+        st.rerun()
+
+
+if hasattr(st, "fragment"):
+    # パネルだけを定期的に再実行する（スクリプト全体は止めない）
+    _render_fragment = st.fragment(run_every=REFRESH_SEC)(_render)
+else:
+    _render_fragment = _render
+
+
+def render_tx_status(manager):
+    """このセッションで送ったトランザクションの状態（pending / mined / failed）を表示する"""
+    if manager is None or not hasattr(manager, "get_tx"):
+        return
+    _render_fragment(manager)
@@ -1,85 +1,291 @@
-import json
 import os
+import threading
 from web3 import Web3
 from dotenv import load_dotenv
 
+from utils.contracts import SBT_ADDRESS, load_abi
+from utils.event_indexer import DEFAULT_START_BLOCK, EventIndexer
+from utils.nonce_manager import is_nonce_error, shared_nonce_manager
+from utils.read_cache import BlockCache, cached_read
+from utils.rpc_metrics import instrument
+from utils.rpc_transport import make_provider
+from utils.tx_tracker import TxHandle, shared_tracker
+
 
 # .envを読み込む
 load_dotenv()
 
+# JSON-RPC バッチ 1 回に詰め込む eth_call の最大数（RPC によって上限が違うので調整可能）
+DEFAULT_BATCH_SIZE = int(os.getenv("WEB3_BATCH_SIZE", "100"))
+
 
 class Web3Manager:
-    def __init__(self):
-        # ブロックチェーンに接続
-        self.w3 = Web3(Web3.HTTPProvider(os.getenv("WEB3_RPC_URL")))
+    def __init__(self, provider=None):
+        # ここではネットワークに触らない（接続確認は is_connected() を呼んだときだけ）
+        # ブロックチェーンに接続（WEB3_RPC_URLS に複数書くと自動でフェイルオーバーする）
+        # provider を渡すとそれを使う（ベンチマークなどでローカルの代用ノードにつなぐとき）
+        self.w3 = Web3(provider or make_provider())
+        # すべての RPC の回数・時間・バイト数をページごとに数える（utils/rpc_metrics.py）
+        instrument(self.w3)
         self.account = self.w3.eth.account.from_key(os.getenv("PRIVATE_KEY"))
         self.chain_id = 11155111 # Sepoliaの場合
-        current_dir = os.path.dirname(os.path.abspath(__file__))
+        self.batch_size = DEFAULT_BATCH_SIZE
+        # ブロック番号をキーにした読み出しキャッシュ（WEB3_CACHE_SIZE=0 で無効）
+        self.cache = BlockCache()
+        # 送信したトランザクションのレシートをバックグラウンドで待つ係
+        self.tx_tracker = shared_tracker(self.w3)
+        self.tx_tracker.watch_cache(self.cache)
+        # 共有アカウントの nonce を手元で連番管理する（同時書き込みでも衝突しない）
+        self.nonces = shared_nonce_manager(self.w3, self.account.address)
 
-        # コントラクトの準備
-        # utils/abi.json の絶対パスを作成
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # utils フォルダ
-        ABI_PATH = os.path.join(BASE_DIR, "abi.json")
-
-        with open(ABI_PATH, "r") as f:
-            abi = json.load(f)
+        # コントラクトの準備（utils/abi.json はプロセスで 1 回だけ読み込む）
         self.contract = self.w3.eth.contract(
             address=os.getenv("CONTRACT_ADDRESS"),
-            abi=abi
+            abi=load_abi("abi.json")
         )
 
         #【追加】SBTコントラクトの読み込み
-        # SBTのアドレスとABIをここに直接書くか、.envに追加して読み込む
-        
-        sbt_address = "0x6AF471Be518c3C73A9aB83669f791D80e6B8Ea62"
-
-        sbt_abi_path = os.path.join(current_dir, 'sbt_abi.json')
-
-        if os.path.exists(sbt_abi_path):
-            with open(sbt_abi_path, "r") as f:
-                sbt_abi = json.load(f)
-            self.sbt_contract = self.w3.eth.contract(address=sbt_address, abi=sbt_abi)
+        # SBTのアドレスは utils/contracts.py にまとめてある
+        sbt_abi = load_abi("sbt_abi.json")
+        if sbt_abi is not None:
+            self.sbt_contract = self.w3.eth.contract(address=SBT_ADDRESS, abi=sbt_abi)
         else:
             print("⚠️ SBT ABI file not found!")
-        
-        print(f"Connected to Web3: {self.w3.is_connected()}")
-    
-    def _send_transaction(self, func_call):
-        """トランザクションを作って、署名して、送る共通関数"""
-        nonce = self.w3.eth.get_transaction_count(self.account.address)
-       
-        # ガス代の見積もり（少し多めに設定）
-        tx_data = func_call.build_transaction({
-            'chainId': self.chain_id,
-            'gas': 500000,
-            'gasPrice': self.w3.eth.gas_price,
-            'nonce': nonce,
+
+        # イベントインデックス（WEB3_INDEX_DB を設定すると読み出しをインデックス経由にする）
+        self.indexer = None
+        self._indexer_lock = threading.Lock()
+        if os.getenv("WEB3_INDEX_DB"):
+            if DEFAULT_START_BLOCK is None:
+                print("⚠️ WEB3_INDEX_DB is set but INDEXER_START_BLOCK is not; reading from the contract directly")
+            else:
+                self.attach_indexer(os.getenv("WEB3_INDEX_DB"))
+
+    def is_connected(self):
+        """RPC につながっているか確認する（ここで初めてネットワークに触る）"""
+        return self.w3.is_connected()
+
+    def _send_transaction(self, func_call, label=""):
+        """
+        トランザクションを作って、署名して、送る共通関数
+
+        採掘を待たずに TxHandle をすぐ返す。レシートは tx_tracker が
+        バックグラウンドで待つので、必要なら handle.wait() で受け取る。
+        nonce は NonceManager から、ガス代はブロック単位のキャッシュから取るので
+        送信以外の RPC は基本的に発生しない。
+        """
+        for attempt in range(2):
+            nonce = self.nonces.allocate()
+            try:
+                # ガス代の見積もり（少し多めに設定）
+                tx_data = func_call.build_transaction({
+                    'chainId': self.chain_id,
+                    'gas': 500000,
+                    'gasPrice': self.get_gas_price(),
+                    'nonce': nonce,
+                })
+
+                # 署名
+                signed_tx = self.w3.eth.account.sign_transaction(tx_data, private_key=os.getenv("PRIVATE_KEY"))
+
+                # 送信
+                tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception as e:
+                # 送れなかった nonce は欠番になるので、pending の件数から数え直す
+                self.nonces.release(nonce)
+                self.nonces.resync()
+                if attempt == 0 and is_nonce_error(e):
+                    continue
+                raise
+            self.nonces.release(nonce)
+
+            # 完了はバックグラウンドで待つ（採掘されたら読み出しキャッシュを捨てる）
+            return self.tx_tracker.track(tx_hash, label)
+
+    def _send_transactions(self, func_calls, labels):
+        """
+        複数のトランザクションを連続した nonce で署名して、待たずに全部送る
+
+        送信に失敗したものがあれば nonce を数え直し、残りは 1 件ずつ送り直す。
+        それでも送れなかったものは failed の TxHandle として返す。
+        """
+        handles = []
+        if not func_calls:
+            return handles
+        nonces = self.nonces.allocate_many(len(func_calls))
+        gas_price = self.get_gas_price()
+        for i, (func_call, label) in enumerate(zip(func_calls, labels)):
+            try:
+                tx_data = func_call.build_transaction({
+                    'chainId': self.chain_id,
+                    'gas': 500000,
+                    'gasPrice': gas_price,
+                    'nonce': nonces[i],
+                })
+                signed_tx = self.w3.eth.account.sign_transaction(tx_data, private_key=os.getenv("PRIVATE_KEY"))
+                tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception:
+                # 欠番ができたので数え直し、残りは通常の送信で 1 件ずつ送る
+                self.nonces.release(*nonces[i:])
+                self.nonces.resync()
+                for rest_call, rest_label in zip(func_calls[i:], labels[i:]):
+                    try:
+                        handles.append(self._send_transaction(rest_call, rest_label))
+                    except Exception as e:
+                        handles.append(self.tx_tracker.add(TxHandle.failed(rest_label, e)))
+                return handles
+            self.nonces.release(nonces[i])
+            handles.append(self.tx_tracker.track(tx_hash, label))
+        return handles
+
+    def get_tx(self, tx_hash):
+        """送信済みトランザクションの TxHandle を返す（状態確認用）"""
+        return self.tx_tracker.get(tx_hash)
+
+    def get_block_number(self):
+        """最新ブロック番号（キャッシュを通さずに毎回聞く。BlockWatcher 用）"""
+        return self.w3.eth.block_number
+
+    def has_market_activity(self, from_block, to_block):
+        """
+        PredictionMarket コントラクトがこのブロック範囲でイベントを出したか
+
+        出していなければ市場一覧（合計額・確定状態）は変わっていない。
+        範囲が広すぎるときは調べずに True を返す。
+        """
+        if to_block - from_block > 1000:
+            return True
+        logs = self.w3.eth.get_logs({
+            "address": self.contract.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
         })
-       
-        # 署名
-        signed_tx = self.w3.eth.account.sign_transaction(tx_data, private_key=os.getenv("PRIVATE_KEY"))
-       
-        # 送信
-        tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-       
-        # 完了を待つ
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-        return receipt
+        return len(logs) > 0
+
+    def _latest_block(self):
+        """最新ブロック番号（キャッシュが有効なら数秒間は RPC に行かない）"""
+        if self.cache.enabled:
+            return self.cache.block_number(lambda: self.w3.eth.block_number)
+        return self.w3.eth.block_number
+
+    def _batch_call(self, calls, batch_size=None, block_identifier="latest"):
+        """
+        ContractFunction のリストを JSON-RPC バッチでまとめて call() する共通関数
+
+        - batch_size 件ずつ 1 回の HTTP リクエストに詰めて送る
+        - block_identifier を揃えることで、全件を同じブロック時点で読む
+        - バッチ非対応の RPC では 1 件ずつの call() にフォールバックする
+        """
+        size = max(1, int(batch_size or self.batch_size))
+        results = []
+        for start in range(0, len(calls), size):
+            chunk = calls[start:start + size]
+            try:
+                with self.w3.batch_requests() as batch:
+                    for fn in chunk:
+                        batch.add(fn.call(block_identifier=block_identifier))
+                    results.extend(batch.execute())
+            except Exception as e:
+                # 黙って 1 件ずつにすると往復回数が急に増えた理由が分からないので残しておく
+                print(f"Batch Call Error: {e} (falling back to {len(chunk)} single calls)")
+                results.extend(fn.call(block_identifier=block_identifier) for fn in chunk)
+        return results
+
+    @staticmethod
+    def _market_from_tuple(m):
+        """markets(i) が返すタプルを辞書に変換する"""
+        return {
+            "id": m[0],
+            "title": m[1],
+            "endTime": m[2],
+            "totalYes": m[3],
+            "totalNo": m[4],
+            "resolved": m[5],
+            "outcome": m[6]
+        }
+
+
+    def attach_indexer(self, db_path=None, **kwargs):
+        """
+        イベントインデクサをつなぐ
+
+        以降 get_all_markets / get_all_user_bets / get_balance_history は
+        ストレージを直接読まず、ローカルの SQLite インデックスから答える。
+        """
+        self.indexer = EventIndexer(self, db_path=db_path, **kwargs)
+        return self.indexer
+
+    def _synced_indexer(self):
+        """インデックスを最新の確定ブロックまで進めてから返す"""
+        self.indexer.sync()
+        return self.indexer
+
+    def _indexed_snapshot(self, batch_size=None):
+        """
+        インデックスの市場一覧に、まだ確定していない先頭のブロックの変化を重ねて (block, markets) で返す
+
+        インデックスは confirmations ブロック遅れているので、その間にイベントを出した市場
+        （新しく作られた市場を含む）だけ、最新ブロックで markets(i) を読み直して差し替える。
+        """
+        indexer = self._synced_indexer()
+        markets = indexer.get_all_markets()
+        block = self._latest_block()
+        if block <= indexer.last_block:
+            return indexer.last_block, markets
+        # RewardClaimed は市場の状態を変えない（しかも topics[1] は marketId ではない）
+        topics = {e.topic.lower() for e in self.contract.all_events()
+                  if e.event_name in ("MarketCreated", "Voted", "MarketResolved")}
+        logs = self.w3.eth.get_logs({
+            "address": self.contract.address,
+            "fromBlock": indexer.last_block + 1,
+            "toBlock": block,
+        })
+        touched = sorted({int(Web3.to_hex(log["topics"][1]), 16) for log in logs
+                          if Web3.to_hex(log["topics"][0]).lower() in topics})
+        if touched:
+            calls = [self.contract.functions.markets(i) for i in touched]
+            by_id = {m["id"]: m for m in markets}
+            for m in self._batch_call(calls, batch_size=batch_size, block_identifier=block):
+                by_id[m[0]] = self._market_from_tuple(m)
+            markets = [by_id[i] for i in sorted(by_id)]
+        return block, markets
+
+    def get_indexer(self):
+        """
+        最新の確定ブロックまで進めたイベントインデクサを返す（Leaderboard 用）
+
+        まだつないでいなければ既定の場所につなぐ。
+        INDEXER_START_BLOCK（デプロイしたブロック）が設定されていなければ None。
+        """
+        with self._indexer_lock:
+            if self.indexer is None:
+                if DEFAULT_START_BLOCK is None:
+                    return None
+                self.attach_indexer()
+        return self._synced_indexer()
 
 
     # --- みんなが使う関数 ---
 
 
-    def get_balance(self, address: str = None):
+    @cached_read
+    def get_gas_price(self):
+        """現在のガス代（同じブロックの間は使い回す）"""
+        return self.w3.eth.gas_price
+
+
+    @cached_read
+    def get_balance(self, address: str = None, block_identifier="latest"):
         """指定アドレス（なければ自身）の OCP 残高を確認する"""
         target = address or self.account.address
-        return self.contract.functions.balances(target).call()
+        return self.contract.functions.balances(target).call(block_identifier=block_identifier)
 
 
-    def get_user_bet(self, address: str, market_id: int):
+    @cached_read
+    def get_user_bet(self, address: str, market_id: int, block_identifier="latest"):
         """特定ユーザーの特定マーケットへのベット情報を取得"""
         try:
-            bet = self.contract.functions.bets(address, market_id).call()
+            bet = self.contract.functions.bets(address, market_id).call(block_identifier=block_identifier)
             # bet は (amount, isYes, claimed) のタプル
             return {
                 "amount": int(bet[0]),
@@ -90,78 +296,221 @@ class Web3Manager:
             return {"amount": 0, "isYes": False, "claimed": False}
 
 
-    def get_all_user_bets(self, address: str):
+    @cached_read
+    def get_all_user_bets(self, address: str, block_identifier="latest"):
         """指定ユーザーの全マーケットへのベット情報を取得"""
+        if self.indexer is not None:
+            return self._synced_indexer().get_all_user_bets(address)
         bets = []
         try:
-            market_count = self.contract.functions.marketCount().call()
-            for market_id in range(market_count):
-                bet_info = self.get_user_bet(address, market_id)
-                if bet_info["amount"] > 0:
+            matrix = self.get_bet_matrix([address], block_identifier=block_identifier)
+            for j, market_id in enumerate(matrix["market_ids"]):
+                amount = matrix["amount"][0][j]
+                if amount > 0:
                     bets.append({
                         "market_id": market_id,
-                        "amount": bet_info["amount"],
-                        "isYes": bet_info["isYes"],
-                        "claimed": bet_info["claimed"]
+                        "amount": amount,
+                        "isYes": matrix["isYes"][0][j],
+                        "claimed": matrix["claimed"][0][j]
                     })
         except Exception:
             pass
         return bets
 
 
+    @cached_read
+    def get_bet_matrix(self, addresses, market_ids=None, resolved=None, batch_size=None,
+                       block_identifier="latest"):
+        """
+        (アドレス × マーケット) のベット情報をまとめて取得する
+
+        - market_ids を渡すとそのマーケットだけに絞る（省略時は全マーケット）
+        - resolved=True / False で「確定済みだけ」「未確定だけ」に絞る
+        - bets(address, i) はバッチでまとめて読むので、往復回数は
+          アドレス数 × マーケット数 / batch_size 程度になる
+
+        戻り値は行 = addresses、列 = market_ids の密な行列:
+        {"addresses", "market_ids", "amount", "isYes", "claimed"}
+        """
+        addresses = list(addresses)
+        block = self._latest_block() if block_identifier == "latest" else block_identifier
+        if resolved is not None:
+            markets = self.get_all_markets(block_identifier=block)
+            wanted = None if market_ids is None else {int(i) for i in market_ids}
+            market_ids = [
+                int(m["id"]) for m in markets
+                if bool(m["resolved"]) == resolved and (wanted is None or int(m["id"]) in wanted)
+            ]
+        elif market_ids is None:
+            count = self.contract.functions.marketCount().call(block_identifier=block)
+            market_ids = list(range(count))
+        else:
+            market_ids = [int(i) for i in market_ids]
+
+        calls = [
+            self.contract.functions.bets(addr, market_id)
+            for addr in addresses
+            for market_id in market_ids
+        ]
+        raw = self._batch_call(calls, batch_size=batch_size, block_identifier=block)
+
+        width = len(market_ids)
+        amount, is_yes, claimed = [], [], []
+        for row in range(len(addresses)):
+            # bet は (amount, isYes, claimed) のタプル
+            cells = raw[row * width:(row + 1) * width]
+            amount.append([int(b[0]) for b in cells])
+            is_yes.append([bool(b[1]) for b in cells])
+            claimed.append([bool(b[2]) for b in cells])
+        return {
+            "addresses": addresses,
+            "market_ids": market_ids,
+            "amount": amount,
+            "isYes": is_yes,
+            "claimed": claimed,
+        }
+
+
+    @cached_read
+    def get_balances(self, addresses, batch_size=None, block_identifier="latest"):
+        """
+        複数アドレスの OCP 残高をまとめて取得して {address: balance} で返す
+
+        block_identifier を渡すとそのブロック時点の残高を読む（イベントと時点を揃えるとき用）。
+        """
+        addresses = list(addresses)
+        calls = [self.contract.functions.balances(addr) for addr in addresses]
+        raw = self._batch_call(calls, batch_size=batch_size, block_identifier=block_identifier)
+        return {addr: int(bal) for addr, bal in zip(addresses, raw)}
+
+
     def faucet(self):
         """1000ポイントもらう"""
-        return self._send_transaction(self.contract.functions.faucet())
+        return self._send_transaction(self.contract.functions.faucet(), "faucet")
 
 
     def create_market(self, title, duration_sec=3600):
         """市場を作る(Admin)"""
         return self._send_transaction(
-            self.contract.functions.createMarket(title, duration_sec)
+            self.contract.functions.createMarket(title, duration_sec),
+            f"create_market: {title}"
         )
 
 
+    def create_markets(self, markets):
+        """
+        市場をまとめて作る(Admin)
+
+        markets は (title, duration_sec) のタプルか
+        {"title": ..., "duration_sec": ...} の辞書のリスト。
+        全件を連続した nonce で送ってから、TxHandle のリストを返す。
+        """
+        func_calls, labels = [], []
+        for m in markets:
+            if isinstance(m, dict):
+                title, duration_sec = m["title"], m.get("duration_sec", 3600)
+            else:
+                title, duration_sec = m
+            func_calls.append(self.contract.functions.createMarket(title, int(duration_sec)))
+            labels.append(f"create_market: {title}")
+        return self._send_transactions(func_calls, labels)
+
+    def resolve_markets(self, outcomes):
+        """
+        結果をまとめて確定する(Admin)
+
+        outcomes は {market_id: outcome(bool)} の辞書。
+        全件を連続した nonce で送ってから、TxHandle のリストを返す。
+        """
+        func_calls, labels = [], []
+        for market_id, outcome in outcomes.items():
+            func_calls.append(self.contract.functions.resolveMarket(int(market_id), bool(outcome)))
+            labels.append(f"resolve_market #{market_id}")
+        return self._send_transactions(func_calls, labels)
+
+
     def vote(self, market_id, is_yes, amount):
         """投票する"""
         return self._send_transaction(
-            self.contract.functions.vote(market_id, is_yes, amount)
+            self.contract.functions.vote(market_id, is_yes, amount),
+            f"vote #{market_id}"
         )
        
     def resolve_market(self, market_id, outcome):
         """結果を確定する(Admin)"""
         return self._send_transaction(
-            self.contract.functions.resolveMarket(market_id, outcome)
+            self.contract.functions.resolveMarket(market_id, outcome),
+            f"resolve_market #{market_id}"
         )
        
     def claim_reward(self, market_id):
         """配当をもらう"""
         return self._send_transaction(
-            self.contract.functions.claimReward(market_id)
+            self.contract.functions.claimReward(market_id),
+            f"claim_reward #{market_id}"
         )
 
 
-    def get_all_markets(self):
-        """全市場データを取得して辞書のリストで返す"""
-        count = self.contract.functions.marketCount().call()
-        markets = []
-        for i in range(count):
-            # Solidityのstructはタプル(リストみたいなもの)で返ってくる
-            m = self.contract.functions.markets(i).call()
-            markets.append({
-                "id": m[0],
-                "title": m[1],
-                "endTime": m[2],
-                "totalYes": m[3],
-                "totalNo": m[4],
-                "resolved": m[5],
-                "outcome": m[6]
-            })
-        return markets
+    @cached_read
+    def get_all_markets(self, batched=True, batch_size=None, block_identifier="latest"):
+        """
+        全市場データを取得して辞書のリストで返す
+
+        batched=True（既定）のときはスナップショットモード:
+        ブロック番号を 1 つ固定し、marketCount と markets(i) を
+        同じブロック時点でバッチ読み出しする（往復回数は 2 + N / batch_size）。
+        batched=False のときは従来通り 1 件ずつ読む。
+        インデクサがつながっている場合はインデックス（と未確定の先頭ブロックの分）から返す。
+        """
+        if self.indexer is not None:
+            return self._indexed_snapshot(batch_size=batch_size)[1]
+
+        if not batched:
+            count = self.contract.functions.marketCount().call(block_identifier=block_identifier)
+            markets = []
+            for i in range(count):
+                # Solidityのstructはタプル(リストみたいなもの)で返ってくる
+                m = self.contract.functions.markets(i).call(block_identifier=block_identifier)
+                markets.append(self._market_from_tuple(m))
+            return markets
+
+        return self.get_market_snapshot(batch_size=batch_size, block_identifier=block_identifier)[1]
+
+    def get_market_snapshot(self, batch_size=None, block_identifier="latest"):
+        """
+        全市場データと、それを読んだブロック番号を (block, markets) で返す
+
+        marketCount と markets(i) を同じブロック時点（block_identifier。省略時は最新）で
+        バッチ読み出しする。
+        インデクサがつながっている場合はインデックスに未確定の先頭ブロックの分を重ねて、
+        最新ブロックの状態を返す（_indexed_snapshot）。
+        """
+        if self.indexer is not None:
+            return self._indexed_snapshot(batch_size=batch_size)
+
+        block = self._latest_block() if block_identifier == "latest" else block_identifier
+        count = self.contract.functions.marketCount().call(block_identifier=block)
+        calls = [self.contract.functions.markets(i) for i in range(count)]
+        raw = self._batch_call(calls, batch_size=batch_size, block_identifier=block)
+        return block, [self._market_from_tuple(m) for m in raw]
+
+    def get_balance_history(self, address: str = None):
+        """
+        指定アドレス（なければ自身）の残高の増減履歴をインデックスから取得する
+
+        INDEXER_START_BLOCK（デプロイしたブロック）が設定されていなければ空の履歴を返す。
+        """
+        indexer = self.get_indexer()
+        if indexer is None:
+            print("⚠️ INDEXER_START_BLOCK is not set; balance history is unavailable")
+            return []
+        return indexer.get_balance_history(address or self.account.address)
 
     #【追加】SBTを持っているか確認する関数
-    def has_sbt(self, user_address):
+    @cached_read
+    def has_sbt(self, user_address, block_identifier="latest"):
         try:
-            balance = self.sbt_contract.functions.balanceOf(user_address).call()
+            balance = self.sbt_contract.functions.balanceOf(user_address).call(block_identifier=block_identifier)
             return balance > 0
         except Exception as e:
             print(f"SBT Check Error: {e}")
@@ -171,9 +520,11 @@ class Web3Manager:
     def mint_sbt(self, target_user_address):
         print(f"Minting SBT to {target_user_address}")
         return self._send_transaction(
-            self.sbt_contract.functions.safeMint(target_user_address)
+            self.sbt_contract.functions.safeMint(target_user_address),
+            "mint_sbt"
         )
     
-    def get_my_balance(self):
+    @cached_read
+    def get_my_balance(self, block_identifier="latest"):
         """自分のOCP残高を確認する（旧関数名）"""
-        return self.contract.functions.balances(self.account.address).call()
+        return self.contract.functions.balances(self.account.address).call(block_identifier=block_identifier)